@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+
+import PIL
+import pptx
+from PIL import Image, ImageDraw
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.util import Inches
+
+import create_pitchdeck as deck
+
+SHAPE_COUNTS = (10, 100, 10_000)
+FIXTURE_SIZE = (2400, 1600)
+# Slowdown of a stage's best wall time before --compare reports it as a regression: relative, and
+# absolute so that millisecond stages do not flag on scheduler noise.
+THRESHOLD = 0.20
+MIN_DELTA = 0.005
+BENCH_VERSION = 1
+
+
+def fixture_image(seed, size=FIXTURE_SIZE):
+    # Photo-like enough for JPEG: a smooth gradient with shapes and a little noise.
+    rng = random.Random(seed)
+    w, h = size
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    tint = Image.new("RGB", size, tuple(rng.randrange(40, 220) for _ in range(3)))
+    img = Image.blend(img, tint, 0.6)
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = rng.randrange(w), rng.randrange(h)
+        r = rng.randrange(20, 300)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    img = Image.blend(img, noise, 0.08)
+    out = BytesIO()
+    img.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def make_fixtures(keys):
+    return {key: fixture_image(n) for n, key in enumerate(sorted(keys))}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    fixtures = {}
+    modified = formatdate(usegmt=True)
+
+    def do_GET(self):
+        key = self.path.strip("/")
+        body = self.fixtures.get(key)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = f'"{key}-{len(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def fixture_server(fixtures):
+    handler = type("Handler", (FixtureHandler,), {"fixtures": fixtures})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address
+        yield {key: f"http://{host}:{port}/{key}" for key in fixtures}
+    finally:
+        server.shutdown()
+        server.server_close()
+        deck.close_connections()
+
+
+@contextmanager
+def workdir():
+    # Caches and assets live under relative paths, so a scratch cwd isolates every run.
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="pitchdeck-bench-") as tmp:
+        os.chdir(tmp)
+        try:
+            yield Path(tmp)
+        finally:
+            os.chdir(previous)
+
+
+def measure(name, run, setup=None, repeat=3):
+    # Best wall and CPU time over `repeat` runs; tracemalloc only wraps an extra first run so its
+    # overhead does not skew the timings.
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall = cpu = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started, started_cpu = time.perf_counter(), time.process_time()
+        run()
+        wall = min(wall, time.perf_counter() - started)
+        cpu = min(cpu, time.process_time() - started_cpu)
+    return {"stage": name, "wall": wall, "cpu": cpu, "peak_bytes": peak, "repeat": repeat}
+
+
+def reset_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def bench_stages(repeat=5):
+    stages = []
+    metrics = {}
+    fixtures = make_fixtures(deck.IMAGE_URLS)
+    metrics["fixture_bytes"] = sum(len(v) for v in fixtures.values())
+
+    with workdir(), fixture_server(fixtures) as urls:
+        stages.append(measure("fetch_images:cold", lambda: deck.fetch_images(urls, deck.RAW), setup=lambda: reset_dir(deck.ASSETS), repeat=repeat))
+        stages.append(measure("fetch_images:warm", lambda: deck.fetch_images(urls, deck.RAW), repeat=repeat))
+        stages.append(measure("fetch_images:revalidate", lambda: deck.fetch_images(urls, deck.RAW, max_age=0), repeat=repeat))
+
+        deck._slide_plans.clear()
+        plan = deck.plan_crops()
+
+        def crop_all():
+            for item in plan:
+                deck.cropped_image(*item)
+
+        stages.append(measure("cropped_image:cold", crop_all, setup=lambda: reset_dir(deck.PROCESSED), repeat=repeat))
+        stages.append(measure("cropped_image:hit", crop_all, repeat=repeat))
+        for item in plan:
+            deck._derived[item] = deck.cropped_image(*item)
+        metrics["media_bytes"] = sum(deck._derived[item].stat().st_size for item in plan)
+
+        holder = {}
+
+        def fresh_deck():
+            holder["prs"] = deck.new_presentation()
+
+        stages.append(measure("new_presentation", fresh_deck, repeat=repeat))
+        for fn in deck.SLIDES:
+            stages.append(measure(f"slide:{fn.__name__}", lambda fn=fn: fn(holder["prs"], deck.CONTENT), setup=fresh_deck, repeat=repeat))
+
+        prs = deck.assemble()
+        stages.append(measure("save", lambda: deck.serialize_deck(prs).close(), repeat=repeat))
+        with deck.serialize_deck(prs) as out:
+            metrics["deck_bytes"] = out.seek(0, os.SEEK_END)
+        metrics["slides"] = len(prs.slides)
+        metrics["shapes"] = sum(len(slide.shapes) for slide in prs.slides)
+        metrics["shapes_per_slide"] = {fn.__name__: len(slide.shapes) for fn, slide in zip(deck.SLIDES, prs.slides)}
+    return stages, metrics
+
+
+def shape_specs(count, seed=0):
+    rng = random.Random(seed)
+    colors = [deck.ACCENT, deck.PRIMARY, deck.SUCCESS, deck.WARNING]
+    return [
+        (MSO_SHAPE.OVAL, rng.uniform(0, 12), rng.uniform(1, 7), 0.23, 0.23, rng.choice(colors))
+        for _ in range(count)
+    ]
+
+
+def per_shape(slide, specs):
+    # The path the slide functions used before add_shapes(): one proxy and several setters per shape.
+    for kind, left, top, width, height, fill in specs:
+        shp = slide.shapes.add_shape(kind, Inches(left), Inches(top), Inches(width), Inches(height))
+        shp.fill.solid()
+        shp.fill.fore_color.rgb = fill
+        shp.line.fill.background()
+
+
+def bulk(slide, specs):
+    deck.add_shapes(slide, specs)
+
+
+def time_emitter(fn, specs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        prs = deck.new_presentation()
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        started = time.perf_counter()
+        fn(slide, specs)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench_shapes(counts=SHAPE_COUNTS, repeat=5):
+    results = []
+    for count in counts:
+        specs = shape_specs(count)
+        # Quadratic id scans make the slow path minutes long at 10k shapes; time it once there.
+        rounds = repeat if count <= 1000 else 1
+        slow = time_emitter(per_shape, specs, rounds)
+        fast = time_emitter(bulk, specs, rounds)
+        results.append({"shapes": count, "add_shape": slow, "add_shapes": fast, "speedup": slow / fast})
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "python_pptx": pptx.__version__,
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(current, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    # Returns (lines, regressions); stages are matched by name, metrics by key.
+    lines, regressions = [], []
+    before = {row["stage"]: row for row in baseline.get("stages", [])}
+    for row in current["stages"]:
+        old = before.get(row["stage"])
+        if old is None:
+            continue
+        change = row["wall"] / old["wall"] - 1 if old["wall"] else 0.0
+        flag = "REGRESSION" if change > threshold and row["wall"] - old["wall"] > min_delta else ""
+        if flag:
+            regressions.append(row["stage"])
+        lines.append(f"{row['stage']:<32} {old['wall'] * 1000:>10.2f}ms {row['wall'] * 1000:>10.2f}ms {change:>+8.1%} {flag}")
+    for key in ("deck_bytes", "media_bytes", "shapes"):
+        old, new = baseline.get("metrics", {}).get(key), current["metrics"].get(key)
+        if old is None or new is None:
+            continue
+        change = new / old - 1 if old else 0.0
+        flag = "REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(key)
+        lines.append(f"{key:<32} {old:>12} {new:>12} {change:>+8.1%} {flag}")
+    return lines, regressions
+
+
+def format_stages(stages):
+    lines = [f"{'stage':<32} {'wall':>10} {'cpu':>10} {'peak':>10}"]
+    for row in stages:
+        lines.append(f"{row['stage']:<32} {row['wall'] * 1000:>8.2f}ms {row['cpu'] * 1000:>8.2f}ms {row['peak_bytes'] / 1024:>8.0f}KB")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of a pitch deck build.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement; the best is kept")
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--compare", type=Path, help="compare against results written earlier with --json")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative slowdown reported as a regression")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA, help="seconds a stage must slow down by to count")
+    parser.add_argument("--emitter", action="store_true", help="also time add_shape() against add_shapes()")
+    parser.add_argument("--shapes", type=int, nargs="+", default=list(SHAPE_COUNTS), help="shape counts for --emitter")
+    args = parser.parse_args(argv)
+
+    stages, metrics = bench_stages(args.repeat)
+    result = {"version": BENCH_VERSION, "environment": environment(), "stages": stages, "metrics": metrics}
+    print(format_stages(stages))
+    print(f"deck {metrics['deck_bytes']} bytes, media {metrics['media_bytes']} bytes, {metrics['shapes']} shapes on {metrics['slides']} slides")
+
+    if args.emitter:
+        result["emitter"] = bench_shapes(args.shapes)
+        print(f"\n{'shapes':>8} {'add_shape':>12} {'add_shapes':>12} {'speedup':>8}")
+        for row in result["emitter"]:
+            print(f"{row['shapes']:>8} {row['add_shape'] * 1000:>10.2f}ms {row['add_shapes'] * 1000:>10.2f}ms {row['speedup']:>7.1f}x")
+
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        lines, regressions = compare(result, baseline, args.threshold, args.min_delta)
+        print(f"\ncompared with {baseline.get('environment', {}).get('commit') or args.compare}")
+        print("\n".join(lines))
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,501 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import pickle
+import time
+from pathlib import Path
+
+import pptx
+from pptx.dml.color import RGBColor
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.enum.text import MSO_AUTO_SIZE, PP_ALIGN
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.util import Emu, Pt
+
+import create_pitchdeck as deck
+
+# Compiles a .pen design document (a JSON tree of frame/rectangle/text nodes) into a deck, one
+# slide per top-level frame. Layout is flex-like: a frame with layout vertical/horizontal stacks
+# its children with gap and padding; sizes are numbers, "fill_container" or "fit_content".
+PEN_VERSION = 1
+BOLD_WEIGHTS = {"semibold", "bold", "extrabold", "black", "600", "700", "800", "900"}
+ALIGN = {"left": PP_ALIGN.LEFT, "center": PP_ALIGN.CENTER, "right": PP_ALIGN.RIGHT, "justify": PP_ALIGN.JUSTIFY}
+WATCH_INTERVAL = 0.25
+
+
+class PenError(ValueError):
+    pass
+
+
+# id(node) -> subtree hash for the document being compiled; subtree hash -> node; and
+# (subtree hash, width, height) -> placed children. The last two outlive a compile, so a
+# subtree that did not change is laid out once per --watch session; forget_stale() trims
+# them to the latest document so edits do not pile up.
+_hashes = {}
+_nodes = {}
+_layouts = {}
+_compiler_digest = None
+
+
+def node_hash(node):
+    digest = _hashes.get(id(node))
+    if digest is None:
+        digest = _hashes[id(node)] = hashlib.sha256(json.dumps(node, sort_keys=True).encode()).hexdigest()[:32]
+        _nodes[digest] = node
+    return digest
+
+
+def forget_stale():
+    # Keep only the subtrees hashed by the compile that just ran.
+    live = set(_hashes.values())
+    for digest in [d for d in _nodes if d not in live]:
+        del _nodes[digest]
+    for key in [k for k in _layouts if k[0] not in live]:
+        del _layouts[key]
+
+
+def compiler_digest():
+    global _compiler_digest
+    if _compiler_digest is None:
+        text = Path(__file__).read_text() + deck.helpers_digest() + pptx.__version__
+        _compiler_digest = hashlib.sha256(text.encode()).hexdigest()
+    return _compiler_digest
+
+
+def visible(node):
+    return [child for child in node.get("children", []) if child.get("enabled", True) is not False]
+
+
+def padding(node):
+    # (top, right, bottom, left), from a number, [vertical, horizontal] or four values.
+    pad = node.get("padding", 0)
+    if isinstance(pad, (int, float)):
+        return (pad,) * 4
+    if len(pad) == 2:
+        return (pad[0], pad[1], pad[0], pad[1])
+    if len(pad) == 4:
+        return tuple(pad)
+    raise PenError(f"{node.get('name', node.get('id'))}: padding must be a number or a list of 2 or 4")
+
+
+def text_style(node):
+    weight = str(node.get("fontWeight", "normal")).lower()
+    return node.get("fontFamily", deck.FONT), float(node.get("fontSize", 14)), weight in BOLD_WEIGHTS
+
+
+def wraps(node):
+    return node.get("textGrowth") == "fixed-width" or isinstance(node.get("width"), (int, float))
+
+
+def text_lines(node, width=None):
+    family, size, bold = text_style(node)
+    content = str(node.get("content", ""))
+    return content.split("\n") if width is None else deck.wrap_text(content, width, family, size, bold)
+
+
+def intrinsic(node, width=None):
+    # Natural (width, height); with a width, only the height is natural (text wraps to it).
+    kind = node.get("type")
+    if kind == "text":
+        family, size, bold = text_style(node)
+        lines = text_lines(node, width if width is not None and wraps(node) else None)
+        w, h = deck.measure_text("\n".join(lines), family, size, bold)
+        return (w if width is None else width), h
+    if kind != "frame":
+        return (width or 0.0), 0.0
+    top, right, bottom, left = padding(node)
+    inner = ((width - left - right) if width is not None else None, None)
+    children = visible(node)
+    sizes = [child_size(child, inner, None) for child in children]
+    mode = node.get("layout")
+    if mode == "vertical":
+        w = max((s[0] for s in sizes), default=0.0)
+        h = sum(s[1] for s in sizes) + node.get("gap", 0) * max(0, len(sizes) - 1)
+    elif mode == "horizontal":
+        w = sum(s[0] for s in sizes) + node.get("gap", 0) * max(0, len(sizes) - 1)
+        h = max((s[1] for s in sizes), default=0.0)
+    else:
+        w = max((child.get("x", 0) + s[0] for child, s in zip(children, sizes)), default=0.0)
+        h = max((child.get("y", 0) + s[1] for child, s in zip(children, sizes)), default=0.0)
+    return (width if width is not None else w + left + right), h + top + bottom
+
+
+def child_size(child, inner, main):
+    # [width, height] of child inside a box of inner (width, height; None while unknown). A
+    # fill_container size along the main axis stays None for the parent to share out.
+    size = [None, None]
+    fill_main = False
+    for axis, name in enumerate(("width", "height")):
+        value = child.get(name)
+        if isinstance(value, (int, float)):
+            size[axis] = float(value)
+        elif value == "fill_container" and axis == main:
+            fill_main = True
+        elif value == "fill_container" and inner[axis] is not None:
+            size[axis] = float(inner[axis])
+    if size[0] is None and not (fill_main and main == 0):
+        size[0] = intrinsic(child)[0]
+    if size[1] is None and not (fill_main and main == 1):
+        size[1] = intrinsic(child, size[0])[1]
+    if not fill_main:
+        size = [v or 0.0 for v in size]
+    return size
+
+
+def layout(node, width, height):
+    # Children of node in a width x height box, as (subtree hash, x, y, width, height) relative to node.
+    key = (node_hash(node), width, height)
+    placed = _layouts.get(key)
+    if placed is None:
+        placed = _layouts[key] = tuple(_layout(node, width, height))
+    return placed
+
+
+def _layout(node, width, height):
+    top, right, bottom, left = padding(node)
+    inner = (width - left - right, height - top - bottom)
+    children = visible(node)
+    mode = node.get("layout")
+    if mode not in ("vertical", "horizontal"):
+        for child in children:
+            w, h = child_size(child, inner, None)
+            yield node_hash(child), float(child.get("x", 0)), float(child.get("y", 0)), w, h
+        return
+
+    main = 1 if mode == "vertical" else 0
+    cross = 1 - main
+    gap = node.get("gap", 0)
+    sizes = [child_size(child, inner, main) for child in children]
+    used = sum(s[main] for s in sizes if s[main] is not None) + gap * max(0, len(children) - 1)
+    fills = [size for size in sizes if size[main] is None]
+    free = max(0.0, inner[main] - used)
+    for size in fills:
+        size[main] = free / len(fills)
+    if fills:
+        free = 0.0
+
+    justify = node.get("justifyContent", "start")
+    pos, spacing = 0.0, gap
+    if justify == "center":
+        pos = free / 2
+    elif justify == "end":
+        pos = free
+    elif justify == "space_between" and len(children) > 1:
+        spacing = gap + free / (len(children) - 1)
+    align = node.get("alignItems", "start")
+    origin = (left, top)
+    for child, size in zip(children, sizes):
+        slack = inner[cross] - size[cross]
+        xy = [0.0, 0.0]
+        xy[main] = origin[main] + pos
+        xy[cross] = origin[cross] + (slack / 2 if align == "center" else slack if align == "end" else 0.0)
+        yield node_hash(child), xy[0], xy[1], size[0], size[1]
+        pos += size[main] + spacing
+
+
+def parse_color(value):
+    # "#RGB", "#RRGGBB" or "#RRGGBBAA" -> (RGBColor, alpha 0-1).
+    text = str(value).lstrip("#")
+    if len(text) == 3:
+        text = "".join(c * 2 for c in text)
+    try:
+        color = RGBColor.from_string(text[:6].upper())
+        alpha = int(text[6:8], 16) / 255 if len(text) == 8 else 1.0
+    except ValueError as exc:
+        raise PenError(f"bad color {value!r}") from exc
+    return color, alpha
+
+
+def set_alpha(color_el, alpha):
+    if alpha < 1:
+        color_el.append(parse_xml(f'<a:alpha {nsdecls("a")} val="{round(alpha * 100000)}"/>'))
+
+
+def apply_fill(shape, spec):
+    fill = shape.fill
+    if isinstance(spec, str):
+        spec = {"type": "color", "color": spec}
+    if not spec or spec.get("enabled") is False:
+        fill.background()
+        return
+    if spec.get("type") == "color":
+        color, alpha = parse_color(spec["color"])
+        fill.solid()
+        fill.fore_color.rgb = color
+        set_alpha(shape._element.spPr.find(qn("a:solidFill"))[0], alpha)
+    elif spec.get("type") == "gradient":
+        # .pen rotation is clockwise from pointing up.
+        stops = [(stop["position"], *parse_color(stop["color"])) for stop in spec.get("colors", [])]
+        if len(stops) < 2:
+            raise PenError(f"a gradient needs at least two color stops, got {len(stops)}")
+        radial = spec.get("gradientType") == "radial"
+        deck.gradient(fill, stops, None if radial else (90 - spec.get("rotation", 180)) % 360)
+    else:
+        raise PenError(f"unsupported fill type {spec.get('type')!r}")
+
+
+def apply_effects(shape, node, ctx):
+    effects = node.get("effect") or []
+    for effect in effects if isinstance(effects, list) else [effects]:
+        if effect.get("type") != "shadow" or effect.get("shadowType", "outer") != "outer" or effect.get("enabled") is False:
+            continue
+        color, alpha = parse_color(effect.get("color", "#00000040"))
+        dx, dy = effect.get("offset", {}).get("x", 0), effect.get("offset", {}).get("y", 0)
+        deck.add_shadow(
+            shape,
+            blur=effect.get("blur", 0) * ctx["inch"],
+            distance=math.hypot(dx, dy) * ctx["inch"],
+            alpha=alpha,
+            direction=math.degrees(math.atan2(dy, dx)) % 360,
+            color=color,
+        )
+
+
+def emu(ctx, *values):
+    return [Emu(round(v * ctx["emu"])) for v in values]
+
+
+def add_box(slide, node, x, y, w, h, ctx):
+    radius = node.get("cornerRadius", 0)
+    radius = max(radius) if isinstance(radius, list) else radius
+    shape = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE if radius else MSO_SHAPE.RECTANGLE, *emu(ctx, x, y, w, h))
+    shape.name = node.get("name", shape.name)
+    if radius and min(w, h):
+        shape.adjustments[0] = min(0.5, radius / min(w, h))
+    apply_fill(shape, node.get("fill"))
+    stroke = node.get("stroke")
+    if stroke and stroke.get("thickness", 1) and stroke.get("fill"):
+        color, alpha = parse_color(stroke["fill"] if isinstance(stroke["fill"], str) else stroke["fill"].get("color"))
+        shape.line.color.rgb = color
+        shape.line.width = Pt(stroke.get("thickness", 1) * ctx["pt"])
+        set_alpha(shape._element.spPr.find(f"{qn('a:ln')}/{qn('a:solidFill')}")[0], alpha)
+    else:
+        shape.line.fill.background()
+    apply_effects(shape, node, ctx)
+    return shape
+
+
+def add_image(slide, node, x, y, w, h, ctx):
+    spec = node["fill"]
+    path = ctx["base"] / spec["url"]
+    try:
+        _, (iw, ih) = deck.source_info(path)
+    except OSError as exc:
+        raise PenError(f"{node.get('name', node.get('id'))}: cannot read image {path}: {exc}") from exc
+    mode = spec.get("mode", "fill")
+    if mode == "fit":
+        scale = min(w / iw, h / ih)
+        x, y, w, h = x + (w - iw * scale) / 2, y + (h - ih * scale) / 2, iw * scale, ih * scale
+    pic = slide.shapes.add_picture(deck.picture_source(path), *emu(ctx, x, y, w, h))
+    pic.name = node.get("name", pic.name)
+    if mode == "fill":
+        # Cover the box: crop the image's overflowing sides evenly.
+        extra = 1 - min(1.0, (w / h) / (iw / ih), (h / w) / (ih / iw))
+        if iw / ih > w / h:
+            pic.crop_left = pic.crop_right = extra / 2
+        else:
+            pic.crop_top = pic.crop_bottom = extra / 2
+    return pic
+
+
+def add_text(slide, node, x, y, w, h, ctx):
+    family, size, bold = text_style(node)
+    box = slide.shapes.add_textbox(*emu(ctx, x, y, w, h))
+    box.name = node.get("name", box.name)
+    tf = box.text_frame
+    tf.margin_left = tf.margin_right = tf.margin_top = tf.margin_bottom = 0
+    tf.word_wrap = wraps(node)
+    tf.auto_size = MSO_AUTO_SIZE.NONE
+    fill = node.get("fill", "#000000")
+    color, alpha = parse_color(fill if isinstance(fill, str) else fill.get("color", "#000000"))
+    # Runs inherit the theme's body size, minor font and text color; only differences are written.
+    size = Pt(size * ctx["pt"])
+    for n, line in enumerate(str(node.get("content", "")).split("\n")):
+        p = tf.paragraphs[0] if n == 0 else tf.add_paragraph()
+        if node.get("textAlign", "left") != "left":
+            p.alignment = ALIGN.get(node["textAlign"], PP_ALIGN.LEFT)
+        run = p.add_run()
+        run.text = line
+        deck.theme_font(run.font, family)
+        if size != Pt(deck.TEXT_SIZE):
+            run.font.size = size
+        if bold:
+            run.font.bold = True
+        if color != deck.TEXT or alpha < 1:
+            deck.theme_color(run.font, color)
+            set_alpha(run._r.find(f"{qn('a:rPr')}/{qn('a:solidFill')}")[0], alpha)
+    return box
+
+
+def emit(slide, node, x, y, w, h, ctx):
+    kind = node.get("type")
+    if kind == "text":
+        add_text(slide, node, x, y, w, h, ctx)
+        return
+    if kind not in ("frame", "rectangle"):
+        raise PenError(f"{node.get('name', node.get('id'))}: unsupported node type {kind!r}")
+    fill = node.get("fill")
+    if isinstance(fill, dict) and fill.get("type") == "image" and fill.get("enabled", True):
+        add_image(slide, node, x, y, w, h, ctx)
+    elif fill or node.get("stroke") or node.get("effect"):
+        add_box(slide, node, x, y, w, h, ctx)
+    if kind == "frame":
+        for digest, cx, cy, cw, ch in layout(node, w, h):
+            emit(slide, _nodes[digest], x + cx, y + cy, cw, ch, ctx)
+
+
+def render_frame(prs, frame, base):
+    # The frame is the page: its fill becomes a full-bleed background, and its own corner radius,
+    # stroke and shadow (which frame it on the .pen canvas) are dropped.
+    width, height = float(frame["width"]), float(frame["height"])
+    ctx = {"emu": prs.slide_width / width, "pt": deck.WIDTH * 72 / width, "inch": deck.WIDTH / width, "base": base}
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    if frame.get("fill"):
+        add_box(slide, {"name": frame.get("name", "page"), "fill": frame["fill"]}, 0, 0, width, height, ctx)
+    for digest, x, y, w, h in layout(frame, width, height):
+        emit(slide, _nodes[digest], x, y, w, h, ctx)
+    return slide
+
+
+def frame_key(frame, base):
+    # Everything a frame's slide depends on: its subtree, the images and fonts it uses, this
+    # compiler and the deck helpers it calls.
+    parts = [str(PEN_VERSION), compiler_digest(), node_hash(frame), str(deck.WIDTH)]
+    stack = [frame]
+    while stack:
+        node = stack.pop()
+        stack.extend(visible(node))
+        fill = node.get("fill")
+        if isinstance(fill, dict) and fill.get("type") == "image":
+            try:
+                parts.append(deck.source_info(base / fill["url"])[0])
+            except OSError as exc:
+                raise PenError(f"{node.get('name', node.get('id'))}: cannot read image {base / fill['url']}: {exc}") from exc
+        if node.get("type") == "text":
+            family, _, bold = text_style(node)
+            parts.append(str(deck.font_file(family, bold)))
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:32]
+
+
+def load_pen(path):
+    try:
+        doc = json.loads(Path(path).read_bytes())
+    except ValueError as exc:
+        raise PenError(f"{path}: {exc}") from exc
+    if not isinstance(doc, dict) or not isinstance(doc.get("children"), list):
+        raise PenError(f"{path}: expected an object with a 'children' list of frames")
+    frames = [node for node in doc["children"] if node.get("type") == "frame"]
+    for frame in frames:
+        if not isinstance(frame.get("width"), (int, float)) or not isinstance(frame.get("height"), (int, float)):
+            raise PenError(f"{path}: frame {frame.get('name', frame.get('id'))!r} needs a numeric width and height")
+    return frames
+
+
+def select_frames(frames, names):
+    # By id, name ("01 Cover"), name without its number ("cover"), or 1-based position.
+    picked = []
+    for name in names:
+        want = name.strip().lower()
+        for n, frame in enumerate(frames, start=1):
+            label = str(frame.get("name", "")).lower()
+            if want in (str(n), str(frame.get("id", "")).lower(), label, label.lstrip("0123456789 ")):
+                picked.append(frame)
+                break
+        else:
+            choices = ", ".join(str(frame.get("name", frame.get("id"))) for frame in frames)
+            raise PenError(f"unknown frame {name!r}; choose from {choices} or 1-{len(frames)}")
+    return picked
+
+
+def compile_pen(path, output=None, frames=None, cache=True):
+    started = time.perf_counter()
+    path = Path(path)
+    base = path.parent
+    selected = load_pen(path)
+    if frames:
+        selected = select_frames(selected, frames)
+    _hashes.clear()
+    directory = deck.CACHE_DIR / "pen"
+    directory.mkdir(parents=True, exist_ok=True)
+    prs = deck.new_presentation()
+    stats = {"reused": [], "rebuilt": []}
+    images = {}
+    for frame in selected:
+        name = str(frame.get("name", frame.get("id")))
+        cached_path = directory / f"{frame_key(frame, base)}.pickle"
+        cached = None
+        if cache:
+            try:
+                cached = pickle.loads(cached_path.read_bytes())
+            except (OSError, pickle.UnpicklingError, EOFError):
+                cached = None
+        if cached is not None:
+            deck.restore_slide(prs, cached, images)
+            os.utime(cached_path)
+            stats["reused"].append(name)
+            continue
+        with deck.span(f"frame:{name}", "slide"):
+            slide = render_frame(prs, frame, base)
+        deck.index_images(slide, images)
+        captured = deck.capture_slide(slide)
+        if captured is not None:
+            deck.atomic_write(cached_path, pickle.dumps(captured))
+        stats["rebuilt"].append(name)
+    deck._prune_slide_cache(directory)
+    forget_stale()
+    output = output or path.with_suffix(".pptx")
+    digest, written, _ = deck.save_deck(prs, output)
+    return {"path": output, "frames": stats, "sha256": digest, "written": written, "seconds": time.perf_counter() - started}
+
+
+def report(result):
+    rebuilt = ", ".join(result["frames"]["rebuilt"]) or "none"
+    return (
+        f"{'Saved' if result['written'] else 'Unchanged'} {result['path']} in {result['seconds'] * 1000:.0f}ms "
+        f"(reused {len(result['frames']['reused'])} frames; rebuilt: {rebuilt}; sha256 {result['sha256']})"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a .pen design document into a PowerPoint deck.")
+    parser.add_argument("pen", type=Path, help="the .pen document, e.g. pitch.pen")
+    parser.add_argument("--output", type=Path, help="where to write the deck (default: next to the .pen file)")
+    parser.add_argument(
+        "--frames",
+        type=lambda v: [name for name in v.split(",") if name.strip()],
+        help="comma-separated frames to compile, in order, by name (Cover, '01 Cover'), id or 1-based position",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="re-render every frame instead of reusing unchanged ones")
+    parser.add_argument("--reproducible", action="store_true", help="byte-identical output for identical inputs")
+    parser.add_argument("--watch", action="store_true", help="recompile whenever the .pen file changes")
+    args = parser.parse_args(argv)
+
+    if args.reproducible:
+        deck.REPRODUCIBLE = True
+    try:
+        print(report(compile_pen(args.pen, args.output, args.frames, cache=not args.no_cache)))
+    except PenError as exc:
+        raise SystemExit(str(exc))
+    if not args.watch:
+        return
+    stamp = args.pen.stat().st_mtime_ns
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            current = args.pen.stat().st_mtime_ns
+            if current == stamp:
+                continue
+            stamp = current
+            try:
+                print(report(compile_pen(args.pen, args.output, args.frames, cache=not args.no_cache)))
+            except PenError as exc:
+                print(f"error: {exc}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,79 @@
-from datetime import datetime
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import BytesIO
 from pathlib import Path
-from urllib.request import Request, urlopen
 
-from PIL import Image
+import pptx
+from PIL import Image, ImageFont
 from pptx import Presentation
 from pptx.chart.data import CategoryChartData
 from pptx.dml.color import RGBColor
-from pptx.enum.chart import XL_CHART_TYPE
+from pptx.enum.chart import XL_LEGEND_POSITION, XL_MARKER_STYLE
+from pptx.enum.dml import MSO_THEME_COLOR
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.enum.text import PP_ALIGN
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import serialize_part_xml
+from pptx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+from pptx.oxml.xmlchemy import OxmlElement
+from pptx.parts.chart import ChartPart
+from pptx.parts.image import Image as PartImage
+from pptx.parts.image import ImagePart
+from pptx.parts.slide import SlideLayoutPart
+from pptx.shapes.autoshape import AutoShapeType
+from pptx.shapes.shapetree import SlideShapeFactory, SlideShapes
 from pptx.util import Inches, Pt
 
+import pitchdeck_cache as cache
+import pitchdeck_charts as charts
+import pitchdeck_spec
+from pitchdeck_cache import (
+    CACHE_DIR,
+    FetchError,
+    atomic_write,
+    close_connections,
+    fetch_images,
+    fetch_one,
+    is_fresh,
+    keep_stale,
+    load_meta,
+    meta_path,
+    safe_name,
+    usable,
+)
+from pitchdeck_charts import CHART_KINDS, ChartError, chart_series, chart_source, chart_stamps
+from pitchdeck_profile import (
+    chrome_trace,
+    format_profile,
+    group_spans,
+    profile_origin,
+    record_spans,
+    span,
+    span_count,
+    start_profile,
+    stop_profile,
+)
+from pitchdeck_spec import ALIGN, SPEC_VERSION, SpecError, compile_spec_data, parse_spec
+
 
 WIDTH = 13.333
 HEIGHT = 7.5
@@ -41,11 +104,79 @@ ORANGE = WARNING
 FONT = "Inter"
 FONT_HEAD = "Inter SemiBold"
 FONT_SCRIPT = "Segoe Script"
+TEXT_SIZE = 20
+
+# Tokens written into the deck theme. Text in a scheme color references the slot, and FONT and
+# FONT_HEAD are the theme's minor and major fonts, so a deck can be re-themed via apply_theme().
+THEME_COLORS = (
+    ("dk1", TEXT),
+    ("lt1", WHITE),
+    ("dk2", PRIMARY_SOFT),
+    ("lt2", BACKGROUND),
+    ("accent1", ACCENT),
+    ("accent2", SUCCESS),
+    ("accent3", WARNING),
+    ("accent4", MUTED),
+    ("accent5", BLUE_LIGHT),
+    ("accent6", BORDER),
+    ("hlink", ACCENT),
+    ("folHlink", PRIMARY_SOFT),
+)
+SCHEME_SLOTS = {
+    "dk1": MSO_THEME_COLOR.TEXT_1,
+    "lt1": MSO_THEME_COLOR.BACKGROUND_1,
+    "dk2": MSO_THEME_COLOR.TEXT_2,
+    "lt2": MSO_THEME_COLOR.BACKGROUND_2,
+    **{f"accent{n}": getattr(MSO_THEME_COLOR, f"ACCENT_{n}") for n in range(1, 7)},
+}
+
+# Drop shadow of cards, from the pitch.pen card effect (26px blur, 10px drop, #1E1E1E at 10% on a
+# 1366px-wide frame): blur and distance in inches, alpha 0-1.
+CARD_SHADOW = {"blur": 0.25, "distance": 0.1, "alpha": 0.1, "color": RGBColor(30, 30, 30)}
+# Cover backdrop: radial gradient from the centre out to the base color.
+COVER_BACKDROP = ((0, RGBColor(19, 22, 32)), (1, RGBColor(15, 18, 27)))
+
+# Draw shared slide chrome (background, header bar, title) once in custom master layouts
+# instead of repeating it as shapes on every slide.
+THEMED_LAYOUTS = True
 
 ASSETS = Path("assets")
 RAW = ASSETS / "raw"
 PROCESSED = ASSETS / "processed"
 
+# Slide XML cached under CACHE_DIR/slides; the least recently used past this many are pruned.
+SLIDE_CACHE_ENTRIES = 512
+
+# Derivative cache: entries are named by a hash of everything that affects their bytes.
+CACHE_BUDGET = int(os.environ.get("PITCHDECK_CACHE_BYTES", 256 * 1024 * 1024))
+CACHE_LOCK_TIMEOUT = 30
+DERIVATIVE_VERSION = 3
+ENCODER = {"quality": 92}
+# Derivatives are sized for this output resolution but never upscaled past the source crop.
+TARGET_DPI = 150
+# Optional cap on the summed bytes of all images in a deck; JPEG quality steps down to fit.
+MEDIA_BUDGET = None
+QUALITY_LADDER = (92, 86, 80, 74, 68, 62, 56, 50, 44, 38)
+# quality="auto" searches for the lowest JPEG quality whose luma SSIM reaches SSIM_TARGET.
+SSIM_TARGET = 0.985
+CHROMA_SSIM_TARGET = 0.97
+AUTO_QUALITY_RANGE = (30, 95)
+# Upper bound on decoded pixel buffers held at once, per image and across the derivative pool.
+MEMORY_CAP = int(os.environ.get("PITCHDECK_MEMORY_CAP", 512 * 1024 * 1024))
+
+# Deflate level for XML parts of a saved deck. Media and embedded workbooks are already
+# compressed and are stored as-is. Serialized decks stay in memory up to SPOOL_BYTES.
+ZIP_LEVEL = int(os.environ.get("PITCHDECK_ZIP_LEVEL", 6))
+STORED_TYPES = {"image/jpeg", "image/png", "image/gif", CT.SML_SHEET}
+SPOOL_BYTES = 64 * 1024 * 1024
+# Byte-reproducible output: fixed zip metadata, sorted parts, renumbered shape ids and document
+# dates pinned to SOURCE_DATE_EPOCH (or 2020-01-01). On by default when SOURCE_DATE_EPOCH is set.
+REPRODUCIBLE = "SOURCE_DATE_EPOCH" in os.environ
+PINNED_DATE = datetime.fromtimestamp(int(os.environ.get("SOURCE_DATE_EPOCH", 1577836800)), timezone.utc)
+
+
+log = logging.getLogger(__name__)
+
 IMAGE_URLS = {
     "cover": "https://loremflickr.com/1920/1080/students,classroom,africa?lock=101",
     "problem": "https://loremflickr.com/1920/1080/teacher,stress?lock=102",
@@ -61,111 +192,999 @@ IMAGE_URLS = {
     "team_4": "https://randomuser.me/api/portraits/women/44.jpg",
 }
 
+# Everything that differs between the decks we send to schools and partners.
+# "images" maps a photo key to a replacement URL or local file.
+CONTENT = {
+    "name": "Teacher Copilot",
+    "revenue": ("$5.4M", "$14.4M", "$248M+"),
+    "raise": "$3M",
+    "allocation": (40, 30, 20, 10),
+    "team": (
+        ("team_1", "Founder & CEO"),
+        ("team_2", "CTO"),
+        ("team_3", "Head of Partnerships"),
+        ("team_4", "Education Advisors"),
+    ),
+    "contact": "email@example.com  |  www.teachercopilot.com",
+    "images": {},
+    # Chart name -> data source (see chart_source), e.g. "revenue": {"file": "revenue.csv", "x": "year",
+    # "y": "arr"}. A bound chart replaces the drawn bars on slide_revenue and slide_gtm, or the
+    # literal values of the "impact" and "allocation" pies.
+    "charts": {},
+}
 
-def safe_name(key):
-    return "".join(ch if ch.isalnum() or ch in ("_", "-") else "_" for ch in key)
 
+# Asset key -> local file for photos a deck supplies from disk instead of a URL.
+_local_sources = {}
 
-def fetch_images():
-    RAW.mkdir(parents=True, exist_ok=True)
-    for key, url in IMAGE_URLS.items():
-        dest = RAW / f"{safe_name(key)}.jpg"
-        if dest.exists() and dest.stat().st_size > 0:
-            continue
-        req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urlopen(req, timeout=30) as r:
-            data = r.read()
-        dest.write_bytes(data)
 
+def asset(content, key):
+    source = content.get("images", {}).get(key)
+    if source is None:
+        return key
+    if "://" in source:
+        return f"{safe_name(key)}-{hashlib.sha1(source.encode()).hexdigest()[:10]}"
+    path = Path(source).resolve()
+    name = f"{safe_name(key)}-{hashlib.sha1(str(path).encode()).hexdigest()[:10]}"
+    _local_sources[name] = path
+    return name
 
-def cropped_image(key, width_in, height_in):
-    PROCESSED.mkdir(parents=True, exist_ok=True)
-    src = RAW / f"{safe_name(key)}.jpg"
-    out = PROCESSED / f"{safe_name(key)}_{int(width_in * 100)}x{int(height_in * 100)}.jpg"
-    if out.exists() and out.stat().st_mtime >= src.stat().st_mtime:
-        return out
 
+def image_urls(content):
+    urls = dict(IMAGE_URLS)
+    for key, source in content.get("images", {}).items():
+        if "://" in source:
+            urls[asset(content, key)] = source
+    return urls
+
+
+def raw_path(key):
+    return _local_sources.get(key) or RAW / f"{safe_name(key)}.jpg"
+
+
+# (path, size, mtime_ns) -> (sha256 of the file, pixel size); rehashed only when the file changes.
+_source_info = {}
+
+
+def source_info(src):
+    st = src.stat()
+    stamp = (str(src), st.st_size, st.st_mtime_ns)
+    info = _source_info.get(stamp)
+    if info is None:
+        data = src.read_bytes()
+        with Image.open(BytesIO(data)) as img:
+            info = (hashlib.sha256(data).hexdigest(), img.size)
+        _source_info[stamp] = info
+    return info
+
+
+def crop_box(size, width_in, height_in):
+    w, h = size
     ratio = width_in / height_in
+    if w / h > ratio:
+        new_w = int(h * ratio)
+        left = (w - new_w) // 2
+        return (left, 0, left + new_w, h)
+    new_h = int(w / ratio)
+    top = (h - new_h) // 2
+    return (0, top, w, top + new_h)
+
+
+def target_pixels(box, width_in, height_in, dpi=None):
+    dpi = TARGET_DPI if dpi is None else dpi
+    want_w, want_h = width_in * dpi, height_in * dpi
+    scale = min(1.0, (box[2] - box[0]) / want_w, (box[3] - box[1]) / want_h)
+    return max(1, round(want_w * scale)), max(1, round(want_h * scale))
+
+
+def _spec_hash(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def derivative_spec(key, width_in, height_in, quality=None, dpi=None):
+    digest, size = source_info(raw_path(key))
+    box = crop_box(size, width_in, height_in)
+    pixels = target_pixels(box, width_in, height_in, dpi)
+    decode, reduced = decode_size(size, box, pixels, MEMORY_CAP)
+    spec = {
+        "version": DERIVATIVE_VERSION,
+        "source": digest,
+        "box": box,
+        "pixels": pixels,
+        "decode": decode,
+        "encoder": dict(ENCODER, quality=ENCODER["quality"] if quality is None else quality),
+    }
+    if reduced:
+        spec["reduced"] = True
+    if quality == "auto":
+        spec["encoder"] = {"quality": "auto", "ssim": SSIM_TARGET, "chroma_ssim": CHROMA_SSIM_TARGET}
+    spec["hash"] = _spec_hash(spec)
+    return spec
+
+
+def cache_path(digest):
+    return PROCESSED / f"{digest}.jpg"
+
+
+def derivative_path(key, width_in, height_in, quality=None, dpi=None):
+    return cache_path(derivative_spec(key, width_in, height_in, quality, dpi)["hash"])
+
+
+def derivative_fresh(key, width_in, height_in, quality=None, dpi=None):
+    return derivative_path(key, width_in, height_in, quality, dpi).exists()
+
+
+@contextmanager
+def _cache_lock():
+    lock = PROCESSED / "index.lock"
+    deadline = time.time() + CACHE_LOCK_TIMEOUT
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                # A builder that died while holding the lock leaves it behind.
+                if time.time() - lock.stat().st_mtime > CACHE_LOCK_TIMEOUT:
+                    lock.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"timed out waiting for {lock}")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            lock.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _load_index():
+    path = PROCESSED / "index.json"
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {"entries": {}}
+
+
+def _save_index(index):
+    atomic_write(PROCESSED / "index.json", json.dumps(index, indent=1, sort_keys=True).encode())
+
+
+def _record_entry(digest, key, size, info=None):
+    with _cache_lock():
+        index = _load_index()
+        index["entries"][digest] = dict(info or {}, key=key, size=size, used=time.time())
+        _save_index(index)
+
+
+def evict_cache(budget=None, keep=()):
+    budget = CACHE_BUDGET if budget is None else budget
+    PROCESSED.mkdir(parents=True, exist_ok=True)
+    with _cache_lock():
+        index = _load_index()
+        entries = index["entries"]
+        now = time.time()
+        for digest in list(entries):
+            if not cache_path(digest).exists():
+                del entries[digest]
+            elif digest in keep:
+                entries[digest]["used"] = now
+        total = sum(e["size"] for e in entries.values())
+        evicted = []
+        for digest, entry in sorted(entries.items(), key=lambda kv: kv[1]["used"]):
+            if total <= budget:
+                break
+            if digest in keep:
+                continue
+            try:
+                cache_path(digest).unlink()
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del entries[digest]
+            evicted.append(digest)
+        _save_index(index)
+    return evicted
+
+
+def _buffer_bytes(img):
+    return img.width * img.height * (1 if img.mode in ("1", "L", "P") else 4)
+
+
+def decode_size(size, box, pixels, cap=None):
+    # Smallest full-image decode whose crop still covers the target pixels.
+    want = (math.ceil(size[0] * pixels[0] / (box[2] - box[0])), math.ceil(size[1] * pixels[1] / (box[3] - box[1])))
+    if cap and want[0] * want[1] * 4 > cap:
+        shrink = math.sqrt(cap / (want[0] * want[1] * 4))
+        return (max(1, int(want[0] * shrink)), max(1, int(want[1] * shrink))), True
+    return want, False
+
+
+def _draft(img, spec):
+    # The JPEG decoder can scale by 1/2, 1/4 or 1/8 during decode; the crop box scales with it.
+    full = img.size
+    if img.format == "JPEG":
+        img.draft("RGB", tuple(spec["decode"]))
+    sx, sy = img.width / full[0], img.height / full[1]
+    box = spec["box"]
+    return (round(box[0] * sx), round(box[1] * sy), round(box[2] * sx), round(box[3] * sy))
+
+
+def estimate_peak(key, width_in, height_in, quality=None, dpi=None):
+    spec = derivative_spec(key, width_in, height_in, quality, dpi)
+    with Image.open(raw_path(key)) as img:
+        box = _draft(img, spec)
+        decoded = _buffer_bytes(img)
+    px = spec["pixels"][0] * spec["pixels"][1]
+    crop = (box[2] - box[0]) * (box[3] - box[1]) * 4
+    peak = decoded + crop + px * 4
+    if quality == "auto":
+        # Float64 YCbCr planes plus the SSIM window sums.
+        peak += px * 3 * 8 * 4
+    return peak
+
+
+def _resized(src, spec, stats=None):
     with Image.open(src) as img:
-        img = img.convert("RGB")
-        src_ratio = img.width / img.height
-        if src_ratio > ratio:
-            new_w = int(img.height * ratio)
-            left = (img.width - new_w) // 2
-            img = img.crop((left, 0, left + new_w, img.height))
-        else:
-            new_h = int(img.width / ratio)
-            top = (img.height - new_h) // 2
-            img = img.crop((0, top, img.width, top + new_h))
-        px_w = max(900, int(width_in * 220))
-        px_h = max(500, int(height_in * 220))
-        img = img.resize((px_w, px_h), Image.Resampling.LANCZOS)
-        img.save(out, format="JPEG", quality=92)
+        if spec.get("reduced"):
+            log.warning("%s: decoding below target resolution to stay under the memory cap", src)
+        box = _draft(img, spec)
+        img.load()
+        decoded = _buffer_bytes(img)
+        # Crop in the decoded mode first so any conversion only touches the kept region.
+        cropped = img.crop(box)
+    peak = decoded + _buffer_bytes(cropped)
+    if cropped.mode != "RGB":
+        converted = cropped.convert("RGB")
+        peak = max(peak, _buffer_bytes(cropped) + _buffer_bytes(converted))
+        cropped = converted
+    out = cropped.resize(tuple(spec["pixels"]), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    peak = max(peak, _buffer_bytes(cropped) + _buffer_bytes(out))
+    if stats is not None:
+        stats["peak_bytes"] = peak
     return out
 
 
-def style_text(shape, text, size=20, bold=False, color=TEXT, align=PP_ALIGN.LEFT, italic=False, font=FONT):
+def _encode(img, encoder):
+    buf = BytesIO()
+    img.save(buf, format="JPEG", **encoder)
+    return buf.getvalue()
+
+
+def _ycbcr(img):
+    import numpy as np
+
+    return np.asarray(img.convert("YCbCr"), dtype=np.float64)
+
+
+def ssim(a, b, window=7):
+    import numpy as np
+
+    # Mean SSIM over sliding uniform windows, with every window sum taken from one integral image.
+    def window_mean(x):
+        c = np.pad(x, ((1, 0), (1, 0))).cumsum(0).cumsum(1)
+        return (c[window:, window:] - c[:-window, window:] - c[window:, :-window] + c[:-window, :-window]) / window**2
+
+    if min(a.shape) < window:
+        return 1.0 if np.array_equal(a, b) else 0.0
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_a, mu_b = window_mean(a), window_mean(b)
+    var_a = window_mean(a * a) - mu_a**2
+    var_b = window_mean(b * b) - mu_b**2
+    cov = window_mean(a * b) - mu_a * mu_b
+    num = (2 * mu_a * mu_b + c1) * (2 * cov + c2)
+    den = (mu_a**2 + mu_b**2 + c1) * (var_a + var_b + c2)
+    return float((num / den).mean())
+
+
+def _decoded(data):
+    with Image.open(BytesIO(data)) as img:
+        return _ycbcr(img)
+
+
+def search_encoder(img):
+    ref = _ycbcr(img)
+    lo, hi = AUTO_QUALITY_RANGE
+
+    # 4:2:0 halves chroma resolution; keep full chroma only when that visibly hurts (fine colored detail).
+    probe = _decoded(_encode(img, {"quality": hi, "subsampling": 2}))
+    chroma = min(ssim(ref[..., i], probe[..., i]) for i in (1, 2))
+    subsampling = 2 if chroma >= CHROMA_SSIM_TARGET else 0
+
+    best = hi
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        got = _decoded(_encode(img, {"quality": mid, "subsampling": subsampling}))
+        if ssim(ref[..., 0], got[..., 0]) >= SSIM_TARGET:
+            best, hi = mid, mid - 1
+        else:
+            lo = mid + 1
+
+    # Progressive scans change only the byte layout, so keep whichever encoding is smaller.
+    settings = {"quality": best, "subsampling": subsampling, "progressive": False}
+    data = _encode(img, settings)
+    progressive = _encode(img, dict(settings, progressive=True))
+    if len(progressive) < len(data):
+        settings["progressive"], data = True, progressive
+    return data, settings
+
+
+def render_derivative(src, spec):
+    info = {}
+    img = _resized(src, spec, info)
+    if spec["encoder"]["quality"] == "auto":
+        data, info["settings"] = search_encoder(img)
+        return data, info
+    return _encode(img, spec["encoder"]), info
+
+
+def cropped_image(key, width_in, height_in, quality=None, dpi=None):
+    with span(f"cropped_image:{key}", "image") as args:
+        PROCESSED.mkdir(parents=True, exist_ok=True)
+        spec = derivative_spec(key, width_in, height_in, quality, dpi)
+        out = cache_path(spec["hash"])
+        args["hit"] = out.exists()
+        if args["hit"]:
+            return out
+        data, info = render_derivative(raw_path(key), spec)
+        atomic_write(out, data)
+        _record_entry(spec["hash"], key, len(data), info)
+        args["bytes_out"] = len(data)
+        return out
+
+
+def _ladder_key(key, width_in, height_in, dpi):
+    spec = derivative_spec(key, width_in, height_in, dpi=dpi)
+    del spec["hash"], spec["encoder"]["quality"]
+    return _spec_hash(spec)
+
+
+def quality_sizes(key, width_in, height_in, dpi=None):
+    spec = derivative_spec(key, width_in, height_in, dpi=dpi)
+    img = _resized(raw_path(key), spec)
+    return {q: len(_encode(img, dict(spec["encoder"], quality=q))) for q in QUALITY_LADDER}
+
+
+def allocate_quality(sizes, budget):
+    # Greedy: keep stepping down whichever image saves the most bytes until the deck fits.
+    level = {item: 0 for item in sizes}
+    total = sum(table[QUALITY_LADDER[0]] for table in sizes.values())
+    while total > budget:
+        best, saved = None, 0
+        for item, table in sizes.items():
+            i = level[item]
+            if i + 1 < len(QUALITY_LADDER):
+                gain = table[QUALITY_LADDER[i]] - table[QUALITY_LADDER[i + 1]]
+                if gain > saved:
+                    best, saved = item, gain
+        if best is None:
+            log.warning("media budget of %d bytes is unreachable; smallest deck media is %d bytes", budget, total)
+            break
+        level[best] += 1
+        total -= saved
+    return {item: QUALITY_LADDER[i] for item, i in level.items()}
+
+
+# While a crop plan is being collected, derivative() records requests instead of producing files.
+_crop_plan = None
+# (key, width_in, height_in) -> finished derivative path, filled by prepare_derivatives().
+# Settings such as quality and DPI are resolved there, so slide code only deals in inches.
+_derived = {}
+
+
+def derivative(key, width_in, height_in):
+    if _crop_plan is not None:
+        _crop_plan.append((key, width_in, height_in))
+        return None
+    path = _derived.get((key, width_in, height_in))
+    # Another build sharing the cache directory may have evicted it since it was prepared.
+    if path is not None and path.exists():
+        return path
+    return cropped_image(key, width_in, height_in)
+
+
+# Derivative bytes held in memory by long-running processes (serve_pitchdeck.py), LRU by total
+# size; 0 reads pictures from disk every time. Derivatives are content-addressed, so entries
+# never go stale.
+IMAGE_MEMORY_BYTES = 0
+_image_memory = OrderedDict()
+_image_memory_stats = {"bytes": 0, "hits": 0, "misses": 0}
+
+
+def picture_source(path):
+    if not IMAGE_MEMORY_BYTES:
+        return str(path)
+    data = _image_memory.get(path)
+    if data is not None:
+        _image_memory.move_to_end(path)
+        _image_memory_stats["hits"] += 1
+        return BytesIO(data)
+    data = Path(path).read_bytes()
+    _image_memory_stats["misses"] += 1
+    _image_memory[path] = data
+    _image_memory_stats["bytes"] += len(data)
+    while _image_memory_stats["bytes"] > IMAGE_MEMORY_BYTES and len(_image_memory) > 1:
+        _, evicted = _image_memory.popitem(last=False)
+        _image_memory_stats["bytes"] -= len(evicted)
+    return BytesIO(data)
+
+
+def _worker_config():
+    names = (
+        "RAW",
+        "PROCESSED",
+        "TARGET_DPI",
+        "ENCODER",
+        "SSIM_TARGET",
+        "CHROMA_SSIM_TARGET",
+        "AUTO_QUALITY_RANGE",
+        "MEMORY_CAP",
+        "THEMED_LAYOUTS",
+        "AUTOFIT",
+        "ZIP_LEVEL",
+        "REPRODUCIBLE",
+        "_local_sources",
+    )
+    config = {name: globals()[name] for name in names}
+    config["CHART_POINTS"] = charts.CHART_POINTS
+    config["_profile_origin"] = profile_origin()
+    return config
+
+
+_profile_origin = None
+
+
+def _init_worker(config):
+    config = dict(config)
+    charts.CHART_POINTS = config.pop("CHART_POINTS")
+    globals().update(config)
+
+
+def _pooled(fn, job):
+    # Pool workers profile their own jobs and hand the spans back to the parent's profile.
+    if _profile_origin is None:
+        return fn(job), []
+    start_profile(origin=_profile_origin)
+    try:
+        result = fn(job)
+    finally:
+        spans = stop_profile()
+    return result, spans
+
+
+def _crop_job(job):
+    return cropped_image(*job)
+
+
+def _sizes_job(job):
+    return quality_sizes(*job)
+
+
+def _run_jobs(fn, jobs, workers, costs=None):
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [fn(job) for job in jobs]
+    results = [None] * len(jobs)
+    pending = list(range(len(jobs)))
+    inflight = {}
+    used = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_worker_config(),)) as pool:
+        while pending or inflight:
+            # Admit jobs while their estimated pixel memory fits under the cap; a lone job always runs.
+            while pending and len(inflight) < workers:
+                cost = costs[pending[0]] if costs and MEMORY_CAP else 0
+                if inflight and used + cost > MEMORY_CAP:
+                    break
+                i = pending.pop(0)
+                inflight[pool.submit(_pooled, fn, jobs[i])] = (i, cost)
+                used += cost
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, cost = inflight.pop(fut)
+                used -= cost
+                results[i], spans = fut.result()
+                record_spans(spans)
+    return results
+
+
+def _quality_plan(plan, dpi, media_budget, workers):
+    known = _load_index().get("ladders", {})
+    ladder_keys = {item: _ladder_key(*item, dpi) for item in plan}
+    todo = [item for item in plan if ladder_keys[item] not in known]
+    costs = [estimate_peak(*item, dpi=dpi) for item in todo]
+    for item, sizes in zip(todo, _run_jobs(_sizes_job, [(*item, dpi) for item in todo], workers, costs)):
+        known[ladder_keys[item]] = {str(q): n for q, n in sizes.items()}
+    if todo:
+        with _cache_lock():
+            index = _load_index()
+            index.setdefault("ladders", {}).update({ladder_keys[item]: known[ladder_keys[item]] for item in todo})
+            _save_index(index)
+    sizes = {item: {int(q): n for q, n in known[ladder_keys[item]].items()} for item in plan}
+    return allocate_quality(sizes, media_budget)
+
+
+def prepare_derivatives(plan, workers=None, dpi=None, media_budget=None, quality=None):
+    with span("prepare_derivatives", "image", images=len(plan)):
+        return _prepare_derivatives(plan, workers, dpi, media_budget, quality)
+
+
+def _prepare_derivatives(plan, workers, dpi, media_budget, quality):
+    PROCESSED.mkdir(parents=True, exist_ok=True)
+    plan = list(dict.fromkeys(plan))
+    media_budget = MEDIA_BUDGET if media_budget is None else media_budget
+    if media_budget and quality is not None:
+        raise ValueError("a media budget picks JPEG quality itself; drop the explicit quality")
+    if media_budget:
+        quality = _quality_plan(plan, dpi, media_budget, workers)
+    else:
+        quality = dict.fromkeys(plan, quality)
+
+    todo = []
+    for item in plan:
+        path = derivative_path(*item, quality.get(item), dpi)
+        if path.exists():
+            _derived[item] = path
+        else:
+            todo.append(item)
+    jobs = [(*item, quality.get(item), dpi) for item in todo]
+    costs = [estimate_peak(*job) for job in jobs]
+    for item, path in zip(todo, _run_jobs(_crop_job, jobs, workers, costs)):
+        _derived[item] = path
+    return media_report(plan, quality, dpi)
+
+
+def media_report(plan, quality, dpi):
+    # Bytes and settings per derivative in plan, all already in _derived; quality maps item -> quality.
+    report = []
+    entries = _load_index()["entries"]
+    for key, width_in, height_in in plan:
+        spec = derivative_spec(key, width_in, height_in, quality.get((key, width_in, height_in)), dpi)
+        path = _derived[(key, width_in, height_in)]
+        entry = entries.get(path.stem, {})
+        settings = entry.get("settings", spec["encoder"])
+        report.append(
+            {
+                "key": key,
+                "item": (key, width_in, height_in),
+                "inches": (round(width_in, 2), round(height_in, 2)),
+                "pixels": spec["pixels"],
+                "quality": settings["quality"],
+                "bytes": path.stat().st_size,
+                "peak_bytes": entry.get("peak_bytes"),
+                "path": path,
+            }
+        )
+    if plan:
+        evict_cache(keep={entry["path"].stem for entry in report})
+    return report
+
+
+def format_media_report(report):
+    lines = [f"{'image':<12} {'inches':>11} {'pixels':>10} {'q':>3} {'bytes':>9} {'peak mem':>10}"]
+    for e in report:
+        inches = "{:.2f}x{:.2f}".format(*e["inches"])
+        pixels = "{}x{}".format(*e["pixels"])
+        peak = f"{e['peak_bytes']:,}" if e["peak_bytes"] is not None else "-"
+        lines.append(f"{e['key']:<12} {inches:>11} {pixels:>10} {e['quality']:>3} {e['bytes']:>9,} {peak:>10}")
+    lines.append(f"{'total':<12} {'':>11} {'':>10} {'':>3} {sum(e['bytes'] for e in report):>9,}")
+    return "\n".join(lines)
+
+
+def bind(shape, content, templates, size, font=FONT, bold=False, spacing=0):
+    # Name the shape after the templates that produced its text, and the style they are fitted
+    # in, so template clones can re-render and refit it.
+    shape.name = "text:" + json.dumps([list(templates), size, font, bold, spacing])
+    return [template.format(**content) for template in templates]
+
+
+def theme_color(font, color):
+    for slot, value in THEME_COLORS:
+        if value == color and slot in SCHEME_SLOTS:
+            font.color.theme_color = SCHEME_SLOTS[slot]
+            return
+    font.color.rgb = color
+
+
+def theme_font(font, name):
+    if name == FONT_HEAD:
+        font.name = "+mj-lt"
+    elif name != FONT:
+        font.name = name
+
+
+# Text measurement with Pillow. Families are matched by name to font files under FONT_DIRS; a
+# family that is not installed falls back to Pillow's bundled font, which is close enough for layout.
+FONT_DIRS = [
+    *(Path(p) for p in os.environ.get("PITCHDECK_FONT_DIRS", "").split(os.pathsep) if p),
+    ASSETS / "fonts",
+    Path.home() / ".fonts",
+    Path("/usr/share/fonts"),
+    Path("/Library/Fonts"),
+    Path("C:/Windows/Fonts"),
+]
+LINE_SPACING = 1.2
+# Glyph advances are read once per font at ADVANCE_SIZE and scaled; kerning is ignored.
+ADVANCE_SIZE = 1000
+# Shrink style_text()/style_bullets() text that overflows its box, in half points down to
+# MIN_TEXT_SIZE. Only the real font's metrics are trusted: text in a font that is not installed
+# keeps its size, so fitted sizes never depend on which fallback a machine happens to have.
+AUTOFIT = True
+MIN_TEXT_SIZE = 10
+# Default text box insets in points: 0.1in left and right, 0.05in top and bottom.
+TEXT_INSETS = (7.2, 3.6)
+LINE_BREAKS = re.compile("[\n\v]")
+_font_index = None
+_fonts = {}
+_advances = {}
+# (family, bold) already reported as missing, so each is warned about once per process.
+_unfitted = set()
+
+
+def _font_key(name):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def font_file(family, bold=False):
+    # Regular (or SemiBold/Bold when bold) upright file of family; "Inter SemiBold" names its weight.
+    global _font_index
+    if _font_index is None:
+        _font_index = [
+            (_font_key(path.stem), path)
+            for directory in FONT_DIRS
+            if directory.is_dir()
+            for path in sorted(directory.rglob("*"))
+            if path.suffix.lower() in (".ttf", ".otf")
+        ]
+    want = _font_key(family)
+    ranks = ("semibold", "bold", "", "regular", "medium") if bold else ("", "regular", "medium")
+    best = None
+    for name, path in _font_index:
+        rest = name[len(want):] if name.startswith(want) else None
+        if rest in ranks and (best is None or ranks.index(rest) < best[0]):
+            best = (ranks.index(rest), path)
+    return best and best[1]
+
+
+def load_font(family, size, bold=False):
+    key = (family, size, bold)
+    font = _fonts.get(key)
+    if font is None:
+        path = font_file(family, bold)
+        font = _fonts[key] = ImageFont.truetype(str(path), size) if path else ImageFont.load_default(size)
+    return font
+
+
+def text_width(text, family=FONT, size=TEXT_SIZE, bold=False):
+    # Width of one line of text in the units of size.
+    table = _advances.get((family, bold))
+    if table is None:
+        table = _advances[(family, bold)] = {}
+    try:
+        return sum(map(table.__getitem__, text)) * size
+    except KeyError:
+        font = load_font(family, ADVANCE_SIZE, bold)
+        for ch in set(text) - table.keys():
+            table[ch] = font.getlength(ch) / ADVANCE_SIZE
+        return sum(map(table.__getitem__, text)) * size
+
+
+def measure_text(text, family=FONT, size=TEXT_SIZE, bold=False):
+    # (width, height) of unwrapped text in the units of size; lines are LINE_SPACING * size apart.
+    lines = LINE_BREAKS.split(text)
+    return max(text_width(line, family, size, bold) for line in lines), len(lines) * size * LINE_SPACING
+
+
+def wrap_text(text, width, family=FONT, size=TEXT_SIZE, bold=False):
+    # Greedy word wrap of each line of text to width; a word wider than width gets a line to itself.
+    space = text_width(" ", family, size, bold)
+    lines = []
+    for para in LINE_BREAKS.split(text):
+        line, used = [], 0.0
+        for word in para.split(" "):
+            w = text_width(word, family, size, bold)
+            if line and used + space + w > width:
+                lines.append(" ".join(line))
+                line, used = [], 0.0
+            used += (space if line else 0.0) + w
+            line.append(word)
+        lines.append(" ".join(line))
+    return lines
+
+
+def fit_text(paragraphs, width, height=None, family=FONT, size=TEXT_SIZE, bold=False, spacing=0, wrap=False, min_size=MIN_TEXT_SIZE):
+    # Largest size <= size, in half points down to min_size, at which paragraphs fit width (and
+    # height, unless None) in points, with spacing points after each paragraph. Returns (size, fits).
+    def fits(size):
+        lines = [line for para in paragraphs for line in (wrap_text(para, width, family, size, bold) if wrap else LINE_BREAKS.split(para))]
+        if max(text_width(line, family, size, bold) for line in lines) > width:
+            return False
+        return height is None or len(lines) * size * LINE_SPACING + spacing * (len(paragraphs) - 1) <= height
+
+    while not fits(size):
+        if size <= min_size:
+            return size, False
+        size = max(min_size, math.ceil(size * 2 - 1) / 2)
+    return size, True
+
+
+def autofit(shape, paragraphs, size, font=FONT, bold=False, spacing=0):
+    # Font size for paragraphs in shape's box; overflow that cannot be fixed is logged. The height
+    # is only checked for several lines: single-line boxes are drawn tight and grow with their text.
+    if not AUTOFIT or _crop_plan is not None or not shape.width:
+        return size
+    if font_file(font, bold) is None:
+        if (font, bold) not in _unfitted:
+            _unfitted.add((font, bold))
+            log.warning("no metrics for %s%s; its text is not fitted (add the font to PITCHDECK_FONT_DIRS)", font, " bold" if bold else "")
+        return size
+    width = shape.width.pt - 2 * TEXT_INSETS[0]
+    lines = sum(len(LINE_BREAKS.split(para)) for para in paragraphs)
+    height = shape.height.pt - 2 * TEXT_INSETS[1] if lines > 1 else None
+    fitted, fits = fit_text(paragraphs, width, height, font, size, bold, spacing, shape.text_frame.word_wrap is True)
+    if not fits:
+        log.warning("text overflows its box on %s even at %gpt: %r at %gpt", shape.part.partname, fitted, paragraphs[0][:40], size)
+    return fitted
+
+
+# Text boxes inherit TEXT_SIZE, TEXT and FONT from the theme defaults; only differences are written.
+def style_text(shape, text, size=TEXT_SIZE, bold=False, color=TEXT, align=PP_ALIGN.LEFT, italic=False, font=FONT, content=None):
+    if content is not None:
+        text = bind(shape, content, [text], size, font, bold)[0]
+    size = autofit(shape, [text], size, font, bold)
     tf = shape.text_frame
     tf.clear()
     p = tf.paragraphs[0]
     p.text = text
-    p.alignment = align
-    p.font.size = Pt(size)
-    p.font.bold = bold
-    p.font.italic = italic
-    p.font.color.rgb = color
-    p.font.name = font
-
-
-def style_bullets(shape, items, size=20, color=TEXT, spacing=7):
+    if align != PP_ALIGN.LEFT:
+        p.alignment = align
+    if size != TEXT_SIZE:
+        p.font.size = Pt(size)
+    if bold:
+        p.font.bold = True
+    if italic:
+        p.font.italic = True
+    if color != TEXT:
+        theme_color(p.font, color)
+    theme_font(p.font, font)
+
+
+def style_bullets(shape, items, size=TEXT_SIZE, color=TEXT, spacing=7, content=None):
+    if content is not None:
+        items = bind(shape, content, items, size, spacing=spacing)
+    size = autofit(shape, items, size, spacing=spacing)
     tf = shape.text_frame
     tf.clear()
     for idx, item in enumerate(items):
         p = tf.paragraphs[0] if idx == 0 else tf.add_paragraph()
         p.text = item
-        p.level = 0
-        p.font.size = Pt(size)
-        p.font.color.rgb = color
-        p.font.name = FONT
+        if size != TEXT_SIZE:
+            p.font.size = Pt(size)
+        if color != TEXT:
+            theme_color(p.font, color)
         p.space_after = Pt(spacing)
 
 
-def add_background(slide, soft=False):
-    bg = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Inches(WIDTH), Inches(HEIGHT))
-    bg.fill.solid()
-    bg.fill.fore_color.rgb = BACKGROUND_SOFT if soft else BACKGROUND
-    bg.line.fill.background()
+def draw_background(shapes, soft=False, base=True):
+    if base:
+        bg = shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Inches(WIDTH), Inches(HEIGHT))
+        bg.fill.solid()
+        bg.fill.fore_color.rgb = BACKGROUND_SOFT if soft else BACKGROUND
+        bg.line.fill.background()
 
-    corner = slide.shapes.add_shape(MSO_SHAPE.OVAL, Inches(-1.5), Inches(5.3), Inches(5.4), Inches(3.4))
+    corner = shapes.add_shape(MSO_SHAPE.OVAL, Inches(-1.5), Inches(5.3), Inches(5.4), Inches(3.4))
     corner.fill.solid()
     corner.fill.fore_color.rgb = BLUE_LIGHT
     corner.fill.transparency = 0.5
     corner.line.fill.background()
 
-    corner2 = slide.shapes.add_shape(MSO_SHAPE.OVAL, Inches(9.7), Inches(0.2), Inches(4.4), Inches(2.8))
+    corner2 = shapes.add_shape(MSO_SHAPE.OVAL, Inches(9.7), Inches(0.2), Inches(4.4), Inches(2.8))
     corner2.fill.solid()
     corner2.fill.fore_color.rgb = RGBColor(244, 244, 245)
     corner2.fill.transparency = 0.4
     corner2.line.fill.background()
 
 
-def add_header(slide, title, right_text=None):
-    bar = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Inches(WIDTH), Inches(0.92))
+def draw_header_bar(shapes):
+    bar = shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Inches(WIDTH), Inches(0.92))
     bar.fill.solid()
     bar.fill.fore_color.rgb = PRIMARY
     bar.line.fill.background()
 
-    accent = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, Inches(0.82), Inches(WIDTH), Inches(0.1))
+    accent = shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, Inches(0.82), Inches(WIDTH), Inches(0.1))
     accent.fill.solid()
     accent.fill.fore_color.rgb = ACCENT
     accent.line.fill.background()
 
-    t = slide.shapes.add_textbox(Inches(0.34), Inches(0.13), Inches(8.7), Inches(0.58))
-    style_text(t, title, size=28, bold=True, color=PRIMARY_FG, font=FONT_HEAD)
+
+def gradient(fill, stops, angle=None):
+    # stops are (position 0-1, RGBColor) or (position, RGBColor, alpha 0-1), at least two; without
+    # an angle the gradient is radial from the centre.
+    fill.gradient()
+    gs_lst = fill._xPr.find(f"{qn('a:gradFill')}/{qn('a:gsLst')}")
+    for gs in list(gs_lst):
+        gs_lst.remove(gs)
+    for position, color, *alpha in stops:
+        gs = parse_xml(f'<a:gs {nsdecls("a")} pos="{round(position * 100000)}"><a:srgbClr val="{color}"/></a:gs>')
+        if alpha and alpha[0] < 1:
+            gs[0].append(parse_xml(f'<a:alpha {nsdecls("a")} val="{round(alpha[0] * 100000)}"/>'))
+        gs_lst.append(gs)
+    if angle is None:
+        grad = fill._xPr.find(qn("a:gradFill"))
+        grad.remove(grad.find(qn("a:lin")))
+        grad.append(parse_xml(f'<a:path {nsdecls("a")} path="circle"><a:fillToRect l="50000" t="50000" r="50000" b="50000"/></a:path>'))
+    else:
+        fill.gradient_angle = angle
+
+
+def shadow_xml(blur, distance, alpha, direction=90, color=RGBColor(0, 0, 0)):
+    # Native outer shadow; direction in degrees clockwise from the x axis (90 drops straight down).
+    return (
+        f'<a:outerShdw blurRad="{Inches(blur)}" dist="{Inches(distance)}" dir="{round(direction * 60000)}" algn="ctr" rotWithShape="0">'
+        f'<a:srgbClr val="{color}"><a:alpha val="{round(alpha * 100000)}"/></a:srgbClr></a:outerShdw>'
+    )
+
+
+def add_shadow(shape, **shadow):
+    effects = shape._element.spPr.get_or_add_effectLst()
+    effects.append(parse_xml(shadow_xml(**shadow).replace("<a:outerShdw ", f"<a:outerShdw {nsdecls('a')} ", 1)))
+
+
+SHAPE_XML = (
+    '<p:sp><p:nvSpPr><p:cNvPr id="{id}" name="{name} {n}"/><p:cNvSpPr/><p:nvPr/></p:nvSpPr>'
+    '<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm><a:prstGeom prst="{prst}"><a:avLst/></a:prstGeom>'
+    "{fill}{line}{effects}</p:spPr>"
+    '<p:style><a:lnRef idx="1"><a:schemeClr val="accent1"/></a:lnRef><a:fillRef idx="3"><a:schemeClr val="accent1"/></a:fillRef>'
+    '<a:effectRef idx="2"><a:schemeClr val="accent1"/></a:effectRef><a:fontRef idx="minor"><a:schemeClr val="lt1"/></a:fontRef></p:style>'
+    '<p:txBody><a:bodyPr rtlCol="0" anchor="ctr"/><a:lstStyle/><a:p><a:pPr algn="ctr"/></a:p></p:txBody></p:sp>'
+)
+
+
+def add_shapes(slide, shapes):
+    # Bulk add_shape(): each entry is (MSO_SHAPE, left, top, width, height, fill, line=None, shadow=None)
+    # in inches, with RGBColor fill/line (None for no line) and add_shadow() kwargs. The p:sp XML
+    # matches python-pptx's autoshapes but is parsed once for the whole batch.
+    tree = slide.shapes._spTree
+    next_id = slide.shapes._next_shape_id
+    xml = []
+    for n, (kind, left, top, width, height, fill, *rest) in enumerate(shapes):
+        line, shadow = (list(rest) + [None, None])[:2]
+        geometry = AutoShapeType(kind)
+        xml.append(
+            SHAPE_XML.format(
+                id=next_id + n,
+                n=next_id + n - 1,
+                name=geometry.basename,
+                x=Inches(left),
+                y=Inches(top),
+                cx=Inches(width),
+                cy=Inches(height),
+                prst=geometry.prst,
+                fill=f'<a:solidFill><a:srgbClr val="{fill}"/></a:solidFill>',
+                line=f'<a:ln><a:solidFill><a:srgbClr val="{line}"/></a:solidFill></a:ln>' if line else "<a:ln><a:noFill/></a:ln>",
+                effects=f"<a:effectLst>{shadow_xml(**shadow)}</a:effectLst>" if shadow else "",
+            )
+        )
+    batch = parse_xml(f"<p:spTree {nsdecls('a', 'p')}>{''.join(xml)}</p:spTree>")
+    added = list(batch)
+    ext = tree.find(qn("p:extLst"))
+    if ext is None:
+        tree.extend(added)
+    else:
+        for sp in added:
+            ext.addprevious(sp)
+    return added
+
+
+def draw_cover_backdrop(shapes):
+    bg = shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Inches(WIDTH), Inches(HEIGHT))
+    gradient(bg.fill, COVER_BACKDROP)
+    bg.line.fill.background()
+
+
+def add_background(slide, soft=False):
+    draw_background(slide.shapes, soft)
+
+
+def title_placeholder_xml(shape_id):
+    return (
+        f"<p:sp {nsdecls('p', 'a')}>"
+        f'<p:nvSpPr><p:cNvPr id="{shape_id}" name="Title"/><p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr>'
+        '<p:nvPr><p:ph type="title"/></p:nvPr></p:nvSpPr>'
+        f'<p:spPr><a:xfrm><a:off x="{Inches(0.34)}" y="{Inches(0.13)}"/><a:ext cx="{Inches(8.7)}" cy="{Inches(0.58)}"/></a:xfrm></p:spPr>'
+        '<p:txBody><a:bodyPr wrap="none" anchor="t"><a:noAutofit/></a:bodyPr><a:lstStyle>'
+        '<a:lvl1pPr algn="l"><a:lnSpc><a:spcPct val="100000"/></a:lnSpc><a:defRPr sz="2800" b="1">'
+        '<a:solidFill><a:schemeClr val="bg2"/></a:solidFill><a:latin typeface="+mj-lt"/></a:defRPr></a:lvl1pPr>'
+        "</a:lstStyle><a:p><a:endParaRPr lang=\"en-US\"/></a:p></p:txBody></p:sp>"
+    )
+
+
+def apply_theme(prs, colors=THEME_COLORS, major=FONT_HEAD, minor=FONT, size=TEXT_SIZE):
+    part = prs.slide_master.part.part_related_by(RT.THEME)
+    theme = parse_xml(part.blob)
+    scheme = theme.find(f"{qn('a:themeElements')}/{qn('a:clrScheme')}")
+    scheme.set("name", "Pitchdeck")
+    for slot, color in colors:
+        el = scheme.find(qn(f"a:{slot}"))
+        for child in list(el):
+            el.remove(child)
+        el.append(parse_xml(f'<a:srgbClr {nsdecls("a")} val="{color}"/>'))
+    fonts = theme.find(f"{qn('a:themeElements')}/{qn('a:fontScheme')}")
+    fonts.find(f"{qn('a:majorFont')}/{qn('a:latin')}").set("typeface", major)
+    fonts.find(f"{qn('a:minorFont')}/{qn('a:latin')}").set("typeface", minor)
+    part._blob = serialize_part_xml(theme)
+
+    # Body size for text boxes (presentation defaults) and master-level non-placeholder text.
+    for styles in (prs.part._element.find(qn("p:defaultTextStyle")), prs.slide_master._element.find(f".//{qn('p:otherStyle')}")):
+        for defRPr in styles.iter(qn("a:defRPr")):
+            if defRPr.get("sz"):
+                defRPr.set("sz", str(size * 100))
+
+
+def add_layout(prs, name, background):
+    # Clone the blank layout into a new custom layout part registered with the slide master.
+    master = prs.slide_master
+    package = master.part.package
+    blank = parse_xml(prs.slide_layouts[6].part.blob)
+    blank.attrib.pop("type", None)
+    cSld = blank.find(qn("p:cSld"))
+    cSld.set("name", name)
+    ext = cSld.find(qn("p:extLst"))
+    if ext is not None:
+        cSld.remove(ext)
+    partname = package.next_partname("/ppt/slideLayouts/slideLayout%d.xml")
+    part = SlideLayoutPart(partname, CT.PML_SLIDE_LAYOUT, package, blank)
+    part.relate_to(master.part, RT.SLIDE_MASTER)
+    layout_ids = master._element.get_or_add_sldLayoutIdLst()
+    entry = OxmlElement("p:sldLayoutId")
+    entry.set("id", str(max(int(e.get("id")) for e in layout_ids) + 1))
+    entry.set(qn("r:id"), master.part.relate_to(part, RT.SLIDE_LAYOUT))
+    layout_ids.append(entry)
+
+    layout = part.slide_layout
+    layout.background.fill.solid()
+    layout.background.fill.fore_color.rgb = background
+    return layout, SlideShapes(layout.shapes._spTree, layout)
+
+
+def add_theme_layouts(prs):
+    for name, soft in (("content", False), ("content-soft", True)):
+        layout, shapes = add_layout(prs, name, BACKGROUND_SOFT if soft else BACKGROUND)
+        draw_background(shapes, soft, base=False)
+        draw_header_bar(shapes)
+        shapes._spTree.append(parse_xml(title_placeholder_xml(shapes._next_shape_id)))
+    layout, _ = add_layout(prs, "cover", COVER_BACKDROP[-1][1])
+    gradient(layout.background.fill, COVER_BACKDROP)
+
+
+def new_slide(prs, layout=None):
+    # layout is "content", "content-soft", "cover" or None for a bare slide. Without themed
+    # layouts in the deck the same chrome is drawn onto the slide itself.
+    themed = prs.slide_layouts.get_by_name(layout) if layout else None
+    slide = prs.slides.add_slide(themed or prs.slide_layouts[6])
+    if themed is None and layout == "cover":
+        draw_cover_backdrop(slide.shapes)
+    elif themed is None and layout:
+        draw_background(slide.shapes, soft=layout == "content-soft")
+        draw_header_bar(slide.shapes)
+    return slide
+
+
+def add_header(slide, title, right_text=None, content=None):
+    # Expects the header bar from new_slide(); themed layouts also carry the title placeholder.
+    if slide.shapes.title is not None:
+        slide.shapes.title.text = title
+    else:
+        t = slide.shapes.add_textbox(Inches(0.34), Inches(0.13), Inches(8.7), Inches(0.58))
+        style_text(t, title, size=28, bold=True, color=PRIMARY_FG, font=FONT_HEAD)
 
     if right_text:
         rt = slide.shapes.add_textbox(Inches(8.5), Inches(0.18), Inches(4.45), Inches(0.5))
-        style_text(rt, right_text, size=20, bold=True, color=PRIMARY_FG, align=PP_ALIGN.RIGHT, italic=True, font=FONT_HEAD)
+        style_text(rt, right_text, size=20, bold=True, color=PRIMARY_FG, align=PP_ALIGN.RIGHT, italic=True, font=FONT_HEAD, content=content)
 
 
 def add_tagline(slide, text, color=BLUE_DARK):
@@ -177,7 +1196,7 @@ def add_tagline(slide, text, color=BLUE_DARK):
     style_text(tx, text, size=20, bold=True, color=WHITE, align=PP_ALIGN.CENTER, italic=True, font=FONT_HEAD)
 
 
-def add_photo(slide, key, left, top, width, height, rounded=True):
+def add_photo(slide, key, left, top, width, height, rounded=True, content=None):
     frame = slide.shapes.add_shape(
         MSO_SHAPE.ROUNDED_RECTANGLE if rounded else MSO_SHAPE.RECTANGLE,
         Inches(left),
@@ -189,67 +1208,126 @@ def add_photo(slide, key, left, top, width, height, rounded=True):
     frame.fill.fore_color.rgb = CARD_BG
     frame.line.color.rgb = BORDER
 
-    img_path = cropped_image(key, width - 0.12, height - 0.12)
-    slide.shapes.add_picture(
-        str(img_path),
+    img_path = derivative(key if content is None else asset(content, key), width - 0.12, height - 0.12)
+    if img_path is None:
+        return
+    pic = slide.shapes.add_picture(
+        picture_source(img_path),
         Inches(left + 0.06),
         Inches(top + 0.06),
         width=Inches(width - 0.12),
         height=Inches(height - 0.12),
     )
+    if content is not None:
+        pic.name = "photo:" + json.dumps([key, width - 0.12, height - 0.12])
 
 
 def add_full_photo(slide, key):
-    image = cropped_image(key, WIDTH, HEIGHT)
-    slide.shapes.add_picture(str(image), 0, 0, width=Inches(WIDTH), height=Inches(HEIGHT))
+    image = derivative(key, WIDTH, HEIGHT)
+    if image is None:
+        return
+    slide.shapes.add_picture(picture_source(image), 0, 0, width=Inches(WIDTH), height=Inches(HEIGHT))
 
 
 def card(slide, left, top, width, height, color=CARD_BG):
-    shadow = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(left), Inches(top + 0.03), Inches(width), Inches(height))
-    shadow.fill.solid()
-    shadow.fill.fore_color.rgb = RGBColor(212, 212, 216)
-    shadow.fill.transparency = 0.82
-    shadow.line.fill.background()
-    c = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(left), Inches(top), Inches(width), Inches(height))
-    c.fill.solid()
-    c.fill.fore_color.rgb = color
-    c.line.color.rgb = BORDER
-    return c
-
-
-def slide_cover(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    base = s.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Inches(WIDTH), Inches(HEIGHT))
-    base.fill.solid()
-    base.fill.fore_color.rgb = RGBColor(15, 18, 27)
-    base.line.fill.background()
-
-    vignette = s.shapes.add_shape(MSO_SHAPE.OVAL, Inches(-1.2), Inches(-0.7), Inches(15.8), Inches(9.2))
-    vignette.fill.solid()
-    vignette.fill.fore_color.rgb = RGBColor(24, 27, 38)
-    vignette.fill.transparency = 0.58
-    vignette.line.fill.background()
-
-    panel_shadow = s.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(1.18), Inches(1.22), Inches(10.95), Inches(4.7))
-    panel_shadow.fill.solid()
-    panel_shadow.fill.fore_color.rgb = RGBColor(0, 0, 0)
-    panel_shadow.fill.transparency = 0.58
-    panel_shadow.line.fill.background()
+    (sp,) = add_shapes(slide, [(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, width, height, color, BORDER, CARD_SHADOW)])
+    return SlideShapeFactory(sp, slide.shapes)
 
+
+def add_tiers(slide, tiers, size=16):
+    # One shape at a time: each tier's label must stay below the next (overlapping) tier.
+    for label, txt, color, l, t, w, h in tiers:
+        add_shapes(slide, [(MSO_SHAPE.TRAPEZOID, l, t, w, h, color)])
+        style_text(slide.shapes.add_textbox(Inches(l + 0.2), Inches(t + 0.17), Inches(w - 0.4), Inches(h - 0.25)), f"{label}\n{txt}", size=size, bold=True, color=WHITE, align=PP_ALIGN.CENTER, font=FONT_HEAD)
+
+
+def add_bars(slide, bars, baseline, width):
+    add_shapes(slide, [(MSO_SHAPE.RECTANGLE, x, baseline - h, width, h, col) for x, h, col in bars])
+
+
+def add_pie(slide, left, top, width, height, categories, values, colors, series="Series 1"):
+    return add_chart(slide, "pie", left, top, width, height, categories, [(series, values)], colors)
+
+
+CHART_COLORS = (ACCENT, RGBColor(96, 165, 250), MUTED, RGBColor(191, 219, 254), PRIMARY, RGBColor(161, 161, 170))
+
+
+def add_chart(slide, kind, left, top, width, height, categories, series, colors=CHART_COLORS, number_format=None):
+    data = CategoryChartData(number_format=number_format) if number_format else CategoryChartData()
+    data.categories = categories
+    for name, values in series:
+        data.add_series(name, values)
+    frame = slide.shapes.add_chart(CHART_KINDS[kind], Inches(left), Inches(top), Inches(width), Inches(height), data)
+    chart = frame.chart
+    if kind == "pie":
+        chart.has_legend = False
+        chart.plots[0].has_data_labels = True
+        chart.plots[0].data_labels.number_format = "0%"
+        chart.plots[0].data_labels.position = 2
+        for i, p in enumerate(chart.series[0].points):
+            p.format.fill.solid()
+            p.format.fill.fore_color.rgb = colors[i % len(colors)]
+        return frame
+
+    chart.font.size = Pt(12)
+    theme_color(chart.font, MUTED)
+    chart.has_legend = len(series) > 1
+    if chart.has_legend:
+        chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+    value_axis, category_axis = chart.value_axis, chart.category_axis
+    value_axis.has_major_gridlines = True
+    value_axis.major_gridlines.format.line.color.rgb = BORDER
+    value_axis.format.line.fill.background()
+    category_axis.format.line.color.rgb = BORDER
+    category_axis.tick_labels.font.size = Pt(11)
+    if kind == "bar":
+        chart.plots[0].gap_width = 60
+    for i, s in enumerate(chart.series):
+        color = colors[i % len(colors)]
+        if kind == "bar":
+            s.format.fill.solid()
+            s.format.fill.fore_color.rgb = color
+        else:
+            s.smooth = False
+            s.marker.style = XL_MARKER_STYLE.NONE
+            s.format.line.color.rgb = color
+            s.format.line.width = Pt(2.25)
+    return frame
+
+
+def data_chart(slide, source, left, top, width, height, colors=CHART_COLORS, name=None):
+    # source is checked by chart_source; name tags the chart so patch_deck can rebind it.
+    categories, series = chart_series(source)
+    frame = add_chart(slide, source["kind"], left, top, width, height, categories, series, colors, source.get("format"))
+    if name is not None:
+        frame.name = "data:" + json.dumps([name, source["kind"]])
+    return frame
+
+
+def bound_chart(content, name, kind):
+    source = content.get("charts", {}).get(name)
+    return None if source is None else chart_source(source, kind, f"charts.{name}")
+
+
+def slide_cover(prs, content=CONTENT):
+    s = new_slide(prs, "cover")
     panel = s.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(1.12), Inches(1.16), Inches(10.95), Inches(4.7))
     panel.fill.solid()
     panel.fill.fore_color.rgb = RGBColor(40, 41, 49)
     panel.fill.transparency = 0.14
     panel.line.color.rgb = RGBColor(70, 74, 88)
+    add_shadow(panel, blur=0.12, distance=0.085, alpha=0.42, direction=45)
 
     style_text(
         s.shapes.add_textbox(Inches(2.0), Inches(1.58), Inches(9.2), Inches(0.95)),
-        "Teacher Copilot",
+        "{name}",
         size=60,
         bold=False,
         color=WHITE,
         align=PP_ALIGN.CENTER,
         font=FONT_SCRIPT,
+        content=content,
     )
     style_text(
         s.shapes.add_textbox(Inches(1.8), Inches(2.72), Inches(9.7), Inches(0.6)),
@@ -261,16 +1339,11 @@ def slide_cover(prs):
         font=FONT_SCRIPT,
     )
 
-    map_shadow = s.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(4.05), Inches(3.72), Inches(5.4), Inches(2.0))
-    map_shadow.fill.solid()
-    map_shadow.fill.fore_color.rgb = RGBColor(0, 0, 0)
-    map_shadow.fill.transparency = 0.78
-    map_shadow.line.fill.background()
-
     map_card = s.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(4.0), Inches(3.68), Inches(5.4), Inches(2.0))
     map_card.fill.solid()
     map_card.fill.fore_color.rgb = RGBColor(245, 245, 245)
     map_card.line.color.rgb = RGBColor(220, 220, 220)
+    add_shadow(map_card, blur=0.08, distance=0.064, alpha=0.22, direction=39)
 
     style_text(
         s.shapes.add_textbox(Inches(4.28), Inches(4.53), Inches(4.82), Inches(0.5)),
@@ -283,17 +1356,9 @@ def slide_cover(prs):
         font=FONT_SCRIPT,
     )
 
-    for x, y in [(4.55, 4.15), (5.5, 4.45), (6.42, 4.05), (7.2, 4.42), (8.12, 4.25), (8.82, 4.62)]:
-        dot_shadow = s.shapes.add_shape(MSO_SHAPE.OVAL, Inches(x + 0.02), Inches(y + 0.02), Inches(0.23), Inches(0.23))
-        dot_shadow.fill.solid()
-        dot_shadow.fill.fore_color.rgb = RGBColor(0, 0, 0)
-        dot_shadow.fill.transparency = 0.65
-        dot_shadow.line.fill.background()
-
-        d = s.shapes.add_shape(MSO_SHAPE.OVAL, Inches(x), Inches(y), Inches(0.23), Inches(0.23))
-        d.fill.solid()
-        d.fill.fore_color.rgb = RGBColor(217, 119, 6)
-        d.line.fill.background()
+    dot_shadow = {"blur": 0.03, "distance": 0.028, "alpha": 0.35, "direction": 45}
+    dots = [(4.55, 4.15), (5.5, 4.45), (6.42, 4.05), (7.2, 4.42), (8.12, 4.25), (8.82, 4.62)]
+    add_shapes(s, [(MSO_SHAPE.OVAL, x, y, 0.23, 0.23, RGBColor(217, 119, 6), None, dot_shadow) for x, y in dots])
 
     style_text(
         s.shapes.add_textbox(Inches(2.0), Inches(7.03), Inches(9.3), Inches(0.34)),
@@ -306,9 +1371,8 @@ def slide_cover(prs):
     )
 
 
-def slide_problem(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_problem(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "The Problem")
     card(s, 0.55, 1.28, 6.25, 5.4)
     style_bullets(
@@ -322,13 +1386,12 @@ def slide_problem(prs):
         size=24,
         spacing=14,
     )
-    add_photo(s, "problem", 7.0, 1.3, 5.75, 5.35)
+    add_photo(s, "problem", 7.0, 1.3, 5.75, 5.35, content=content)
     add_tagline(s, "Empowering Teachers, Transforming Learning")
 
 
-def slide_mission(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s, soft=True)
+def slide_mission(prs, content=CONTENT):
+    s = new_slide(prs, "content-soft")
     add_header(s, "Our Mission & Vision")
     card(s, 0.55, 1.35, 6.25, 5.25, color=CARD_BG)
 
@@ -338,27 +1401,23 @@ def slide_mission(prs):
 
     p1 = tf.paragraphs[0]
     p1.text = "Mission: Empower teachers to transform learning with AI"
-    p1.font.size = Pt(25)
-    p1.font.bold = True
-    p1.font.color.rgb = ACCENT
-    p1.font.name = FONT_HEAD
+    theme_color(p1.font, ACCENT)
 
     p2 = tf.add_paragraph()
     p2.text = "Vision: A future where every student receives personalized education"
     p2.space_before = Pt(30)
-    p2.font.size = Pt(25)
-    p2.font.bold = True
-    p2.font.color.rgb = TEXT
-    p2.font.name = FONT_HEAD
+    for p in (p1, p2):
+        p.font.size = Pt(25)
+        p.font.bold = True
+        theme_font(p.font, FONT_HEAD)
 
-    add_photo(s, "mission", 7.0, 1.48, 5.75, 4.95)
+    add_photo(s, "mission", 7.0, 1.48, 5.75, 4.95, content=content)
     add_tagline(s, "Empowering Teachers, Transforming Learning", color=PRIMARY)
 
 
-def slide_solution(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
-    add_header(s, "Our Solution:", right_text="Teacher Copilot")
+def slide_solution(prs, content=CONTENT):
+    s = new_slide(prs, "content")
+    add_header(s, "Our Solution:", right_text="{name}", content=content)
 
     style_text(s.shapes.add_textbox(Inches(1.0), Inches(1.3), Inches(4.6), Inches(0.4)), "Current Workflow", size=17, bold=True, color=MUTED, align=PP_ALIGN.CENTER, font=FONT_HEAD)
     style_text(s.shapes.add_textbox(Inches(7.6), Inches(1.3), Inches(4.6), Inches(0.4)), "Optimized Workflow", size=17, bold=True, color=ACCENT, align=PP_ALIGN.CENTER, font=FONT_HEAD)
@@ -383,9 +1442,8 @@ def slide_solution(prs):
         y += 1.43
 
 
-def slide_market(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_market(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Market Opportunity")
 
     card(s, 0.6, 1.45, 6.1, 5.0)
@@ -394,19 +1452,13 @@ def slide_market(prs):
         ("SAM", "Targetable 32M Schools", RGBColor(82, 82, 91), 1.6, 3.28, 4.1, 1.1),
         ("SOM", "Pilot 5 Schools\n$20M", RGBColor(113, 113, 122), 1.9, 4.43, 3.5, 1.0),
     ]
-    for label, txt, color, l, t, w, h in tiers:
-        shp = s.shapes.add_shape(MSO_SHAPE.TRAPEZOID, Inches(l), Inches(t), Inches(w), Inches(h))
-        shp.fill.solid()
-        shp.fill.fore_color.rgb = color
-        shp.line.fill.background()
-        style_text(s.shapes.add_textbox(Inches(l + 0.2), Inches(t + 0.17), Inches(w - 0.4), Inches(h - 0.25)), f"{label}\n{txt}", size=16, bold=True, color=WHITE, align=PP_ALIGN.CENTER, font=FONT_HEAD)
+    add_tiers(s, tiers)
 
-    add_photo(s, "market", 7.05, 1.53, 5.65, 4.95)
+    add_photo(s, "market", 7.05, 1.53, 5.65, 4.95, content=content)
 
 
-def slide_business(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_business(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Business Model")
 
     items = [
@@ -423,9 +1475,8 @@ def slide_business(prs):
         strip.line.fill.background()
 
 
-def slide_value(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_value(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Value Proposition")
 
     card(s, 0.6, 1.5, 6.3, 5.0, color=ACCENT_SOFT)
@@ -439,12 +1490,11 @@ def slide_value(prs):
         size=23,
         spacing=16,
     )
-    add_photo(s, "value", 7.2, 1.65, 5.4, 4.85)
+    add_photo(s, "value", 7.2, 1.65, 5.4, 4.85, content=content)
 
 
-def slide_traction(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_traction(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Our Traction")
 
     card(s, 0.6, 1.5, 6.2, 5.0)
@@ -458,32 +1508,31 @@ def slide_traction(prs):
         size=23,
         spacing=16,
     )
-    add_photo(s, "traction", 6.95, 1.65, 5.7, 4.85)
+    add_photo(s, "traction", 6.95, 1.65, 5.7, 4.85, content=content)
 
 
-def slide_revenue(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_revenue(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Revenue Projections")
 
-    rows = [("Year 1", "$5.4M", RGBColor(63, 63, 70)), ("Year 2", "$14.4M", PRIMARY), ("Year 3", "$248M+", ACCENT)]
+    colors = [RGBColor(63, 63, 70), PRIMARY, ACCENT]
+    add_shapes(s, [(MSO_SHAPE.ROUNDED_RECTANGLE, 0.6, 1.8 + 1.19 * idx, 6.2, 1.1, color) for idx, color in enumerate(colors)])
     y = 1.8
-    for year, amt, color in rows:
-        r = s.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, Inches(0.6), Inches(y), Inches(6.2), Inches(1.1))
-        r.fill.solid()
-        r.fill.fore_color.rgb = color
-        r.line.fill.background()
+    for idx, color in enumerate(colors):
+        year = f"Year {idx + 1}"
         style_text(s.shapes.add_textbox(Inches(0.9), Inches(y + 0.3), Inches(2.1), Inches(0.45)), year, size=24, bold=True, color=WHITE, font=FONT_HEAD)
-        style_text(s.shapes.add_textbox(Inches(2.35), Inches(y + 0.29), Inches(4.0), Inches(0.45)), amt, size=31, bold=True, color=WHITE, font=FONT_HEAD)
+        amt = s.shapes.add_textbox(Inches(2.35), Inches(y + 0.29), Inches(4.0), Inches(0.45))
+        style_text(amt, f"{{revenue[{idx}]}}", size=31, bold=True, color=WHITE, font=FONT_HEAD, content=content)
         y += 1.19
 
+    source = bound_chart(content, "revenue", "bar")
+    if source is not None:
+        data_chart(s, source, 7.15, 1.6, 5.6, 4.9, name="revenue")
+        return
+
     b_x = 8.1
-    for i, h in enumerate([1.2, 1.95, 2.8]):
-        c = [RGBColor(161, 161, 170), RGBColor(113, 113, 122), ACCENT][i]
-        bar = s.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(b_x + 0.78 * i), Inches(6.0 - h), Inches(0.56), Inches(h))
-        bar.fill.solid()
-        bar.fill.fore_color.rgb = c
-        bar.line.fill.background()
+    colors = [RGBColor(161, 161, 170), RGBColor(113, 113, 122), ACCENT]
+    add_bars(s, [(b_x + 0.78 * i, h, colors[i]) for i, h in enumerate([1.2, 1.95, 2.8])], baseline=6.0, width=0.56)
 
     up = s.shapes.add_shape(MSO_SHAPE.UP_ARROW, Inches(7.15), Inches(3.2), Inches(4.9), Inches(2.95))
     up.fill.solid()
@@ -492,15 +1541,24 @@ def slide_revenue(prs):
     up.line.fill.background()
 
 
-def slide_gtm(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_gtm(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Go-To-Market Strategy")
 
-    labels = [("Year 1", "$5.4M", 1.0), ("Year 2", "$14.4M", 4.3), ("Year 3", "$248M+", 7.9)]
-    for year, amt, x in labels:
+    source = bound_chart(content, "gtm", "line")
+    if source is not None:
+        # The chart takes the drawn bars' place; the yearly figures move below it.
+        data_chart(s, source, 0.8, 1.5, 11.7, 3.85, name="gtm")
+        for idx, x in enumerate([1.0, 4.3, 7.9]):
+            label = s.shapes.add_textbox(Inches(x), Inches(5.55), Inches(3.0), Inches(0.5))
+            style_text(label, f"Year {idx + 1}: {{revenue[{idx}]}}", size=20, bold=True, align=PP_ALIGN.CENTER, font=FONT_HEAD, content=content)
+        return
+
+    for idx, x in enumerate([1.0, 4.3, 7.9]):
+        year = f"Year {idx + 1}"
         style_text(s.shapes.add_textbox(Inches(x), Inches(5.45), Inches(2.2), Inches(0.36)), year, size=20, bold=True, align=PP_ALIGN.CENTER, font=FONT_HEAD)
-        style_text(s.shapes.add_textbox(Inches(x), Inches(3.24), Inches(2.5), Inches(0.8)), amt, size=31, bold=True, align=PP_ALIGN.CENTER, font=FONT_HEAD)
+        amt = s.shapes.add_textbox(Inches(x), Inches(3.24), Inches(2.5), Inches(0.8))
+        style_text(amt, f"{{revenue[{idx}]}}", size=31, bold=True, align=PP_ALIGN.CENTER, font=FONT_HEAD, content=content)
 
     bars = [
         (1.2, 0.7, RGBColor(113, 113, 122)),
@@ -511,11 +1569,7 @@ def slide_gtm(prs):
         (9.0, 2.75, RGBColor(59, 130, 246)),
         (9.78, 3.2, ACCENT),
     ]
-    for x, h, col in bars:
-        b = s.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(x), Inches(5.3 - h), Inches(0.54), Inches(h))
-        b.fill.solid()
-        b.fill.fore_color.rgb = col
-        b.line.fill.background()
+    add_bars(s, bars, baseline=5.3, width=0.54)
 
     growth = s.shapes.add_shape(MSO_SHAPE.UP_ARROW, Inches(0.8), Inches(2.0), Inches(11.45), Inches(3.2))
     growth.fill.solid()
@@ -524,28 +1578,23 @@ def slide_gtm(prs):
     growth.line.fill.background()
 
 
-def slide_technology(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_technology(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Technology Overview")
     card(s, 0.6, 1.5, 6.2, 5.0)
 
     items = ["AI Grading Engine", "Analytics Dashboard", "Cloud-Based Platform", "LMS Integrations"]
+    add_shapes(s, [(MSO_SHAPE.OVAL, 0.9, 1.86 + 1.08 * n, 0.36, 0.36, ACCENT) for n in range(len(items))])
     y = 1.86
     for item in items:
-        icon = s.shapes.add_shape(MSO_SHAPE.OVAL, Inches(0.9), Inches(y), Inches(0.36), Inches(0.36))
-        icon.fill.solid()
-        icon.fill.fore_color.rgb = ACCENT
-        icon.line.fill.background()
         style_text(s.shapes.add_textbox(Inches(1.35), Inches(y - 0.02), Inches(5.2), Inches(0.42)), item, size=23, bold=True, color=TEXT, font=FONT_HEAD)
         y += 1.08
 
-    add_photo(s, "technology", 7.0, 1.65, 5.65, 4.85)
+    add_photo(s, "technology", 7.0, 1.65, 5.65, 4.85, content=content)
 
 
-def slide_impact(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_impact(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Impact & Metrics")
     card(s, 0.6, 1.5, 6.2, 5.0)
 
@@ -561,30 +1610,32 @@ def slide_impact(prs):
         spacing=16,
     )
 
-    data = CategoryChartData()
-    data.categories = ["Teacher Time", "Engagement", "Other"]
-    data.add_series("Impact", (50, 40, 10))
-    chart = s.shapes.add_chart(XL_CHART_TYPE.PIE, Inches(7.35), Inches(1.7), Inches(5.1), Inches(4.9), data).chart
-    chart.has_legend = False
-    chart.plots[0].has_data_labels = True
-    chart.plots[0].data_labels.number_format = "0%"
-    chart.plots[0].data_labels.position = 2
-    fills = [ACCENT, RGBColor(96, 165, 250), RGBColor(191, 219, 254)]
-    for i, p in enumerate(chart.series[0].points):
-        p.format.fill.solid()
-        p.format.fill.fore_color.rgb = fills[i]
-
-
-def slide_funding(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+    source = bound_chart(content, "impact", "pie")
+    if source is not None:
+        data_chart(s, source, 7.35, 1.7, 5.1, 4.9, name="impact")
+        return
+    add_pie(
+        s,
+        7.35,
+        1.7,
+        5.1,
+        4.9,
+        ["Teacher Time", "Engagement", "Other"],
+        (50, 40, 10),
+        [ACCENT, RGBColor(96, 165, 250), RGBColor(191, 219, 254)],
+        series="Impact",
+    )
+
+
+def slide_funding(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Funding Ask")
     card(s, 0.6, 1.5, 5.1, 5.0)
 
     style_bullets(
         s.shapes.add_textbox(Inches(0.95), Inches(1.9), Inches(4.6), Inches(4.4)),
         [
-            "Raising $3M",
+            "Raising {raise}",
             "Product development",
             "Sales & marketing",
             "School onboarding",
@@ -592,53 +1643,52 @@ def slide_funding(prs):
         ],
         size=22,
         spacing=14,
+        content=content,
     )
 
-    d = CategoryChartData()
-    d.categories = ["Product", "Sales", "Onboarding", "Operations"]
-    d.add_series("Allocation", (40, 30, 20, 10))
-    pie = s.shapes.add_chart(XL_CHART_TYPE.PIE, Inches(5.65), Inches(2.0), Inches(3.9), Inches(3.9), d).chart
-    pie.has_legend = False
-    pie.plots[0].has_data_labels = True
-    pie.plots[0].data_labels.number_format = "0%"
-    pie.plots[0].data_labels.position = 2
     colors = [PRIMARY, ACCENT, RGBColor(96, 165, 250), RGBColor(191, 219, 254)]
-    for i, p in enumerate(pie.series[0].points):
-        p.format.fill.solid()
-        p.format.fill.fore_color.rgb = colors[i]
+    source = bound_chart(content, "allocation", "pie")
+    if source is not None:
+        data_chart(s, source, 5.65, 2.0, 3.9, 3.9, colors, name="allocation")
+    else:
+        pie = add_pie(
+            s,
+            5.65,
+            2.0,
+            3.9,
+            3.9,
+            ["Product", "Sales", "Onboarding", "Operations"],
+            content["allocation"],
+            colors,
+            series="Allocation",
+        )
+        pie.name = "chart:allocation"
 
-    add_photo(s, "market", 9.65, 1.7, 2.95, 4.8)
+    add_photo(s, "market", 9.65, 1.7, 2.95, 4.8, content=content)
 
 
-def slide_team(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s)
+def slide_team(prs, content=CONTENT):
+    s = new_slide(prs, "content")
     add_header(s, "Our Team")
 
-    people = [
-        ("team_1", "Founder & CEO"),
-        ("team_2", "CTO"),
-        ("team_3", "Head of Partnerships"),
-        ("team_4", "Education Advisors"),
-    ]
     x = 0.8
-    for key, role in people:
+    for idx, (key, _) in enumerate(content["team"]):
         card(s, x, 1.6, 2.95, 5.1, color=RGBColor(250, 251, 252))
-        add_photo(s, key, x + 0.18, 1.86, 2.6, 3.4, rounded=False)
+        add_photo(s, key, x + 0.18, 1.86, 2.6, 3.4, rounded=False, content=content)
         style_text(
             s.shapes.add_textbox(Inches(x + 0.1), Inches(5.5), Inches(2.75), Inches(0.9)),
-            role,
+            f"{{team[{idx}][1]}}",
             size=16,
             bold=True,
             align=PP_ALIGN.CENTER,
             font=FONT_HEAD,
+            content=content,
         )
         x += 3.12
 
 
-def slide_closing(prs):
-    s = prs.slides.add_slide(prs.slide_layouts[6])
-    add_background(s, soft=True)
+def slide_closing(prs, content=CONTENT):
+    s = new_slide(prs, "content-soft")
     add_header(s, "Join Us to", right_text="Transform African Education")
 
     card(s, 0.65, 1.55, 6.2, 4.6, color=CARD_BG)
@@ -653,7 +1703,7 @@ def slide_closing(prs):
         font=FONT_HEAD,
     )
 
-    add_photo(s, "closing", 7.0, 1.8, 5.7, 3.95)
+    add_photo(s, "closing", 7.0, 1.8, 5.7, 3.95, content=content)
 
     bar = s.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, Inches(6.45), Inches(WIDTH), Inches(1.05))
     bar.fill.solid()
@@ -661,50 +1711,1143 @@ def slide_closing(prs):
     bar.line.fill.background()
     style_text(
         s.shapes.add_textbox(Inches(0.7), Inches(6.72), Inches(12.0), Inches(0.5)),
-        "Contact Us: email@example.com  |  www.teachercopilot.com",
+        "Contact Us: {contact}",
         size=19,
         bold=True,
         color=WHITE,
         align=PP_ALIGN.CENTER,
         font=FONT_HEAD,
+        content=content,
     )
 
 
-def build():
-    fetch_images()
-    prs = Presentation()
-    prs.slide_width = Inches(WIDTH)
-    prs.slide_height = Inches(HEIGHT)
-
-    slide_cover(prs)
-    slide_problem(prs)
-    slide_mission(prs)
-    slide_solution(prs)
-    slide_market(prs)
-    slide_business(prs)
-    slide_value(prs)
-    slide_traction(prs)
-    slide_revenue(prs)
-    slide_gtm(prs)
-    slide_technology(prs)
-    slide_impact(prs)
-    slide_funding(prs)
-    slide_team(prs)
-    slide_closing(prs)
-
-    candidates = [
-        "Teacher_Copilot_Pitch_Deck.pptx",
-        "Teacher_Copilot_Pitch_Deck_Enhanced.pptx",
-        f"Teacher_Copilot_Pitch_Deck_shadcn_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx",
-    ]
-    for name in candidates:
+SLIDES = [
+    slide_cover,
+    slide_problem,
+    slide_mission,
+    slide_solution,
+    slide_market,
+    slide_business,
+    slide_value,
+    slide_traction,
+    slide_revenue,
+    slide_gtm,
+    slide_technology,
+    slide_impact,
+    slide_funding,
+    slide_team,
+    slide_closing,
+]
+
+
+def select_slides(names, slides=None):
+    # Picks slides by function name, with or without the slide_ prefix, or by 1-based position,
+    # in the order given. Only the picked slides are planned, so only their images are fetched.
+    slides = slides or SLIDES
+    by_name = {fn.__name__: fn for fn in slides}
+    picked = []
+    for name in names:
+        name = name.strip()
+        if name.isdigit() and 1 <= int(name) <= len(slides):
+            picked.append(slides[int(name) - 1])
+        elif name in by_name or f"slide_{name}" in by_name:
+            picked.append(by_name.get(name) or by_name[f"slide_{name}"])
+        else:
+            choices = ", ".join(fn.__name__.removeprefix("slide_") for fn in slides)
+            raise ValueError(f"unknown slide {name!r}; choose from {choices} or 1-{len(slides)}")
+    return picked
+
+
+# Theme tokens -> the themed empty deck as package bytes. Reopening it costs half of applying
+# the theme and building the layouts again, which matters to long-running processes.
+_base_decks = {}
+
+
+def new_presentation():
+    key = json.dumps(theme_tokens(), sort_keys=True)
+    base = _base_decks.get(key)
+    if base is None:
+        prs = Presentation()
+        prs.slide_width = Inches(WIDTH)
+        prs.slide_height = Inches(HEIGHT)
+        apply_theme(prs)
+        if THEMED_LAYOUTS:
+            add_theme_layouts(prs)
+        out = BytesIO()
+        prs.save(out)
+        base = _base_decks[key] = out.getvalue()
+    return Presentation(BytesIO(base))
+
+
+_helpers_digest = None
+
+
+def helpers_digest():
+    # Everything in this module and the chart and spec engines except the slide functions
+    # themselves: editing a helper dirties every slide, editing one slide_* function only that slide.
+    global _helpers_digest
+    if _helpers_digest is None:
+        text = "".join(Path(path).read_text() for path in (__file__, charts.__file__, pitchdeck_spec.__file__))
+        for fn in SLIDES:
+            text = text.replace(inspect.getsource(fn), "")
+        _helpers_digest = hashlib.sha256(text.encode()).hexdigest()
+    return _helpers_digest
+
+
+def theme_colors():
+    return {name: value for name, value in globals().items() if isinstance(value, RGBColor)}
+
+
+def theme_tokens():
+    tokens = {name: str(value) for name, value in theme_colors().items()}
+    tokens.update(FONT=FONT, FONT_HEAD=FONT_HEAD, FONT_SCRIPT=FONT_SCRIPT, WIDTH=WIDTH, HEIGHT=HEIGHT, THEMED_LAYOUTS=THEMED_LAYOUTS)
+    # Fitted text sizes depend on which fonts are installed.
+    tokens.update(AUTOFIT=AUTOFIT, METRICS=[str(font_file(name, bold)) for name in (FONT, FONT_HEAD) for bold in (False, True)])
+    return tokens
+
+
+# Slide function -> its source; inspect re-tokenizes the module on every call.
+_sources = {}
+
+
+def slide_source(fn):
+    source = getattr(fn, "source", None)
+    if source is None:
+        source = _sources.get(fn)
+        if source is None:
+            source = _sources[fn] = inspect.getsource(fn)
+    return source
+
+
+def slide_key(fn, content):
+    h = hashlib.sha256()
+    for part in (
+        helpers_digest(),
+        slide_source(fn),
+        json.dumps(content, sort_keys=True, default=str),
+        json.dumps(chart_stamps(content, fn)),
+        json.dumps(theme_tokens(), sort_keys=True),
+        pptx.__version__,
+    ):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+# slide key -> crop plan of that slide, backed by CACHE_DIR/plans.
+_slide_plans = {}
+
+
+def slide_plan(fn, content, scratch=None):
+    global _crop_plan
+    key = slide_key(fn, content)
+    plan = _slide_plans.get(key)
+    if plan is not None:
+        return plan
+    path = CACHE_DIR / "plans" / f"{key}.json"
+    try:
+        plan = [tuple(item) for item in json.loads(path.read_text())]
+    except (OSError, ValueError):
+        _crop_plan = []
         try:
-            prs.save(name)
-            return
-        except PermissionError:
+            fn(scratch or new_presentation(), content)
+            plan = list(dict.fromkeys(_crop_plan))
+        finally:
+            _crop_plan = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, json.dumps(plan).encode())
+    _slide_plans[key] = plan
+    return plan
+
+
+def slide_plans(slides=None, content=CONTENT):
+    # A plan loaded from disk skips the slide function, and with it asset(); resolve every local
+    # photo here so raw_path() finds those files either way.
+    for key in content.get("images", {}):
+        asset(content, key)
+    plans = []
+    scratch = None
+    for fn in slides or SLIDES:
+        if scratch is None and slide_key(fn, content) not in _slide_plans:
+            scratch = new_presentation()
+        plans.append(slide_plan(fn, content, scratch))
+    return plans
+
+
+def plan_crops(slides=None, content=CONTENT):
+    return list(dict.fromkeys(item for plan in slide_plans(slides, content) for item in plan))
+
+
+def slide_fingerprint(fn, content, derived=None):
+    derived = _derived if derived is None else derived
+    assets = [derived[item].stem for item in slide_plan(fn, content)]
+    return hashlib.sha256(":".join([slide_key(fn, content), *assets]).encode()).hexdigest()[:32]
+
+
+def capture_slide(slide):
+    rels = []
+    for rId, rel in slide.part.rels.items():
+        if rel.reltype == RT.SLIDE_LAYOUT:
             continue
-    raise PermissionError("Could not save deck. Close open .pptx files and rerun.")
+        if rel.is_external:
+            return None
+        if rel.reltype == RT.IMAGE:
+            rels.append((rId, "image", rel.target_part.blob))
+        elif rel.reltype == RT.CHART:
+            chart_part = rel.target_part
+            rels.append((rId, "chart", (chart_part.blob, chart_part.chart_workbook.xlsx_part.blob)))
+        else:
+            return None
+    return {"xml": slide.part.blob, "layout": slide.slide_layout.name, "rels": rels}
+
+
+def index_images(slide, images):
+    for rel in slide.part.rels.values():
+        if rel.reltype == RT.IMAGE and not rel.is_external:
+            images[rel.target_part.sha1] = rel.target_part
+
+
+def restore_slide(prs, cached, images):
+    # images maps SHA-1 -> ImagePart for every image already in prs; python-pptx otherwise
+    # re-hashes every image in the package to dedupe each one it adds.
+    slide = prs.slides.add_slide(prs.slide_layouts.get_by_name(cached["layout"]) or prs.slide_layouts[6])
+    part, package = slide.part, slide.part.package
+    mapping = {}
+    for rId, kind, payload in cached["rels"]:
+        if kind == "image":
+            image = PartImage.from_blob(payload)
+            image_part = images.get(image.sha1)
+            if image_part is None:
+                image_part = images[image.sha1] = ImagePart.new(package, image)
+            mapping[rId] = part.relate_to(image_part, RT.IMAGE)
+        else:
+            chart_xml, xlsx = payload
+            chart_part = ChartPart.load(package.next_partname(ChartPart.partname_template), CT.DML_CHART, package, chart_xml)
+            external = chart_part._element.find(qn("c:externalData"))
+            if external is not None:
+                chart_part._element.remove(external)
+            chart_part.chart_workbook.update_from_xlsx_blob(xlsx)
+            mapping[rId] = part.relate_to(chart_part, RT.CHART)
+
+    cached_sld = parse_xml(cached["xml"])
+    r_ns = qn("r:id")[: qn("r:id").index("}") + 1]
+    for el in cached_sld.iter():
+        for attr, value in el.attrib.items():
+            if attr.startswith(r_ns) and value in mapping:
+                el.set(attr, mapping[value])
+    # Swap content into the existing element: python-pptx has already wrapped it in a Slide object.
+    sld = part._element
+    for child in list(sld):
+        sld.remove(child)
+    sld.extend(list(cached_sld))
+    return slide
+
+
+def _prune_slide_cache(directory):
+    entries = sorted(directory.glob("*.pickle"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[SLIDE_CACHE_ENTRIES:]:
+        stale.unlink(missing_ok=True)
+
+
+def place_slide(prs, fn, content, images, stats):
+    # Restores the slide from CACHE_DIR/slides when its fingerprint is cached, else renders and
+    # caches it; images and stats are shared by every slide of the deck.
+    name = getattr(fn, "__name__", "slide")
+    path = CACHE_DIR / "slides" / f"{slide_fingerprint(fn, content)}.pickle"
+    try:
+        cached = pickle.loads(path.read_bytes())
+    except (OSError, pickle.UnpicklingError, EOFError):
+        cached = None
+    if cached is not None:
+        restore_slide(prs, cached, images)
+        os.utime(path)
+        stats["reused"].append(name)
+        return
+    render_slide(fn, prs, content)
+    slide = prs.slides[len(prs.slides) - 1]
+    index_images(slide, images)
+    captured = capture_slide(slide)
+    if captured is not None:
+        atomic_write(path, pickle.dumps(captured))
+    stats["rebuilt"].append(name)
+
+
+def assemble_incremental(content=CONTENT, slides=None):
+    directory = CACHE_DIR / "slides"
+    directory.mkdir(parents=True, exist_ok=True)
+    prs = new_presentation()
+    stats = {"reused": [], "rebuilt": []}
+    images = {}
+    for fn in slides or SLIDES:
+        place_slide(prs, fn, content, images, stats)
+    _prune_slide_cache(directory)
+    return prs, stats
+
+
+def deck_content(spec=None):
+    content = dict(CONTENT, **(spec or {}))
+    content["images"] = dict(CONTENT["images"], **content.get("images", {}))
+    return content
+
+
+def fetch_for(plans, contents):
+    urls = {}
+    for content in contents:
+        urls.update(image_urls(content))
+    needed = {key for plan in plans for key, _, _ in plan}
+    return fetch_images({key: url for key, url in urls.items() if key in needed}, RAW)
+
+
+def render_slide(fn, prs, content):
+    with span(getattr(fn, "__name__", "slide"), "slide"):
+        fn(prs, content)
+
+
+def package_entries(prs):
+    # The members python-pptx's PackageWriter writes, in the same order, with their content type.
+    parts = tuple(prs.part.package.iter_parts())
+    internals = _package_internals(prs.part.package, parts)
+    if internals is None:
+        # Untested python-pptx: let its own writer lay out the package and read the members back.
+        types = {part.partname.membername: part.content_type for part in parts}
+        buf = BytesIO()
+        prs.save(buf)
+        with zipfile.ZipFile(buf) as zf:
+            for name in zf.namelist():
+                yield name, types.get(name, CT.OPC_RELATIONSHIPS if name.endswith(".rels") else CT.XML), zf.read(name)
+        return
+    content_types, package_rels, part_rels = internals
+    yield CONTENT_TYPES_URI.membername, CT.XML, content_types
+    yield PACKAGE_URI.rels_uri.membername, CT.OPC_RELATIONSHIPS, package_rels
+    for part in parts:
+        yield part.partname.membername, part.content_type, part.blob
+        if part_rels(part):
+            yield part.partname.rels_uri.membername, CT.OPC_RELATIONSHIPS, part.rels.xml
+
+
+# python-pptx releases whose private package API _package_internals() was checked against.
+PPTX_INTERNALS = ("1.0",)
+
+
+def _package_internals(package, parts):
+    # (content types XML, package rels XML, part -> has relationships), or None on releases outside
+    # PPTX_INTERNALS. The only place the writer touches python-pptx private names.
+    if ".".join(pptx.__version__.split(".")[:2]) not in PPTX_INTERNALS:
+        return None
+    from pptx.opc.serialized import _ContentTypesItem
+
+    return serialize_part_xml(_ContentTypesItem.xml_for(parts)), package._rels.xml, lambda part: bool(part._rels)
+
+
+def zip_info(name, reproducible):
+    info = zipfile.ZipInfo(name, PINNED_DATE.timetuple()[:6] if reproducible else time.localtime()[:6])
+    if reproducible:
+        info.create_system = 0
+        info.external_attr = 0
+    return info
+
+
+def renumber_shape_ids(prs):
+    # Shape ids in document order per slide, plus the connector and animation references to them.
+    for slide in prs.slides:
+        tree = slide.shapes._spTree
+        ids = {}
+        for n, el in enumerate(tree.iter(qn("p:cNvPr")), start=1):
+            ids[el.get("id")] = str(n)
+            el.set("id", str(n))
+        for el in slide._element.iter(qn("a:stCxn"), qn("a:endCxn")):
+            el.set("id", ids.get(el.get("id"), el.get("id")))
+        for el in slide._element.iter(qn("p:spTgt"), qn("p:bldP")):
+            el.set("spid", ids.get(el.get("spid"), el.get("spid")))
+
+
+def pin_core_properties(prs):
+    core = prs.core_properties
+    core.created = core.modified = PINNED_DATE.replace(tzinfo=None)
+    core.revision = 1
+    core.last_modified_by = "create_pitchdeck.py"
+
+
+def normalize_xlsx(blob):
+    # Chart workbooks carry their own zip timestamps and creation dates.
+    stamp = PINNED_DATE.strftime("%Y-%m-%dT%H:%M:%SZ")
+    out = BytesIO()
+    with zipfile.ZipFile(BytesIO(blob)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == "docProps/core.xml":
+                data = re.sub(rb"(<dcterms:(?:created|modified)[^>]*>)[^<]*", lambda m: m.group(1) + stamp.encode(), data)
+            dst.writestr(zip_info(info.filename, True), data, compress_type=zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def serialize_deck(prs, level=None, reproducible=None):
+    level = ZIP_LEVEL if level is None else level
+    reproducible = REPRODUCIBLE if reproducible is None else reproducible
+    with span("serialize", "save") as args:
+        if reproducible:
+            pin_core_properties(prs)
+            renumber_shape_ids(prs)
+        entries = list(package_entries(prs))
+        if reproducible:
+            # [Content_Types].xml stays first, as OPC readers expect.
+            entries = entries[:1] + sorted(entries[1:])
+        buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        with zipfile.ZipFile(buf, "w") as zf:
+            for name, content_type, blob in entries:
+                if reproducible and content_type == CT.SML_SHEET:
+                    blob = normalize_xlsx(blob)
+                if content_type in STORED_TYPES:
+                    zf.writestr(zip_info(name, reproducible), blob, compress_type=zipfile.ZIP_STORED)
+                else:
+                    zf.writestr(zip_info(name, reproducible), blob, compress_type=zipfile.ZIP_DEFLATED, compresslevel=level)
+        args["bytes_out"] = buf.tell()
+        buf.seek(0)
+        return buf
+
+
+def file_digest(fh):
+    h = hashlib.sha256()
+    fh.seek(0)
+    for chunk in iter(lambda: fh.read(1 << 20), b""):
+        h.update(chunk)
+    fh.seek(0)
+    return h.hexdigest()
+
+
+def write_deck(buf, target, digest=None):
+    # target is a path (written atomically), a writable binary file, or "-" for stdout. With a
+    # digest, a path that already holds identical bytes is left untouched; returns False then.
+    buf.seek(0)
+    with span("write", "save", target=str(target)) as args:
+        if str(target) == "-":
+            shutil.copyfileobj(buf, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        elif hasattr(target, "write"):
+            shutil.copyfileobj(buf, target)
+        else:
+            try:
+                with open(target, "rb") as fh:
+                    args["unchanged"] = digest is not None and file_digest(fh) == digest
+            except OSError:
+                args["unchanged"] = False
+            if args["unchanged"]:
+                return False
+            atomic_write(target, buf)
+        return True
+
+
+def save_deck(prs, target, level=None, fallbacks=None):
+    # Returns (sha256 of the deck, whether a file was written, the target used). fallbacks maps the
+    # digest to further targets, tried in order while the previous one is locked (PermissionError).
+    with span("save", "save") as args:
+        buf = serialize_deck(prs, level)
+        args["bytes_out"] = buf.seek(0, os.SEEK_END)
+        digest = file_digest(buf)
+        targets = [target, *(fallbacks(digest) if fallbacks else ())]
+        for n, candidate in enumerate(targets, start=1):
+            try:
+                return digest, write_deck(buf, candidate, digest if REPRODUCIBLE else None), candidate
+            except PermissionError:
+                if n == len(targets):
+                    raise
+
+
+def assemble(content=CONTENT, slides=None):
+    with span("new_presentation", "slide"):
+        prs = new_presentation()
+    for fn in slides or SLIDES:
+        render_slide(fn, prs, content)
+    return prs
+
+
+# Build graph: fetch (URL key) -> raw (source file) -> derivative (key, width, height) -> slide
+# -> package. Nodes are tuples; the graph maps each to its dependencies and, if it has to run,
+# why. It is built from cached state only, so printing it fetches and renders nothing.
+def build_graph(content, slides=None, dpi=None, quality=None, incremental=False, max_age=cache.FETCH_MAX_AGE):
+    slides = list(slides or SLIDES)
+    plans = slide_plans(slides, content)
+    urls = image_urls(content)
+    meta = load_meta(RAW)
+    now = time.time()
+    graph = {}
+    derived = {}
+    for plan in plans:
+        for key, width_in, height_in in plan:
+            path = raw_path(key)
+            raw = ("raw", key)
+            if raw not in graph:
+                deps = []
+                if key in urls:
+                    fetch = ("fetch", key)
+                    if is_fresh(path, urls[key], meta.get(key, {}), now, max_age):
+                        stale = None
+                    else:
+                        stale = "revalidate" if usable(path) else "not downloaded"
+                    graph[fetch] = {"deps": [], "stale": stale}
+                    deps.append(fetch)
+                graph[raw] = {"deps": deps, "stale": None if usable(path) else f"no file at {path}"}
+            node = ("derivative", key, width_in, height_in)
+            if node in graph:
+                continue
+            if graph[raw]["stale"]:
+                stale = "source not available yet"
+            else:
+                derived[node[1:]] = derivative_path(key, width_in, height_in, quality, dpi)
+                stale = None if derived[node[1:]].exists() else "not cached"
+            graph[node] = {"deps": [raw], "stale": stale}
+
+    for n, (fn, plan) in enumerate(zip(slides, plans), start=1):
+        deps = [("derivative", *item) for item in dict.fromkeys(plan)]
+        if any(graph[dep]["stale"] for dep in deps):
+            stale = "images change"
+        elif not incremental:
+            stale = "rendered on every build without incremental reuse"
+        elif (CACHE_DIR / "slides" / f"{slide_fingerprint(fn, content, derived)}.pickle").exists():
+            stale = None
+        else:
+            stale = "not cached"
+        graph[("slide", n, getattr(fn, "__name__", "slide"))] = {"deps": deps, "stale": stale}
+    slide_nodes = [node for node in graph if node[0] == "slide"]
+    graph[("package",)] = {"deps": slide_nodes, "stale": "slides change" if any(graph[n]["stale"] for n in slide_nodes) else None}
+    return graph
+
+
+def node_name(node):
+    if node[0] == "derivative":
+        return f"derivative:{node[1]}@{node[2]:.2f}x{node[3]:.2f}in"
+    return ":".join(str(part) for part in node)
+
+
+def format_graph(graph):
+    lines = []
+    for node, info in graph.items():
+        state = f"stale ({info['stale']})" if info["stale"] else "fresh"
+        deps = ", ".join(node_name(dep) for dep in info["deps"])
+        if node == ("package",):
+            deps = f"{len(info['deps'])} slides"
+        lines.append(f"{node_name(node):<44} {state:<40} {'<- ' + deps if deps else ''}".rstrip())
+    stale = sum(1 for info in graph.values() if info["stale"])
+    lines.append(f"{stale} of {len(graph)} nodes stale")
+    return "\n".join(lines)
+
+
+class BlockedError(FetchError):
+    # Slides the build graph could not schedule; `blocked` maps each to the nodes it waited on.
+    def __init__(self, message, blocked, failures=None):
+        super().__init__(message, failures)
+        self.blocked = blocked
+
+
+def run_graph(graph, content, slides=None, workers=None, dpi=None, quality=None, incremental=False):
+    # Fetches run on I/O threads and crops on worker processes (one thread with a single worker:
+    # Pillow releases the GIL while decoding and resampling). Slides render here, in deck order,
+    # as soon as their derivatives exist, while later slides' images are still in flight.
+    # Returns (prs, media report, slide reuse stats or None), like render_deck().
+    slides = list(slides or SLIDES)
+    urls = image_urls(content)
+    RAW.mkdir(parents=True, exist_ok=True)
+    PROCESSED.mkdir(parents=True, exist_ok=True)
+    meta = load_meta(RAW)
+    if incremental:
+        (CACHE_DIR / "slides").mkdir(parents=True, exist_ok=True)
+
+    crops = sum(1 for node, info in graph.items() if node[0] == "derivative" and info["stale"])
+    workers = min(workers or os.cpu_count() or 1, max(1, crops))
+    if workers > 1:
+        cpu_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_worker_config(),))
+    else:
+        cpu_pool = ThreadPoolExecutor(max_workers=1)
+    io_pool = ThreadPoolExecutor(max_workers=cache.FETCH_WORKERS)
+
+    waiting = [node for node in graph if node[0] in ("fetch", "raw", "derivative")]
+    slide_nodes = [node for node in graph if node[0] == "slide"]
+    done, failed, errors = set(), set(), {}
+    futures, inflight = {}, {}
+    used = 0
+    fetched = False
+    since = span_count()
+    with span("new_presentation", "slide"):
+        prs = new_presentation()
+    stats = {"reused": [], "rebuilt": []} if incremental else None
+    images = {}
+    try:
+        while True:
+            for node in list(waiting):
+                deps = graph[node]["deps"]
+                if any(dep in failed for dep in deps):
+                    waiting.remove(node)
+                    failed.add(node)
+                    continue
+                if not all(dep in done for dep in deps):
+                    continue
+                kind = node[0]
+                if kind == "fetch" and graph[node]["stale"]:
+                    key = node[1]
+                    fut = io_pool.submit(fetch_one, key, urls[key], raw_path(key), meta.get(key, {}), cache.FETCH_TIMEOUT, cache.FETCH_RETRIES, cache.FETCH_BACKOFF)
+                    futures[fut] = node
+                    waiting.remove(node)
+                    continue
+                if kind == "raw" and not usable(raw_path(node[1])):
+                    errors[node[1]] = f"{node[1]}: no source image at {raw_path(node[1])}"
+                    waiting.remove(node)
+                    failed.add(node)
+                    continue
+                if kind == "derivative":
+                    item = node[1:]
+                    path = derivative_path(*item, quality, dpi)
+                    if not path.exists():
+                        # Admit crops while their estimated pixel memory fits under the cap; a lone crop always runs.
+                        job = (*item, quality, dpi)
+                        cost = estimate_peak(*job) if MEMORY_CAP else 0
+                        if inflight and (len(inflight) >= workers or used + cost > MEMORY_CAP):
+                            continue
+                        fut = cpu_pool.submit(_pooled, _crop_job, job)
+                        futures[fut] = node
+                        inflight[fut] = cost
+                        used += cost
+                        waiting.remove(node)
+                        continue
+                    _derived[item] = path
+                waiting.remove(node)
+                done.add(node)
+
+            while slide_nodes and all(dep in done for dep in graph[slide_nodes[0]]["deps"]):
+                node = slide_nodes.pop(0)
+                fn = slides[node[1] - 1]
+                if incremental:
+                    place_slide(prs, fn, content, images, stats)
+                else:
+                    render_slide(fn, prs, content)
+                done.add(node)
+
+            if not futures:
+                break
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                node = futures.pop(fut)
+                if node[0] == "fetch":
+                    key, path = node[1], raw_path(node[1])
+                    fetched = True
+                    try:
+                        meta[key], _, _ = fut.result()
+                    except FetchError as exc:
+                        if not keep_stale(meta, key, path, exc):
+                            errors[key] = str(exc)
+                            failed.add(node)
+                            continue
+                    done.add(node)
+                else:
+                    used -= inflight.pop(fut)
+                    _derived[node[1:]], spans = fut.result()
+                    record_spans(spans)
+                    done.add(node)
+    finally:
+        io_pool.shutdown(cancel_futures=True)
+        cpu_pool.shutdown(cancel_futures=True)
+        if fetched:
+            atomic_write(meta_path(RAW), json.dumps(meta, indent=2, sort_keys=True).encode())
+        group_spans(since, "fetch:", "fetch_images", "network", "bytes_in")
+        group_spans(since, "cropped_image:", "prepare_derivatives", "image", "bytes_out")
+
+    if errors or slide_nodes:
+        # Slides are added in deck order, so a slide whose own inputs are ready waits on the first blocked one.
+        blocked = {
+            node_name(node): [node_name(dep) for dep in graph[node]["deps"] if dep not in done] or [node_name(slide_nodes[0])]
+            for node in slide_nodes
+        }
+        lines = [f"{name} waits on {', '.join(deps)}" for name, deps in blocked.items() if not deps[0].startswith("slide:")]
+        queued = len(blocked) - len(lines)
+        if queued:
+            lines.append(f"{queued} later slide(s) wait behind them in deck order")
+        raise BlockedError(f"{len(blocked)} slide(s) could not be built:\n" + "\n".join(lines + list(errors.values())), blocked, errors)
+    if incremental:
+        _prune_slide_cache(CACHE_DIR / "slides")
+    plan = [node[1:] for node in graph if node[0] == "derivative"]
+    media = media_report(plan, dict.fromkeys(plan, quality), dpi)
+    return prs, media, stats
+
+
+def render_deck(content, slides=None, workers=None, dpi=None, media_budget=None, quality=None, incremental=False):
+    # Returns (prs, media report, slide reuse stats or None).
+    media_budget = MEDIA_BUDGET if media_budget is None else media_budget
+    if not media_budget:
+        graph = build_graph(content, slides, dpi, quality, incremental)
+        return run_graph(graph, content, slides, workers, dpi, quality, incremental)
+    # A media budget trades JPEG quality across every image at once, so all of them are fetched
+    # before any is cropped.
+    plan = plan_crops(slides, content)
+    fetch_for([plan], [content])
+    media = prepare_derivatives(plan, workers, dpi, media_budget, quality)
+    if incremental:
+        prs, stats = assemble_incremental(content, slides)
+    else:
+        prs, stats = assemble(content, slides), None
+    return prs, media, stats
+
+
+def build(workers=None, dpi=None, media_budget=None, quality=None, content=None, incremental=False, output=None, slides=None):
+    content = deck_content(content)
+    selected = select_slides(slides) if slides else None
+    prs, media, slides = render_deck(content, selected, workers, dpi, media_budget, quality, incremental)
+
+    def fallbacks(digest):
+        # A reproducible deck is named by its content, so reruns land on the same fallback file.
+        suffix = f"shadcn_{digest[:12]}" if REPRODUCIBLE else f"shadcn_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if selected:
+            return [f"Teacher_Copilot_Pitch_Deck_Selection_{suffix}.pptx"]
+        return ["Teacher_Copilot_Pitch_Deck_Enhanced.pptx", f"Teacher_Copilot_Pitch_Deck_{suffix}.pptx"]
+
+    if output:
+        digest, written, path = save_deck(prs, output)
+    else:
+        # A partial deck never lands on the full deck's file names.
+        first = "Teacher_Copilot_Pitch_Deck_Selection.pptx" if selected else "Teacher_Copilot_Pitch_Deck.pptx"
+        try:
+            digest, written, path = save_deck(prs, first, fallbacks=fallbacks)
+        except PermissionError:
+            raise PermissionError("Could not save deck. Close open .pptx files and rerun.") from None
+    path = path if hasattr(path, "write") else Path(path)
+    return {"path": path, "media": media, "slides": slides, "sha256": digest, "written": written}
+
+
+def _init_deck_worker(config):
+    _init_worker(config)
+    # Pay for loading the default template once per worker, not once per deck.
+    new_presentation()
+
+
+def _deck_job(content, output, derived):
+    started = time.perf_counter()
+    _derived.update(derived)
+    prs = assemble(content)
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    digest, _, _ = save_deck(prs, output)
+    return time.perf_counter() - started, digest
+
+
+def deck_output(content):
+    return Path(content.get("output") or f"{safe_name(content['name'])}_Pitch_Deck.pptx")
+
+
+def build_many(specs, workers=None, dpi=None, media_budget=None, quality=None, image_workers=None):
+    contents = [deck_content(spec) for spec in specs]
+    outputs = [deck_output(content) for content in contents]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("every deck needs its own output path")
+
+    # A deck that fails to plan, fetch or crop is reported on its own; the others still build.
+    def failed(i, exc):
+        del plans[i]
+        return {"index": i, "name": contents[i]["name"], "path": outputs[i], "error": exc}
+
+    plans = {}
+    for i, content in enumerate(contents):
+        try:
+            plans[i] = plan_crops(content=content)
+        except Exception as exc:
+            yield {"index": i, "name": content["name"], "path": outputs[i], "error": exc}
+
+    # Warm-up: one fetch and one derivative pass shared by all decks.
+    try:
+        fetch_for(plans.values(), [contents[i] for i in plans])
+    except FetchError as exc:
+        for i, plan in list(plans.items()):
+            missing = [exc.failures[key] for key in dict.fromkeys(key for key, _, _ in plan) if key in exc.failures]
+            if missing or not exc.failures:
+                yield failed(i, FetchError("could not fetch images:\n" + "\n".join(missing)) if missing else exc)
+    media = {}
+    if media_budget or MEDIA_BUDGET:
+        # Quality is spread per deck, so each deck gets its own derivative set.
+        for i, plan in list(plans.items()):
+            try:
+                media[i] = prepare_derivatives(plan, image_workers, dpi, media_budget, quality)
+            except Exception as exc:
+                yield failed(i, exc)
+    else:
+        union = [item for plan in plans.values() for item in plan]
+        try:
+            shared = {e["item"]: e for e in prepare_derivatives(union, image_workers, dpi, None, quality)}
+        except Exception:
+            # Crops that succeeded are cached, so redoing each deck alone only repeats the failures.
+            shared = {}
+            for i, plan in list(plans.items()):
+                try:
+                    shared.update((e["item"], e) for e in prepare_derivatives(plan, image_workers, dpi, None, quality))
+                except Exception as exc:
+                    yield failed(i, exc)
+        media = {i: [shared[item] for item in dict.fromkeys(plan)] for i, plan in plans.items()}
+    if not plans:
+        return
+
+    workers = min(workers or os.cpu_count() or 1, max(1, len(plans)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_deck_worker, initargs=(_worker_config(),)) as pool:
+        futures = {
+            pool.submit(_deck_job, contents[i], outputs[i], {e["item"]: e["path"] for e in media[i]}): i for i in plans
+        }
+        for fut in as_completed(futures):
+            i = futures[fut]
+            result = {"index": i, "name": contents[i]["name"], "path": outputs[i], "media": media[i]}
+            try:
+                result["seconds"], result["sha256"] = fut.result()
+            except Exception as exc:
+                result["error"] = exc
+            yield result
+
+
+def tagged_shapes(prs):
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            kind, sep, spec = shape.name.partition(":")
+            if sep and kind in ("text", "photo", "chart", "data"):
+                yield slide, shape, kind, spec
+
+
+def photo_slots(prs):
+    return [tuple(json.loads(spec)) for _, _, kind, spec in tagged_shapes(prs) if kind == "photo"]
+
+
+def _swap_picture(slide, picture, image_file):
+    blip = picture._element.blipFill.blip
+    old = blip.rEmbed
+    _, rId = slide.part.get_or_add_image_part(image_file)
+    if rId != old:
+        blip.rEmbed = rId
+        slide.part.drop_rel(old)
+
+
+def patch_deck(prs, content):
+    for slide, shape, kind, spec in tagged_shapes(prs):
+        if kind == "text":
+            templates, size, font, bold, spacing = json.loads(spec)
+            values = [template.format(**content) for template in templates]
+            # Refit from the requested size: the base deck's text may have been shrunk for its own values.
+            size = autofit(shape, values, size, font, bold, spacing)
+            for paragraph, value in zip(shape.text_frame.paragraphs, values):
+                paragraph.text = value
+                paragraph.font.size = Pt(size) if size != TEXT_SIZE else None
+        elif kind == "photo":
+            key, width_in, height_in = json.loads(spec)
+            _swap_picture(slide, shape, picture_source(derivative(asset(content, key), width_in, height_in)))
+        elif kind == "data":
+            name, chart_kind = json.loads(spec)
+            categories, series = chart_series(chart_source(content["charts"][name], chart_kind, f"charts.{name}"))
+            data = CategoryChartData()
+            data.categories = categories
+            for series_name, values in series:
+                data.add_series(series_name, values)
+            shape.chart.replace_data(data)
+        else:
+            chart = shape.chart
+            data = CategoryChartData()
+            data.categories = list(chart.plots[0].categories)
+            data.add_series(chart.series[0].name, content[spec])
+            chart.replace_data(data)
+
+
+def build_variants(specs, base=None, dpi=None, quality=None, workers=None):
+    # Template-clone mode: build the base deck once, then copy its package per variant and
+    # rewrite only the tagged text, chart data and pictures. Variants must keep the base's
+    # structure (same number of team members, revenue years, ...).
+    base = deck_content(base)
+    contents = [deck_content(spec) for spec in specs]
+    outputs = [deck_output(content) for content in contents]
+
+    base_plan = plan_crops(content=base)
+    fetch_for([base_plan], [base])
+    prepare_derivatives(base_plan, workers, dpi, None, quality)
+    template = assemble(base)
+    package = serialize_deck(template).read()
+
+    slots = photo_slots(template)
+    plans = [[(asset(content, key), w, h) for key, w, h in slots] for content in contents]
+    fetch_for(plans, contents)
+    prepare_derivatives([item for plan in plans for item in plan], workers, dpi, None, quality)
+
+    for i, (content, output) in enumerate(zip(contents, outputs)):
+        started = time.perf_counter()
+        result = {"index": i, "name": content["name"], "path": output}
+        try:
+            prs = Presentation(BytesIO(package))
+            patch_deck(prs, content)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            result["sha256"], _, _ = save_deck(prs, output)
+            result["seconds"] = time.perf_counter() - started
+        except Exception as exc:
+            result["error"] = exc
+        yield result
+
+
+# Declarative deck specs (JSON or TOML), compiled by pitchdeck_spec and cached by the hash of
+# their bytes and the theme. Font roles a spec may name instead of a family:
+FONTS = {"body": FONT, "head": FONT_HEAD, "script": FONT_SCRIPT}
+
+
+# spec hash -> compiled spec, so a long-running process skips even the pickle load.
+_compiled_specs = {}
+
+
+def compile_spec(path):
+    path = Path(path)
+    return compile_spec_bytes(path.read_bytes(), path.suffix, str(path))
+
+
+def compile_spec_bytes(raw, suffix=".json", where="spec"):
+    # Color tokens are resolved to RGB at compile time, so the theme is part of the key.
+    tokens = json.dumps(theme_tokens(), sort_keys=True)
+    digest = hashlib.sha256(raw + f"{SPEC_VERSION}{suffix}{tokens}".encode()).hexdigest()
+    if digest in _compiled_specs:
+        return _compiled_specs[digest]
+    cached = CACHE_DIR / "specs" / f"{digest}.pickle"
+    try:
+        compiled = pickle.loads(cached.read_bytes())
+    except (OSError, pickle.UnpicklingError, EOFError):
+        try:
+            compiled = compile_spec_data(parse_spec(raw, suffix), theme_colors(), FONTS)
+        except ValueError as exc:
+            raise SpecError(f"{where}: {exc}") from exc
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(cached, pickle.dumps(compiled))
+    _compiled_specs[digest] = compiled
+    return compiled
+
+
+def render_spec_slide(prs, compiled_slide, content):
+    background, header, items, tagline = compiled_slide
+    if background != "none" and header is not None:
+        s = new_slide(prs, "content-soft" if background == "soft" else "content")
+    else:
+        s = new_slide(prs)
+        if background != "none":
+            add_background(s, soft=background == "soft")
+        if header is not None:
+            draw_header_bar(s.shapes)
+    if header is not None:
+        add_header(s, header[0], right_text=header[1], content=content)
+    for op, *args in items:
+        if op == "card":
+            (l, t, w, h), color = args
+            card(s, l, t, w, h, color=RGBColor(*color))
+        elif op == "photo":
+            key, (l, t, w, h), rounded = args
+            add_photo(s, key, l, t, w, h, rounded=rounded, content=content)
+        elif op == "text":
+            (l, t, w, h), text, size, bold, color, align, italic, font = args
+            box = s.shapes.add_textbox(Inches(l), Inches(t), Inches(w), Inches(h))
+            style_text(box, text, size=size, bold=bold, color=RGBColor(*color), align=ALIGN[align], italic=italic, font=font, content=content)
+        elif op == "bullets":
+            (l, t, w, h), lines, size, color, spacing = args
+            box = s.shapes.add_textbox(Inches(l), Inches(t), Inches(w), Inches(h))
+            style_bullets(box, list(lines), size=size, color=RGBColor(*color), spacing=spacing, content=content)
+        elif op == "tiers":
+            tiers, size = args
+            add_tiers(s, [(label, txt, RGBColor(*color), *box) for label, txt, color, *box in tiers], size=size)
+        elif op == "bars":
+            bars, baseline, width = args
+            add_bars(s, [(x, h, RGBColor(*color)) for x, h, color in bars], baseline, width)
+        elif op == "pie":
+            (l, t, w, h), categories, values, colors, series = args
+            add_pie(s, l, t, w, h, list(categories), values, [RGBColor(*c) for c in colors], series=series)
+        elif op == "chart":
+            (l, t, w, h), data, kind, colors = args
+            source = bound_chart(content, data, kind) if isinstance(data, str) else data
+            if source is None:
+                raise ChartError(f"no chart {data!r} in content['charts']")
+            data_chart(s, source, l, t, w, h, [RGBColor(*c) for c in colors] or CHART_COLORS)
+    if tagline is not None:
+        add_tagline(s, tagline[0], color=RGBColor(*tagline[1]))
+
+
+def spec_slides(compiled):
+    slides = []
+    for n, sl in enumerate(compiled["slides"]):
+
+        def fn(prs, content, sl=sl):
+            render_spec_slide(prs, sl, content)
+
+        fn.__name__ = f"spec_slide_{n + 1}"
+        # Fingerprinted by its compiled form; the closure source is the same for every spec slide.
+        fn.source = repr(sl)
+        fn.charts = [args[1] for op, *args in sl[2] if op == "chart" and isinstance(args[1], dict)]
+        slides.append(fn)
+    return slides
+
+
+def build_spec(path, output=None, workers=None, dpi=None, media_budget=None, quality=None, incremental=False, slides=None):
+    compiled = compile_spec(path)
+    content = deck_content(compiled["content"])
+    selected = spec_slides(compiled)
+    if slides:
+        selected = select_slides(slides, selected)
+    prs, media, stats = render_deck(content, selected, workers, dpi, media_budget, quality, incremental)
+    output = Path(output or compiled["output"] or Path(path).with_suffix(".pptx"))
+    digest, written, _ = save_deck(prs, output)
+    return {"path": output, "media": media, "slides": stats, "sha256": digest, "written": written}
+
+
+def parse_bytes(text):
+    units = {"k": 1024, "m": 1024**2, "g": 1024**3}
+    text = text.strip().lower().rstrip("b")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+# Failures in the deck's inputs: reported as a message and a non-zero exit, not a traceback.
+BUILD_ERRORS = (FetchError, SpecError, ChartError)
+
+
+def main(argv=None):
+    global MEMORY_CAP, THEMED_LAYOUTS, AUTOFIT, ZIP_LEVEL, REPRODUCIBLE
+    parser = argparse.ArgumentParser(description="Build the Teacher Copilot pitch deck.")
+    parser.add_argument("--workers", type=int, help="processes used to render image derivatives")
+    parser.add_argument("--dpi", type=int, help=f"target image resolution (default {TARGET_DPI})")
+    parser.add_argument("--media-budget", type=parse_bytes, help="cap on total image bytes, e.g. 600k or 1.5m")
+    parser.add_argument(
+        "--quality",
+        type=lambda v: v if v == "auto" else int(v),
+        help=f"JPEG quality for derivatives, or 'auto' to search per image for SSIM >= {SSIM_TARGET}",
+    )
+    parser.add_argument("--memory-cap", type=parse_bytes, help="cap on decoded image memory, e.g. 256m")
+    parser.add_argument("--media-report", action="store_true", help="print bytes per image after the build")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reuse cached XML for slides whose code, content, assets and theme are unchanged",
+    )
+    parser.add_argument(
+        "--inline-chrome",
+        action="store_true",
+        help="draw backgrounds and headers on every slide instead of in shared slide layouts",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the build graph (fetch, raw, derivative, slide, package) and which nodes are stale, then exit",
+    )
+    parser.add_argument(
+        "--no-autofit",
+        action="store_true",
+        help="keep text sizes as written instead of shrinking text that overflows its box",
+    )
+    parser.add_argument(
+        "--chart-points",
+        type=int,
+        help=f"most points per data-bound bar or line series; longer series are reduced (default {charts.CHART_POINTS})",
+    )
+    parser.add_argument("--profile", action="store_true", help="print time, CPU, memory and bytes per build stage")
+    parser.add_argument("--trace", type=Path, help="write a Chrome trace (chrome://tracing, Perfetto) of the build")
+    parser.add_argument("--spec", type=Path, help="build a deck from a declarative JSON/TOML deck spec")
+    parser.add_argument("--output", type=Path, help="where to write the deck; '-' streams it to stdout")
+    parser.add_argument(
+        "--slides",
+        type=lambda v: [name for name in v.split(",") if name.strip()],
+        help="comma-separated slides to build, in order, by name (market, slide_market) or 1-based position",
+    )
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="byte-identical output for identical inputs (also on when SOURCE_DATE_EPOCH is set)",
+    )
+    parser.add_argument("--zip-level", type=int, choices=range(10), metavar="0-9", help=f"deflate level for XML parts (default {ZIP_LEVEL})")
+    parser.add_argument("--specs", type=Path, help="JSON list of deck specs to build in parallel (see CONTENT)")
+    parser.add_argument("--deck-workers", type=int, help="processes used to build decks with --specs")
+    parser.add_argument(
+        "--clone",
+        action="store_true",
+        help="with --specs, build the default deck once and patch only per-deck content into copies",
+    )
+    args = parser.parse_args(argv)
+
+    if args.slides and args.specs:
+        parser.error("--slides applies to single deck builds, not --specs")
+    if args.output and args.specs:
+        parser.error("--output applies to single deck builds; each deck in --specs names its own output")
+    if args.slides:
+        try:
+            select_slides(args.slides, spec_slides(compile_spec(args.spec)) if args.spec else None)
+        except SpecError as exc:
+            raise SystemExit(str(exc))
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if args.reproducible:
+        REPRODUCIBLE = True
+    if args.zip_level is not None:
+        ZIP_LEVEL = args.zip_level
+    if args.memory_cap:
+        MEMORY_CAP = args.memory_cap
+    if args.inline_chrome:
+        THEMED_LAYOUTS = False
+    if args.no_autofit:
+        AUTOFIT = False
+    if args.chart_points:
+        if args.chart_points < 3:
+            parser.error("--chart-points must be at least 3")
+        charts.CHART_POINTS = args.chart_points
+    options = {"dpi": args.dpi, "media_budget": args.media_budget, "quality": args.quality}
+    if args.specs:
+        specs = json.loads(args.specs.read_text())
+        failed = 0
+        try:
+            if args.clone:
+                del options["media_budget"]
+                results = build_variants(specs, workers=args.workers, **options)
+            else:
+                results = build_many(specs, workers=args.deck_workers, image_workers=args.workers, **options)
+        except BUILD_ERRORS as exc:
+            raise SystemExit(str(exc))
+        for result in results:
+            if "error" in result:
+                failed += 1
+                print(f"FAILED {result['name']}: {result['error']}")
+                continue
+            if args.media_report and "media" in result:
+                print(format_media_report(result["media"]))
+            print(f"Saved {result['path']} in {result['seconds']:.2f}s (sha256 {result['sha256']})")
+        if failed:
+            raise SystemExit(f"{failed} of {len(specs)} decks failed")
+        return
+
+    if args.dry_run:
+        try:
+            if args.spec:
+                compiled = compile_spec(args.spec)
+                content, slides = deck_content(compiled["content"]), spec_slides(compiled)
+            else:
+                content, slides = deck_content(), None
+            if args.slides:
+                slides = select_slides(args.slides, slides)
+            print(format_graph(build_graph(content, slides, args.dpi, args.quality, args.incremental)))
+        except BUILD_ERRORS as exc:
+            raise SystemExit(str(exc))
+        return
+
+    if args.profile or args.trace:
+        start_profile()
+    try:
+        if args.spec:
+            result = build_spec(args.spec, args.output, workers=args.workers, incremental=args.incremental, slides=args.slides, **options)
+        else:
+            result = build(workers=args.workers, incremental=args.incremental, output=args.output, slides=args.slides, **options)
+    except BUILD_ERRORS as exc:
+        raise SystemExit(str(exc))
+    finally:
+        spans = stop_profile()
+    # Keep stdout clean when the deck itself is streamed there.
+    out = sys.stderr if str(args.output) == "-" else sys.stdout
+    if args.profile:
+        print(format_profile(spans), file=out)
+    if args.trace:
+        args.trace.write_text(json.dumps(chrome_trace(spans)))
+    if args.media_report:
+        print(format_media_report(result["media"]), file=out)
+    if result["slides"]:
+        rebuilt = ", ".join(result["slides"]["rebuilt"]) or "none"
+        print(f"Reused {len(result['slides']['reused'])} cached slides; rebuilt: {rebuilt}", file=out)
+    print(f"{'Saved' if result['written'] else 'Unchanged'} {result['path']} (sha256 {result['sha256']})", file=out)
 
 
 if __name__ == "__main__":
-    build()
+    main()
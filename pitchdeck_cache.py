@@ -0,0 +1,275 @@
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from PIL import Image
+
+from pitchdeck_profile import span
+
+# Build caches that are not image derivatives (compiled specs, chart series, slide plans, slide XML).
+CACHE_DIR = Path(".pitchdeck_cache")
+
+USER_AGENT = "Mozilla/5.0"
+FETCH_WORKERS = 6
+FETCH_TIMEOUT = 30
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+# Seconds a downloaded image is trusted before it is revalidated with the origin.
+FETCH_MAX_AGE = 24 * 3600
+# Seconds a cached image is served without probing again after its revalidation failed, so offline
+# builds pay for one failed check rather than one per build.
+FETCH_FAILED_AGE = 3600
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+REDIRECT_STATUS = {301, 302, 303, 307, 308}
+# Failures no retry can fix within a build: the host does not resolve or nothing listens on it.
+PERMANENT_ERRORS = (socket.gaierror, ConnectionRefusedError)
+
+log = logging.getLogger(__name__)
+
+
+def safe_name(key):
+    return "".join(ch if ch.isalnum() or ch in ("_", "-") else "_" for ch in key)
+
+
+class FetchError(Exception):
+    # `failures` maps asset key -> message when a batch fetch fails for only some of its images.
+    def __init__(self, message, failures=None):
+        super().__init__(message)
+        self.failures = failures or {}
+
+
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def atomic_write(path, data):
+    # data is bytes or a readable binary file, copied from its current position.
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp files are private; give the result the permissions a plain open() would.
+        os.chmod(tmp, 0o666 & ~_umask)
+        with os.fdopen(fd, "wb") as fh:
+            if hasattr(data, "read"):
+                shutil.copyfileobj(data, fh)
+            else:
+                fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# Idle keep-alive connections, keyed by (scheme, netloc) and shared by the fetch threads.
+_idle_conns = {}
+_idle_lock = threading.Lock()
+
+
+def _acquire_conn(scheme, netloc, timeout):
+    with _idle_lock:
+        idle = _idle_conns.get((scheme, netloc))
+        if idle:
+            return idle.pop(), True
+    cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    return cls(netloc, timeout=timeout), False
+
+
+def _release_conn(scheme, netloc, conn):
+    with _idle_lock:
+        _idle_conns.setdefault((scheme, netloc), []).append(conn)
+
+
+def close_connections():
+    with _idle_lock:
+        conns = [c for idle in _idle_conns.values() for c in idle]
+        _idle_conns.clear()
+    for conn in conns:
+        conn.close()
+
+
+def _http_get(url, headers, timeout, max_redirects=5):
+    for _ in range(max_redirects + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise FetchError(f"unsupported URL scheme: {url}")
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = _acquire_conn(parts.scheme, parts.netloc, timeout)
+            try:
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                # A pooled connection may have been closed by the server while idle.
+                if reused:
+                    continue
+                raise
+        if resp.will_close:
+            conn.close()
+        else:
+            _release_conn(parts.scheme, parts.netloc, conn)
+        if resp.status in REDIRECT_STATUS and resp.getheader("Location"):
+            url = urljoin(url, resp.getheader("Location"))
+            continue
+        return resp.status, resp.headers, body
+    raise FetchError(f"too many redirects: {url}")
+
+
+def _check_image(data):
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.load()
+    except Exception as exc:
+        raise FetchError(f"payload does not decode as an image: {exc}") from exc
+
+
+def usable(path):
+    return path.exists() and path.stat().st_size > 0
+
+
+def fetch_one(key, url, dest, entry, timeout, retries, backoff):
+    with span(f"fetch:{key}", "network", url=url) as args:
+        fresh, status, nbytes = _fetch_attempts(key, url, dest, entry, timeout, retries, backoff)
+        args.update(status=status, bytes_in=nbytes)
+        return fresh, status, nbytes
+
+
+def _fetch_attempts(key, url, dest, entry, timeout, retries, backoff):
+    headers = {"User-Agent": USER_AGENT, "Accept": "image/*", "Accept-Encoding": "identity"}
+    if entry.get("url") == url and usable(dest):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    for attempt in range(retries + 1):
+        try:
+            status, resp_headers, body = _http_get(url, headers, timeout)
+            if status == 304:
+                fresh = dict(entry, checked=time.time())
+                fresh.pop("failed", None)
+                return fresh, "revalidated", 0
+            if status in RETRY_STATUS:
+                raise OSError(f"HTTP {status}")
+            if status != 200:
+                raise FetchError(f"{key}: HTTP {status} from {url}")
+            ctype = resp_headers.get("Content-Type", "")
+            if not ctype.lower().startswith("image/"):
+                raise FetchError(f"{key}: expected an image from {url}, got {ctype or 'no content type'}")
+            _check_image(body)
+            atomic_write(dest, body)
+            fresh = {
+                "url": url,
+                "etag": resp_headers.get("ETag"),
+                "last_modified": resp_headers.get("Last-Modified"),
+                "checked": time.time(),
+                "size": len(body),
+            }
+            return fresh, "downloaded", len(body)
+        except PERMANENT_ERRORS as exc:
+            raise FetchError(f"{key}: {url} is unreachable: {exc}") from exc
+        except (OSError, http.client.HTTPException) as exc:
+            if attempt == retries:
+                raise FetchError(f"{key}: {url} failed after {retries + 1} attempts: {exc}") from exc
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def fetch_images(
+    urls,
+    dest,
+    workers=FETCH_WORKERS,
+    timeout=FETCH_TIMEOUT,
+    retries=FETCH_RETRIES,
+    backoff=FETCH_BACKOFF,
+    max_age=FETCH_MAX_AGE,
+    force=False,
+):
+    with span("fetch_images", "network") as args:
+        results = _fetch_images(urls, dest, workers, timeout, retries, backoff, max_age, force)
+        args["bytes_in"] = sum(r["bytes"] for r in results.values())
+        return results
+
+
+def is_fresh(path, url, entry, now, max_age):
+    if not usable(path) or entry.get("url", url) != url:
+        return False
+    if now - entry.get("failed", 0) < FETCH_FAILED_AGE:
+        return True
+    checked = entry.get("checked", path.stat().st_mtime)
+    return max_age is None or now - checked < max_age
+
+
+def keep_stale(meta, key, path, exc):
+    # Falls back to the cached file when revalidation fails and records when it failed; returns
+    # False when there is nothing cached to fall back on.
+    if not usable(path):
+        return False
+    log.warning("keeping cached %s, revalidation failed: %s", path, exc)
+    meta[key] = dict(meta.get(key, {}), failed=time.time())
+    return True
+
+
+def meta_path(dest):
+    # ETag, Last-Modified and check times of the images in dest, next to the directory.
+    return dest.parent / f"{dest.name}.meta.json"
+
+
+def load_meta(dest):
+    path = meta_path(dest)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _fetch_images(urls, dest, workers, timeout, retries, backoff, max_age, force):
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    meta = load_meta(dest)
+
+    results = {}
+    pending = {}
+    now = time.time()
+    for key, url in urls.items():
+        path = dest / f"{safe_name(key)}.jpg"
+        entry = meta.get(key, {})
+        if not force and is_fresh(path, url, entry, now, max_age):
+            results[key] = {"path": path, "status": "fresh", "bytes": 0}
+            continue
+        pending[key] = (url, path, entry)
+
+    errors = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            futures = {
+                key: pool.submit(fetch_one, key, url, path, entry, timeout, retries, backoff)
+                for key, (url, path, entry) in pending.items()
+            }
+            for key, fut in futures.items():
+                path = pending[key][1]
+                try:
+                    meta[key], status, nbytes = fut.result()
+                except FetchError as exc:
+                    if not keep_stale(meta, key, path, exc):
+                        errors[key] = str(exc)
+                        continue
+                    status, nbytes = "stale", 0
+                results[key] = {"path": path, "status": status, "bytes": nbytes}
+        atomic_write(meta_path(dest), json.dumps(meta, indent=2, sort_keys=True).encode())
+
+    if errors:
+        raise FetchError("could not fetch images:\n" + "\n".join(errors.values()), errors)
+    return results
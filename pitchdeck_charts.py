@@ -0,0 +1,254 @@
+import csv
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+from pptx.enum.chart import XL_CHART_TYPE
+
+from pitchdeck_cache import CACHE_DIR, atomic_write
+from pitchdeck_profile import span
+
+# Native charts bound to data. A source is either inline ("categories" with "values" or a
+# "series" object) or a data file ("file": .csv/.tsv, .npy/.npz or .parquet) read by its "x"
+# and "y" columns. Rows sharing an x are combined with "agg", and series longer than the point
+# budget are reduced before they reach the chart XML: line series keep their shape (LTTB), bar
+# series are binned, and pie slices past the budget are summed into "Other".
+CHART_POINTS = 500
+PIE_SLICES = 6
+CHART_VERSION = 1
+CHART_KINDS = {"bar": XL_CHART_TYPE.COLUMN_CLUSTERED, "line": XL_CHART_TYPE.LINE, "pie": XL_CHART_TYPE.PIE}
+AGGREGATES = ("sum", "mean", "count", "min", "max")
+
+
+class ChartError(ValueError):
+    pass
+
+
+# chart key -> (categories, [(name, values)]), backed by CACHE_DIR/charts.
+_charts = {}
+
+
+def chart_source(source, kind="bar", where="chart"):
+    # Validated copy of a source with its defaults filled in; errors name `where`.
+    if not isinstance(source, dict):
+        raise ChartError(f"{where}: expected an object with 'file' or 'categories'")
+    source = dict(source)
+    source.setdefault("kind", kind)
+    if source["kind"] not in CHART_KINDS:
+        raise ChartError(f"{where}.kind: expected one of {sorted(CHART_KINDS)}, got {source['kind']!r}")
+    source.setdefault("agg", None if source["kind"] == "line" else "sum")
+    if source["agg"] not in (None, *AGGREGATES):
+        raise ChartError(f"{where}.agg: expected one of {list(AGGREGATES)}, got {source['agg']!r}")
+    points = source.get("points")
+    if points is not None and (isinstance(points, bool) or not isinstance(points, int) or points < 3):
+        raise ChartError(f"{where}.points: expected a whole number of at least 3, got {points!r}")
+    if "file" in source:
+        if not isinstance(source["file"], str) or "y" not in source:
+            raise ChartError(f"{where}: a file source needs 'file' and 'y' (and usually 'x')")
+        if not isinstance(source["y"], list):
+            source["y"] = [source["y"]]
+    elif "categories" in source:
+        series = source.get("series", {"Series 1": source.get("values")})
+        if not isinstance(series, dict) or not all(isinstance(v, list) and len(v) == len(source["categories"]) for v in series.values()):
+            raise ChartError(f"{where}: need one value per category in 'values' or in each of 'series'")
+        source["series"] = series
+        source.pop("values", None)
+    else:
+        raise ChartError(f"{where}: expected 'file' or 'categories'")
+    if source["kind"] == "pie" and len(source.get("y") or source["series"]) != 1:
+        raise ChartError(f"{where}: a pie chart takes exactly one series")
+    return source
+
+
+def data_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def chart_stamps(content, fn=None):
+    # Everything outside content and slide source that a chart reads, so cached slides follow
+    # edits to their data files.
+    sources = [*content.get("charts", {}).values(), *getattr(fn, "charts", ())]
+    return [CHART_POINTS, *(data_stamp(src["file"]) for src in sources if isinstance(src, dict) and "file" in src)]
+
+
+def read_columns(path, names):
+    # name -> 1-D array for each requested column, as stored (x columns may hold strings).
+    import numpy as np
+
+    path = Path(path)
+    suffix = path.suffix.lower()
+    try:
+        if suffix in (".csv", ".tsv"):
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f, delimiter="\t" if suffix == ".tsv" else ",")
+                header = next(reader, [])
+                missing = [n for n in names if n not in header]
+                if missing:
+                    raise ChartError(f"{path}: no column {missing[0]!r} (has {', '.join(header)})")
+                idx = [header.index(n) for n in names]
+                cols = [[] for _ in idx]
+                appends = [col.append for col in cols]
+                for row in reader:
+                    if row:
+                        for append, i in zip(appends, idx):
+                            append(row[i])
+            return {n: np.array(col) for n, col in zip(names, cols)}
+        if suffix == ".npy":
+            arr = np.load(path)
+            if arr.ndim == 1:
+                arr = arr[:, None]
+            return {n: arr[:, int(n)] for n in names}
+        if suffix == ".npz":
+            with np.load(path) as arrays:
+                return {n: arrays[n] for n in names}
+        if suffix == ".parquet":
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ChartError(f"{path}: reading Parquet needs pyarrow (pip install pyarrow)") from None
+            table = pq.read_table(path, columns=list(dict.fromkeys(names)))
+            return {n: table.column(n).to_numpy() for n in names}
+    except (OSError, KeyError, IndexError, ValueError) as exc:
+        if isinstance(exc, ChartError):
+            raise
+        raise ChartError(f"{path}: {exc}") from exc
+    raise ChartError(f"{path}: unsupported data file (use .csv, .tsv, .npy, .npz or .parquet)")
+
+
+def group_rows(x, ys, agg):
+    # One row per distinct x, in order of first appearance, each y combined with agg.
+    import numpy as np
+
+    keys, first, inverse = np.unique(x, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    groups = rank[inverse.ravel()]
+    n = len(keys)
+    counts = np.bincount(groups, minlength=n)
+    out = []
+    for y in ys:
+        if agg == "count":
+            values = counts.astype(np.float64)
+        elif agg in ("sum", "mean"):
+            values = np.bincount(groups, weights=y, minlength=n)
+            if agg == "mean":
+                values /= counts
+        else:
+            values = np.full(n, np.inf if agg == "min" else -np.inf)
+            (np.minimum if agg == "min" else np.maximum).at(values, groups, y)
+        out.append(values)
+    return keys[order], out
+
+
+def lttb(x, y, points):
+    # Indices of `points` samples that keep the visual shape of the line (x, y):
+    # Largest-Triangle-Three-Buckets, one numpy pass per bucket.
+    import numpy as np
+
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    picked = np.empty(points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def bin_rows(x, ys, points, agg):
+    # `points` runs of consecutive rows, each labelled by its first x.
+    import numpy as np
+
+    edges = np.linspace(0, len(x), points + 1).astype(np.int64)
+    starts = edges[:-1]
+    out = []
+    for y in ys:
+        if agg in ("min", "max"):
+            out.append((np.minimum if agg == "min" else np.maximum).reduceat(y, starts))
+        else:
+            values = np.add.reduceat(y, starts)
+            out.append(values / np.diff(edges) if agg == "mean" else values)
+    return x[starts], out
+
+
+def reduce_series(source, x, ys, points):
+    import numpy as np
+
+    kind, agg = source["kind"], source["agg"]
+    if agg is not None:
+        x, ys = group_rows(x, ys, agg)
+    if len(x) <= points:
+        return x, ys
+    if kind == "line":
+        try:
+            position = x.astype(np.float64)
+        except (TypeError, ValueError):
+            position = np.arange(len(x), dtype=np.float64)
+        share = max(3, points // len(ys))
+        keep = np.unique(np.concatenate([lttb(position, y, share) for y in ys]))
+        return x[keep], [y[keep] for y in ys]
+    if kind == "bar":
+        return bin_rows(x, ys, points, agg)
+    (y,) = ys
+    keep = np.sort(np.argsort(-y, kind="stable")[: points - 1])
+    return np.append(x[keep], "Other"), [np.append(y[keep], y.sum() - y[keep].sum())]
+
+
+def load_series(source, points):
+    import numpy as np
+
+    if "file" not in source:
+        x = np.array(source["categories"])
+        names = list(source["series"])
+        ys = [np.asarray(v, dtype=np.float64) for v in source["series"].values()]
+    else:
+        names = [str(name) for name in source["y"]]
+        columns = read_columns(source["file"], [*([source["x"]] if "x" in source else []), *source["y"]])
+        ys = []
+        for name in source["y"]:
+            try:
+                ys.append(np.asarray(columns[name], dtype=np.float64))
+            except ValueError as exc:
+                raise ChartError(f"{source['file']}: column {name!r} is not numeric ({exc})") from exc
+        x = columns[source["x"]] if "x" in source else np.arange(1, len(ys[0]) + 1)
+        if x.dtype.kind == "f" and np.all(np.mod(x, 1) == 0):
+            x = x.astype(np.int64)
+    if not len(x):
+        raise ChartError(f"{source.get('file', 'chart')}: no rows")
+    x, ys = reduce_series(source, x, ys, points)
+    return [str(v) for v in x.tolist()], [(name, [round(v, 6) for v in y.tolist()]) for name, y in zip(names, ys)]
+
+
+def chart_series(source):
+    # (categories, [(name, values)]) of a checked source; file sources are cached by the file's
+    # size and mtime, so a million-row file is only parsed again when it changes.
+    points = source.get("points") or (PIE_SLICES if source["kind"] == "pie" else CHART_POINTS)
+    stamp = [os.path.abspath(source["file"]), data_stamp(source["file"])] if "file" in source else None
+    key = hashlib.sha256(json.dumps([CHART_VERSION, source, stamp, points], sort_keys=True, default=str).encode()).hexdigest()[:32]
+    if key in _charts:
+        return _charts[key]
+    path = CACHE_DIR / "charts" / f"{key}.pickle"
+    try:
+        series = pickle.loads(path.read_bytes())
+    except (OSError, pickle.UnpicklingError, EOFError):
+        with span(f"chart {source.get('file', 'inline')}", "chart"):
+            series = load_series(source, points)
+        if stamp is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write(path, pickle.dumps(series))
+    _charts[key] = series
+    return series
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Spans of the active profile ({"origin", "spans", "memory"}), or None when not profiling.
+_profile = None
+_span_stack = threading.local()
+
+
+def start_profile(memory=True, origin=None):
+    global _profile
+    memory = memory and not tracemalloc.is_tracing()
+    if memory:
+        tracemalloc.start()
+    _profile = {"origin": time.perf_counter() if origin is None else origin, "spans": [], "memory": memory}
+
+
+def stop_profile():
+    global _profile
+    profile, _profile = _profile, None
+    if profile is None:
+        return []
+    if profile["memory"]:
+        tracemalloc.stop()
+    return profile["spans"]
+
+
+def profile_origin():
+    return _profile["origin"] if _profile is not None else None
+
+
+def span_count():
+    return len(_profile["spans"]) if _profile is not None else 0
+
+
+def record_spans(spans):
+    # Adds spans recorded elsewhere, e.g. by pool workers, to the active profile.
+    if _profile is not None:
+        _profile["spans"].extend(spans)
+
+
+@contextmanager
+def profiling(memory=True):
+    start_profile(memory)
+    spans = []
+    try:
+        yield spans
+    finally:
+        spans.extend(stop_profile())
+
+
+@contextmanager
+def span(name, cat, **args):
+    # Times a block while a profile is active; callers may add bytes_in/bytes_out to the yielded args.
+    # Memory peaks are process-wide, so spans in concurrent threads share each other's allocations.
+    profile = _profile
+    if profile is None:
+        yield args
+        return
+    stack = _span_stack.__dict__.setdefault("spans", [])
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+    frame = {"peak": 0, "base": current if tracing else 0}
+    stack.append(frame)
+    started, started_cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield args
+    finally:
+        wall, cpu = time.perf_counter() - started, time.thread_time() - started_cpu
+        stack.pop()
+        peak = 0
+        if tracing:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        profile["spans"].append(
+            {
+                "name": name,
+                "cat": cat,
+                "start": started - profile["origin"],
+                "wall": wall,
+                "cpu": cpu,
+                "peak_bytes": max(0, peak - frame["base"]),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "depth": len(stack),
+                "args": args,
+            }
+        )
+
+
+def group_spans(since, prefix, name, cat, total=None):
+    # Nests the spans named prefix* recorded since index `since` under one span covering them all,
+    # so overlapping per-item work reports under the stage name a sequential build uses. With
+    # total, the group's args carry the sum of that arg over its spans.
+    if _profile is None:
+        return
+    spans = [sp for sp in _profile["spans"][since:] if sp["name"].startswith(prefix)]
+    if not spans:
+        return
+    start = min(sp["start"] for sp in spans)
+    args = {"items": len(spans)}
+    if total:
+        args[total] = sum(sp["args"].get(total, 0) for sp in spans)
+    for sp in spans:
+        sp["depth"] += 1
+    _profile["spans"].append(
+        {
+            "name": name,
+            "cat": cat,
+            "start": start,
+            "wall": max(sp["start"] + sp["wall"] for sp in spans) - start,
+            "cpu": sum(sp["cpu"] for sp in spans),
+            "peak_bytes": max(sp["peak_bytes"] for sp in spans),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "depth": 0,
+            "args": args,
+        }
+    )
+
+
+def format_profile(spans):
+    lines = [f"{'span':<40} {'wall':>10} {'cpu':>10} {'peak mem':>10} {'in':>10} {'out':>10}"]
+    for sp in sorted(spans, key=lambda sp: (sp["start"], sp["depth"])):
+        name = "  " * sp["depth"] + sp["name"]
+        io = [sp["args"].get(k) for k in ("bytes_in", "bytes_out")]
+        io = [f"{v / 1024:.0f}KB" if v is not None else "" for v in io]
+        lines.append(f"{name:<40} {sp['wall'] * 1000:>8.1f}ms {sp['cpu'] * 1000:>8.1f}ms {sp['peak_bytes'] / 1024:>8.0f}KB {io[0]:>10} {io[1]:>10}")
+    totals = {}
+    for sp in spans:
+        if sp["depth"] == 0:
+            totals[sp["cat"]] = totals.get(sp["cat"], 0) + sp["wall"]
+    lines.append("total " + ", ".join(f"{cat} {wall * 1000:.1f}ms" for cat, wall in sorted(totals.items(), key=lambda kv: -kv[1])))
+    # Per-image spans: fetch_images() wraps its fetch:* spans, the build graph issues them directly.
+    downloaded = sum(sp["args"].get("bytes_in", 0) for sp in spans if sp["name"].startswith("fetch:"))
+    derived = sum(sp["args"].get("bytes_out", 0) for sp in spans if sp["name"].startswith("cropped_image:"))
+    package = sum(sp["args"].get("bytes_out", 0) for sp in spans if sp["name"] == "save")
+    lines.append(f"downloaded {downloaded} bytes, wrote {derived} bytes of derivatives, deck package {package} bytes")
+    return "\n".join(lines)
+
+
+def chrome_trace(spans):
+    # Trace Event Format (chrome://tracing, Perfetto): complete events in microseconds.
+    events = []
+    for sp in spans:
+        args = {k: v for k, v in sp["args"].items() if isinstance(v, (str, int, float, bool))}
+        args.update(cpu_ms=round(sp["cpu"] * 1000, 3), peak_bytes=sp["peak_bytes"])
+        events.append(
+            {
+                "name": sp["name"],
+                "cat": sp["cat"],
+                "ph": "X",
+                "ts": round(sp["start"] * 1e6, 1),
+                "dur": round(sp["wall"] * 1e6, 1),
+                "pid": sp["pid"],
+                "tid": sp["tid"],
+                "args": args,
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
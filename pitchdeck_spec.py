@@ -0,0 +1,177 @@
+import json
+
+from pptx.dml.color import RGBColor
+from pptx.enum.text import PP_ALIGN
+
+from pitchdeck_charts import CHART_KINDS, ChartError, chart_source
+
+# Declarative deck specs (JSON or TOML). A spec is compiled into a plain tuple form that
+# names the same primitives the slide_* functions use. Color tokens and font roles are resolved
+# against the palette and fonts of the theme it is compiled for.
+SPEC_VERSION = 1
+ALIGN = {"left": PP_ALIGN.LEFT, "center": PP_ALIGN.CENTER, "right": PP_ALIGN.RIGHT}
+
+
+class SpecError(ValueError):
+    pass
+
+
+def _spec_number(value, where):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise SpecError(f"{where}: expected a number, got {value!r}")
+    return float(value)
+
+
+def _spec_text(value, where):
+    if not isinstance(value, str):
+        raise SpecError(f"{where}: expected a string, got {value!r}")
+    return value
+
+
+def _spec_list(value, where):
+    if not isinstance(value, list):
+        raise SpecError(f"{where}: expected a list, got {value!r}")
+    return value
+
+
+def _spec_object(value, where, key):
+    # A bare string is shorthand for {key: value}.
+    if isinstance(value, str):
+        return {key: value}
+    if not isinstance(value, dict):
+        raise SpecError(f"{where}: expected a string or an object, got {value!r}")
+    return value
+
+
+def _spec_box(value, where):
+    if not isinstance(value, list) or len(value) != 4:
+        raise SpecError(f"{where}: expected [left, top, width, height] in inches, got {value!r}")
+    return tuple(_spec_number(v, where) for v in value)
+
+
+def _spec_color(value, where, palette):
+    if isinstance(value, str) and value.upper() in palette:
+        return tuple(palette[value.upper()])
+    if isinstance(value, str) and len(value) == 7 and value.startswith("#"):
+        try:
+            return tuple(RGBColor.from_string(value[1:]))
+        except ValueError:
+            pass
+    raise SpecError(f"{where}: expected #RRGGBB or a color token such as ACCENT, got {value!r}")
+
+
+def _spec_item(item, where, palette, fonts):
+    if not isinstance(item, dict) or "type" not in item:
+        raise SpecError(f"{where}: expected an object with a 'type'")
+    kind = item["type"]
+    get = item.get
+    if kind == "card":
+        return ("card", _spec_box(get("box"), f"{where}.box"), _spec_color(get("color", "CARD_BG"), f"{where}.color", palette))
+    if kind == "photo":
+        return ("photo", _spec_text(get("key"), f"{where}.key"), _spec_box(get("box"), f"{where}.box"), bool(get("rounded", True)))
+    if kind == "text":
+        font = get("font", "body")
+        align = get("align", "left")
+        if align not in ALIGN:
+            raise SpecError(f"{where}.align: expected one of {sorted(ALIGN)}, got {align!r}")
+        return (
+            "text",
+            _spec_box(get("box"), f"{where}.box"),
+            _spec_text(get("text"), f"{where}.text"),
+            _spec_number(get("size", 20), f"{where}.size"),
+            bool(get("bold", False)),
+            _spec_color(get("color", "TEXT"), f"{where}.color", palette),
+            align,
+            bool(get("italic", False)),
+            fonts.get(font, _spec_text(font, f"{where}.font")),
+        )
+    if kind == "bullets":
+        items = [_spec_text(v, f"{where}.items[{i}]") for i, v in enumerate(_spec_list(get("items"), f"{where}.items"))]
+        return (
+            "bullets",
+            _spec_box(get("box"), f"{where}.box"),
+            tuple(items),
+            _spec_number(get("size", 20), f"{where}.size"),
+            _spec_color(get("color", "TEXT"), f"{where}.color", palette),
+            _spec_number(get("spacing", 7), f"{where}.spacing"),
+        )
+    if kind == "tiers":
+        tiers = []
+        for i, tier in enumerate(_spec_list(get("tiers"), f"{where}.tiers")):
+            at = f"{where}.tiers[{i}]"
+            if not isinstance(tier, dict):
+                raise SpecError(f"{at}: expected an object")
+            tiers.append(
+                (
+                    _spec_text(tier.get("label"), f"{at}.label"),
+                    _spec_text(tier.get("text", ""), f"{at}.text"),
+                    _spec_color(tier.get("color"), f"{at}.color", palette),
+                    *_spec_box(tier.get("box"), f"{at}.box"),
+                )
+            )
+        return ("tiers", tuple(tiers), _spec_number(get("size", 16), f"{where}.size"))
+    if kind == "bars":
+        bars = []
+        for i, bar in enumerate(_spec_list(get("bars"), f"{where}.bars")):
+            at = f"{where}.bars[{i}]"
+            if not isinstance(bar, list) or len(bar) != 3:
+                raise SpecError(f"{at}: expected [x, height, color]")
+            bars.append((_spec_number(bar[0], at), _spec_number(bar[1], at), _spec_color(bar[2], at, palette)))
+        return ("bars", tuple(bars), _spec_number(get("baseline"), f"{where}.baseline"), _spec_number(get("width"), f"{where}.width"))
+    if kind == "pie":
+        categories = [_spec_text(v, f"{where}.categories") for v in _spec_list(get("categories"), f"{where}.categories")]
+        values = [_spec_number(v, f"{where}.values") for v in _spec_list(get("values"), f"{where}.values")]
+        colors = [_spec_color(v, f"{where}.colors", palette) for v in _spec_list(get("colors"), f"{where}.colors")]
+        if not len(categories) == len(values) <= len(colors):
+            raise SpecError(f"{where}: need one value per category and at least as many colors")
+        series = _spec_text(get("series", "Series 1"), f"{where}.series")
+        return ("pie", _spec_box(get("box"), f"{where}.box"), tuple(categories), tuple(values), tuple(colors), series)
+    if kind == "chart":
+        # "data" is a source object, or the name of one in content["charts"].
+        data, chart_kind = get("data"), get("kind", "bar")
+        if chart_kind not in CHART_KINDS:
+            raise SpecError(f"{where}.kind: expected one of {sorted(CHART_KINDS)}, got {chart_kind!r}")
+        if not isinstance(data, str):
+            try:
+                data = chart_source(data, chart_kind, f"{where}.data")
+            except ChartError as exc:
+                raise SpecError(str(exc)) from exc
+        colors = tuple(_spec_color(v, f"{where}.colors", palette) for v in _spec_list(get("colors", []), f"{where}.colors"))
+        return ("chart", _spec_box(get("box"), f"{where}.box"), data, chart_kind, colors)
+    raise SpecError(f"{where}.type: unknown primitive {kind!r}")
+
+
+def compile_spec_data(data, palette, fonts):
+    if not isinstance(data, dict):
+        raise SpecError("spec: expected an object with a 'slides' list")
+    content = data.get("content", {})
+    if not isinstance(content, dict):
+        raise SpecError("content: expected an object")
+    slides = []
+    for n, slide in enumerate(_spec_list(data.get("slides"), "slides")):
+        where = f"slides[{n}]"
+        if not isinstance(slide, dict):
+            raise SpecError(f"{where}: expected an object")
+        background = slide.get("background", "default")
+        if background not in ("default", "soft", "none"):
+            raise SpecError(f"{where}.background: expected default, soft or none")
+        header = slide.get("header")
+        if header is not None:
+            header = _spec_object(header, f"{where}.header", "title")
+            right = header.get("right")
+            header = (_spec_text(header.get("title"), f"{where}.header.title"), right if right is None else _spec_text(right, f"{where}.header.right"))
+        tagline = slide.get("tagline")
+        if tagline is not None:
+            tagline = _spec_object(tagline, f"{where}.tagline", "text")
+            tagline = (_spec_text(tagline.get("text"), f"{where}.tagline.text"), _spec_color(tagline.get("color", "BLUE_DARK"), f"{where}.tagline.color", palette))
+        items = tuple(_spec_item(item, f"{where}.items[{i}]", palette, fonts) for i, item in enumerate(_spec_list(slide.get("items", []), f"{where}.items")))
+        slides.append((background, header, items, tagline))
+    return {"version": SPEC_VERSION, "content": content, "output": data.get("output"), "slides": tuple(slides)}
+
+
+def parse_spec(raw, suffix):
+    if suffix == ".toml":
+        import tomllib
+
+        return tomllib.loads(raw.decode())
+    return json.loads(raw)
@@ -0,0 +1,863 @@
+import argparse
+import colorsys
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls, qn
+
+import create_pitchdeck as deck
+
+log = logging.getLogger("preview_pitchdeck")
+
+PREVIEW_WIDTH = 960
+# Shapes are drawn at this multiple of the output size and scaled down, which antialiases edges.
+SUPERSAMPLE = 2
+PREVIEW_VERSION = 1
+PREVIEW_CACHE_ENTRIES = 1024
+# Mean absolute pixel difference (0-1) above which --compare reports a slide as changed.
+THRESHOLD = 0.01
+GRID_COLUMNS = 4
+EMU_PER_PT = 12700
+# Preset geometry adjustments in 1/100000ths, as in the DrawingML presets.
+ADJUST = {
+    "roundRect": {"adj": 16667},
+    "trapezoid": {"adj": 25000},
+    "upArrow": {"adj1": 50000, "adj2": 50000},
+    "downArrow": {"adj1": 50000, "adj2": 50000},
+    "leftArrow": {"adj1": 50000, "adj2": 50000},
+    "rightArrow": {"adj1": 50000, "adj2": 50000},
+}
+PRESET_COLORS = {"black": "000000", "white": "FFFFFF", "gray": "808080", "red": "FF0000", "blue": "0000FF"}
+DEFAULT_INSETS = (91440, 45720, 91440, 45720)
+TITLE_TYPES = ("title", "ctrTitle")
+# Decoded, cropped and scaled pictures kept per process; decks repeat the same photo and backdrop.
+PICTURE_ENTRIES = 64
+
+# (blob digest, size, crop, alpha) -> RGBA picture.
+_pictures = {}
+# Geometries and chart types already reported as drawn approximately by this process.
+_approximated = set()
+
+
+def local(el):
+    return el.tag.rpartition("}")[2]
+
+
+def approximate(what, drawn_as):
+    if what not in _approximated:
+        _approximated.add(what)
+        log.warning("no preview drawing for %s; drawn as %s", what, drawn_as)
+
+
+def parts_entry(part):
+    # A part's XML and the image and chart blobs it references, by rId.
+    rels = {}
+    for rId, rel in part.rels.items():
+        if not rel.is_external and rel.reltype in (RT.IMAGE, RT.CHART):
+            rels[rId] = rel.target_part.blob
+    return {"xml": part.blob, "rels": rels}
+
+
+def slide_jobs(prs, slides=None):
+    # One picklable job per slide: its XML, layout, master and theme with everything they reference.
+    layouts = {}
+    presentation = prs.part.blob
+    theme = prs.slide_master.part.part_related_by(RT.THEME).blob
+    master = parts_entry(prs.slide_master.part)
+    jobs = []
+    for n, slide in enumerate(prs.slides, 1):
+        if slides and n not in slides:
+            continue
+        layout = slide.slide_layout.part
+        if layout.partname not in layouts:
+            layouts[layout.partname] = parts_entry(layout)
+        jobs.append(
+            {
+                "number": n,
+                "size": (prs.slide_width, prs.slide_height),
+                "presentation": presentation,
+                "theme": theme,
+                "master": master,
+                "layout": layouts[layout.partname],
+                "slide": parts_entry(slide.part),
+            }
+        )
+    return jobs
+
+
+def preview_key(job, width):
+    # Everything the PNG depends on, including which font files the slide's typefaces resolve to.
+    h = hashlib.sha256(f"{PREVIEW_VERSION}:{width}:{SUPERSAMPLE}:{job['size']}".encode())
+    blobs = [job["presentation"], job["theme"]]
+    for name in ("master", "layout", "slide"):
+        entry = job[name]
+        blobs.append(entry["xml"])
+        blobs.extend(entry["rels"][rId] for rId in sorted(entry["rels"]))
+    for blob in blobs:
+        h.update(hashlib.sha256(blob).digest())
+    faces = set()
+    for blob in (job["theme"], job["master"]["xml"], job["layout"]["xml"], job["slide"]["xml"]):
+        faces.update(re.findall(rb'typeface="([^"+][^"]*)"', blob))
+    for face in sorted(faces):
+        for bold in (False, True):
+            h.update(str(deck.font_file(face.decode(), bold)).encode())
+    return h.hexdigest()[:32]
+
+
+def context(job, width):
+    theme = parse_xml(job["theme"])
+    elements = theme.find(qn("a:themeElements"))
+    colors = {}
+    for slot in elements.find(qn("a:clrScheme")):
+        value = slot[0]
+        colors[local(slot)] = value.get("lastClr") if local(value) == "sysClr" else value.get("val")
+    fonts = elements.find(qn("a:fontScheme"))
+    master = parse_xml(job["master"]["xml"])
+    return {
+        "scale": width * SUPERSAMPLE / job["size"][0],
+        "colors": colors,
+        "clrmap": dict(master.find(qn("p:clrMap")).attrib),
+        "major": fonts.find(f"{qn('a:majorFont')}/{qn('a:latin')}").get("typeface"),
+        "minor": fonts.find(f"{qn('a:minorFont')}/{qn('a:latin')}").get("typeface"),
+        "master": master,
+        "layout": parse_xml(job["layout"]["xml"]),
+        "slide": parse_xml(job["slide"]["xml"]),
+        "defaults": parse_xml(job["presentation"]).find(qn("p:defaultTextStyle")),
+    }
+
+
+def resolve_color(el, ctx):
+    # (r, g, b, a) of a color element (srgbClr, schemeClr, sysClr, prstClr) after its modifiers.
+    kind = local(el)
+    if kind == "schemeClr":
+        name = el.get("val")
+        value = ctx["colors"].get(ctx["clrmap"].get(name, name), "000000")
+    elif kind == "sysClr":
+        value = el.get("lastClr", "000000")
+    elif kind == "prstClr":
+        value = PRESET_COLORS.get(el.get("val"), "000000")
+    else:
+        value = el.get("val", "000000")
+    r, g, b = (int(value[i : i + 2], 16) for i in (0, 2, 4))
+    alpha = 1.0
+    for mod in el:
+        name, val = local(mod), int(mod.get("val", 0)) / 100000
+        if name == "alpha":
+            alpha = val
+        elif name == "tint":
+            r, g, b = (255 - (255 - c) * val for c in (r, g, b))
+        elif name == "shade":
+            r, g, b = (c * val for c in (r, g, b))
+        elif name in ("lumMod", "lumOff"):
+            hue, light, sat = colorsys.rgb_to_hls(r / 255, g / 255, b / 255)
+            light = min(1.0, max(0.0, light * val if name == "lumMod" else light + val))
+            r, g, b = (c * 255 for c in colorsys.hls_to_rgb(hue, light, sat))
+    return (round(r), round(g), round(b), round(alpha * 255))
+
+
+def fill_of(props, ctx, style=None):
+    # None, ("solid", rgba), ("grad", stops, radial, angle) or ("blip", blipFill) of spPr or bgPr.
+    if props is not None:
+        for el in props:
+            kind = local(el)
+            if kind == "noFill":
+                return None
+            if kind == "solidFill":
+                return ("solid", resolve_color(el[0], ctx))
+            if kind == "gradFill":
+                stops = sorted((int(gs.get("pos")) / 100000, resolve_color(gs[0], ctx)) for gs in el.find(qn("a:gsLst")))
+                lin = el.find(qn("a:lin"))
+                return ("grad", stops, el.find(qn("a:path")) is not None, int(lin.get("ang", 0)) / 60000 if lin is not None else 0.0)
+            if kind == "blipFill":
+                return ("blip", el)
+    ref = style.find(qn("a:fillRef")) if style is not None else None
+    if ref is not None and int(ref.get("idx", 0)) and len(ref):
+        return ("solid", resolve_color(ref[0], ctx))
+    return None
+
+
+def line_of(props, ctx, style=None):
+    # (rgba, width in EMU) of the outline, or None.
+    ln = props.find(qn("a:ln")) if props is not None else None
+    width = int(ln.get("w", EMU_PER_PT)) if ln is not None else EMU_PER_PT
+    if ln is not None:
+        if ln.find(qn("a:noFill")) is not None:
+            return None
+        solid = ln.find(qn("a:solidFill"))
+        if solid is not None:
+            return resolve_color(solid[0], ctx), width
+    ref = style.find(qn("a:lnRef")) if style is not None else None
+    if ref is not None and int(ref.get("idx", 0)) and len(ref):
+        return resolve_color(ref[0], ctx), width
+    return None
+
+
+def shadow_of(props, ctx):
+    shadow = props.find(f"{qn('a:effectLst')}/{qn('a:outerShdw')}") if props is not None else None
+    if shadow is None:
+        return None
+    angle = math.radians(int(shadow.get("dir", 0)) / 60000)
+    dist = int(shadow.get("dist", 0))
+    return resolve_color(shadow[0], ctx), int(shadow.get("blurRad", 0)), dist * math.cos(angle), dist * math.sin(angle)
+
+
+def adjustments(prst, geom):
+    adj = dict(ADJUST.get(prst, {}))
+    av = geom.find(qn("a:avLst")) if geom is not None else None
+    for gd in av if av is not None else ():
+        adj[gd.get("name")] = int(gd.get("fmla", "val 0").split()[-1])
+    return adj
+
+
+def polygon(prst, adj, x, y, w, h):
+    ss = min(w, h)
+    if prst == "trapezoid":
+        d = ss * adj["adj"] / 100000
+        return [(x + d, y), (x + w - d, y), (x + w, y + h), (x, y + h)]
+    if prst in ("upArrow", "downArrow"):
+        shaft, head = w * adj["adj1"] / 100000, ss * adj["adj2"] / 100000
+        l, r = (w - shaft) / 2, (w + shaft) / 2
+        points = [(w / 2, 0), (w, head), (r, head), (r, h), (l, h), (l, head), (0, head)]
+        if prst == "downArrow":
+            points = [(px, h - py) for px, py in points]
+    elif prst in ("rightArrow", "leftArrow"):
+        shaft, head = h * adj["adj1"] / 100000, ss * adj["adj2"] / 100000
+        t, b = (h - shaft) / 2, (h + shaft) / 2
+        points = [(w, h / 2), (w - head, 0), (w - head, t), (0, t), (0, b), (w - head, b), (w - head, h)]
+        if prst == "leftArrow":
+            points = [(w - px, py) for px, py in points]
+    else:
+        return None
+    return [(x + px, y + py) for px, py in points]
+
+
+def draw_geometry(draw, prst, adj, box, **style):
+    x0, y0, x1, y1 = box
+    if prst == "ellipse":
+        draw.ellipse(box, **style)
+    elif prst == "roundRect":
+        draw.rounded_rectangle(box, radius=min(x1 - x0, y1 - y0) * adj["adj"] / 100000, **style)
+    else:
+        points = polygon(prst, adj, x0, y0, x1 - x0, y1 - y0)
+        if points is None:
+            if prst != "rect":
+                approximate(f"{prst} geometry", "its bounding box")
+            draw.rectangle(box, **style)
+        else:
+            draw.polygon(points, **style)
+
+
+def gradient(size, stops, radial, angle):
+    import numpy as np
+
+    # Gradients are smooth: compute them at a quarter of the size and scale up.
+    w, h = max(1, size[0] // 4), max(1, size[1] // 4)
+    ys, xs = np.mgrid[0:h, 0:w].astype(np.float32)
+    xs, ys = (xs + 0.5) / w, (ys + 0.5) / h
+    if radial:
+        t = np.clip(np.hypot(xs - 0.5, ys - 0.5) / math.sqrt(0.5), 0, 1)
+    else:
+        a = math.radians(angle)
+        t = xs * math.cos(a) + ys * math.sin(a)
+        t = (t - t.min()) / max(np.ptp(t), 1e-9)
+    positions = [pos for pos, _ in stops]
+    channels = [np.interp(t, positions, [color[i] for _, color in stops]) for i in range(4)]
+    return Image.fromarray(np.dstack(channels).round().astype(np.uint8), "RGBA").resize(size, Image.BILINEAR)
+
+
+def picture(blip_fill, rels, size):
+    blip = blip_fill.find(qn("a:blip"))
+    blob = rels.get(blip.get(qn("r:embed"))) if blip is not None else None
+    if blob is None:
+        return None
+    src = blip_fill.find(qn("a:srcRect"))
+    crop = tuple(int(src.get(side, 0)) / 100000 for side in ("l", "t", "r", "b")) if src is not None else (0, 0, 0, 0)
+    fix = blip.find(qn("a:alphaModFix"))
+    amount = int(fix.get("amt", 100000)) / 100000 if fix is not None else 1.0
+    key = (hashlib.sha1(blob).digest(), size, crop, amount)
+    img = _pictures.get(key)
+    if img is not None:
+        return img
+    img = Image.open(BytesIO(blob))
+    img.draft("RGB", size)
+    l, t, r, b = crop
+    img = img.crop((round(img.width * l), round(img.height * t), round(img.width * (1 - r)), round(img.height * (1 - b))))
+    img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+    img = img.resize(size, Image.LANCZOS, reducing_gap=2.0).convert("RGBA")
+    if amount != 1.0:
+        img.putalpha(img.getchannel("A").point(lambda v: round(v * amount)))
+    if len(_pictures) >= PICTURE_ENTRIES:
+        _pictures.clear()
+    _pictures[key] = img
+    return img
+
+
+def composite(canvas, layer, x, y):
+    sx, sy = max(0, -x), max(0, -y)
+    if sx >= layer.width or sy >= layer.height or x >= canvas.width or y >= canvas.height:
+        return
+    canvas.alpha_composite(layer, (max(0, x), max(0, y)), (sx, sy))
+
+
+def paint(canvas, box, ctx, fill, line=None, shadow=None, prst="rect", adj=None, rels=None, rot=0, flip=(False, False)):
+    # Draw one shape: its fill (solid, gradient or picture) clipped to its geometry, outline and
+    # drop shadow, composited with transparency onto canvas. box is (x0, y0, x1, y1) in pixels.
+    adj = adj or ADJUST.get(prst, {})
+    x0, y0, x1, y1 = box
+    lw = max(1, round(line[1] * ctx["scale"])) if line else 0
+    lx, ly = math.floor(x0) - lw, math.floor(y0) - lw
+    size = (max(1, math.ceil(x1) - lx + lw), max(1, math.ceil(y1) - ly + lw))
+    inner = (x0 - lx, y0 - ly, x1 - lx, y1 - ly)
+    layer = Image.new("RGBA", size)
+    if fill is not None:
+        mask = Image.new("L", size)
+        draw_geometry(ImageDraw.Draw(mask), prst, adj, inner, fill=255)
+        if fill[0] == "solid":
+            paint_layer = Image.new("RGBA", size, fill[1])
+        elif fill[0] == "grad":
+            paint_layer = Image.new("RGBA", size)
+            paint_layer.paste(gradient((max(1, round(x1 - x0)), max(1, round(y1 - y0))), *fill[1:]), (round(inner[0]), round(inner[1])))
+        else:
+            paint_layer = Image.new("RGBA", size)
+            img = picture(fill[1], rels or {}, (max(1, round(x1 - x0)), max(1, round(y1 - y0))))
+            if img is not None:
+                paint_layer.paste(img, (round(inner[0]), round(inner[1])))
+        if fill[0] == "solid":
+            paint_layer.putalpha(mask.point(lambda v, a=fill[1][3]: v * a // 255))
+        else:
+            paint_layer.putalpha(ImageChops.multiply(paint_layer.getchannel("A"), mask))
+        layer = paint_layer
+    if line:
+        outline = Image.new("L", size)
+        draw_geometry(ImageDraw.Draw(outline), prst, adj, inner, outline=255, width=lw)
+        color = Image.new("RGBA", size, line[0][:3] + (0,))
+        color.putalpha(outline.point(lambda v, a=line[0][3]: v * a // 255))
+        layer.alpha_composite(color)
+    if flip[0]:
+        layer = layer.transpose(Image.FLIP_LEFT_RIGHT)
+    if flip[1]:
+        layer = layer.transpose(Image.FLIP_TOP_BOTTOM)
+    if rot:
+        w, h = layer.size
+        layer = layer.rotate(-rot, resample=Image.BICUBIC, expand=True)
+        lx, ly = lx - (layer.width - w) // 2, ly - (layer.height - h) // 2
+    if shadow:
+        color, blur, dx, dy = shadow
+        radius = blur * ctx["scale"] / 2
+        pad = math.ceil(radius * 2)
+        shade = Image.new("RGBA", (layer.width + 2 * pad, layer.height + 2 * pad), color[:3] + (0,))
+        alpha = Image.new("L", shade.size)
+        alpha.paste(layer.getchannel("A").point(lambda v, a=color[3]: v * a // 255), (pad, pad))
+        shade.putalpha(alpha.filter(ImageFilter.GaussianBlur(radius)) if radius else alpha)
+        composite(canvas, shade, lx - pad + round(dx * ctx["scale"]), ly - pad + round(dy * ctx["scale"]))
+    composite(canvas, layer, lx, ly)
+
+
+def typeface(name, ctx):
+    if not name or name.startswith("+mn"):
+        return ctx["minor"]
+    if name.startswith("+mj"):
+        return ctx["major"]
+    return name
+
+
+def read_para(ppr, para):
+    for attr in ("algn", "marL", "indent"):
+        if ppr.get(attr) is not None:
+            para[attr] = ppr.get(attr)
+    for child in ppr:
+        kind = local(child)
+        if kind in ("lnSpc", "spcBef", "spcAft") and len(child):
+            para[kind] = (local(child[0]), int(child[0].get("val", 0)))
+        elif kind == "buChar":
+            para["bullet"] = child.get("char")
+        elif kind == "buNone":
+            para["bullet"] = None
+
+
+def read_run(rpr, run, ctx):
+    for attr in ("sz", "b"):
+        if rpr.get(attr) is not None:
+            run[attr] = rpr.get(attr)
+    solid = rpr.find(qn("a:solidFill"))
+    if solid is not None:
+        run["color"] = resolve_color(solid[0], ctx)
+    latin = rpr.find(qn("a:latin"))
+    if latin is not None:
+        run["font"] = latin.get("typeface")
+
+
+def paragraph(p, sources, ctx, font_ref=None):
+    # (paragraph properties, run properties, text) of an a:p, merged from sources (list styles,
+    # lowest priority first), the shape's font reference, pPr and the first run. Previews draw
+    # the whole paragraph in its first run's style.
+    ppr = p.find(qn("a:pPr"))
+    name = f"lvl{int(ppr.get('lvl', 0)) + 1 if ppr is not None else 1}pPr"
+    para, run = {}, {}
+    levels = [src.find(qn(f"a:{name}")) if src is not None else None for src in sources]
+    for n, level in enumerate([*levels, ppr]):
+        if n == 1 and font_ref is not None:
+            run["color"] = font_ref
+        if level is None:
+            continue
+        read_para(level, para)
+        defaults = level.find(qn("a:defRPr"))
+        if defaults is not None:
+            read_run(defaults, run, ctx)
+    pieces, first = [], None
+    for child in p:
+        kind = local(child)
+        if kind in ("r", "fld"):
+            if not pieces:
+                first = child.find(qn("a:rPr"))
+            t = child.find(qn("a:t"))
+            pieces.append(t.text or "" if t is not None else "")
+        elif kind == "br":
+            pieces.append("\n")
+    if not pieces:
+        first = p.find(qn("a:endParaRPr"))
+    if first is not None:
+        read_run(first, run, ctx)
+    return para, run, "".join(pieces)
+
+
+def spacing(value, size):
+    # Points of an lnSpc, spcBef or spcAft value for text of size points.
+    kind, val = value
+    return val / 100 if kind == "spcPts" else size * deck.LINE_SPACING * val / 100000
+
+
+def draw_run(canvas, text, font, color, x, top):
+    # One line of text with its ascent starting at top, composited with the color's alpha.
+    ascent, descent = font.getmetrics()
+    mask = Image.new("L", (math.ceil(font.getlength(text)) + 4, ascent + descent + 4))
+    ImageDraw.Draw(mask).text((2, 2 + ascent), text, font=font, fill=255, anchor="ls")
+    layer = Image.new("RGBA", mask.size, color[:3] + (0,))
+    layer.putalpha(mask.point(lambda v, a=color[3]: v * a // 255))
+    composite(canvas, layer, round(x) - 2, round(top) - 2)
+
+
+def draw_text(canvas, tx, box, ctx, sources, bodies, font_ref=None):
+    # Lay out and draw a txBody in box (pixels); bodies are bodyPr elements, lowest priority first.
+    body = {}
+    for bp in bodies:
+        if bp is not None:
+            body.update(bp.attrib)
+    scale = ctx["scale"]
+    pt = EMU_PER_PT * scale
+    l, t, r, b = (int(body.get(side, default)) * scale for side, default in zip(("lIns", "tIns", "rIns", "bIns"), DEFAULT_INSETS))
+    left, top, right, bottom = box[0] + l, box[1] + t, box[2] - r, box[3] - b
+    lines, y = [], 0.0
+    for n, p in enumerate(tx.iter(qn("a:p"))):
+        para, style, text = paragraph(p, sources, ctx, font_ref)
+        size = int(style.get("sz", 1800)) / 100
+        bold = style.get("b") in ("1", "true")
+        family = typeface(style.get("font"), ctx)
+        if para.get("bullet") and text:
+            text = f"{para['bullet']} {text}"
+        margin = int(para.get("marL", 0)) * scale
+        if n and "spcBef" in para:
+            y += spacing(para["spcBef"], size) * pt
+        height = (spacing(para["lnSpc"], size) if "lnSpc" in para else size * deck.LINE_SPACING) * pt
+        if body.get("wrap") == "none":
+            rows = deck.LINE_BREAKS.split(text)
+        else:
+            rows = deck.wrap_text(text, (right - left - margin) / pt, family, size, bold)
+        for row in rows:
+            lines.append((row, family, size, bold, style.get("color", (0, 0, 0, 255)), para.get("algn", "l"), margin, y, height))
+            y += height
+        if "spcAft" in para:
+            y += spacing(para["spcAft"], size) * pt
+    anchor = body.get("anchor", "t")
+    offset = (bottom - top - y) / 2 if anchor == "ctr" else bottom - top - y if anchor == "b" else 0.0
+    for row, family, size, bold, color, align, margin, ly, height in lines:
+        if not row.strip():
+            continue
+        font = deck.load_font(family, max(1, round(size * pt)), bold)
+        width = font.getlength(row)
+        if align == "ctr":
+            x = left + margin + (right - left - margin - width) / 2
+        elif align == "r":
+            x = right - width
+        else:
+            x = left + margin
+        ascent, descent = font.getmetrics()
+        draw_run(canvas, row, font, color, x, top + offset + ly + (height - ascent - descent) / 2)
+
+
+def series_values(ser, tag):
+    el = ser.find(qn(f"c:{tag}"))
+    points = {}
+    for pt in el.iter(qn("c:pt")) if el is not None else ():
+        v = pt.find(qn("c:v"))
+        points[int(pt.get("idx"))] = v.text if v is not None else None
+    return [points.get(i) for i in range(max(points) + 1)] if points else []
+
+
+def format_value(value, code):
+    if code and code.endswith("%"):
+        decimals = len(code.partition(".")[2]) - 1 if "." in code else 0
+        return f"{value * 100:.{decimals}f}%"
+    return f"{value:g}"
+
+
+def draw_chart(canvas, blob, box, ctx):
+    # Pies, clustered bars and lines from the chart part's cached values; axes labels and legends
+    # are left out.
+    chart = parse_xml(blob)
+    plot = chart.find(f"{qn('c:chart')}/{qn('c:plotArea')}")
+    accents = [resolve_color(parse_xml(f'<a:schemeClr {nsdecls("a")} val="accent{n}"/>'), ctx) for n in range(1, 7)]
+    x0, y0, x1, y1 = box
+    w, h = x1 - x0, y1 - y0
+    layer = Image.new("RGBA", (max(1, math.ceil(w)), max(1, math.ceil(h))))
+    draw = ImageDraw.Draw(layer)
+    pie = plot.find(qn("c:pieChart"))
+    if pie is not None:
+        ser = pie.find(qn("c:ser"))
+        values = [max(0.0, float(v or 0)) for v in series_values(ser, "val")]
+        total = sum(values) or 1.0
+        colors = {}
+        for dpt in ser.findall(qn("c:dPt")):
+            fill = fill_of(dpt.find(qn("c:spPr")), ctx)
+            if fill is not None and fill[0] == "solid":
+                colors[int(dpt.find(qn("c:idx")).get("val"))] = fill[1]
+        radius = min(w, h) * 0.4
+        cx, cy = w / 2, h / 2
+        start, mids = -90.0, []
+        for i, value in enumerate(values):
+            sweep = 360 * value / total
+            draw.pieslice((cx - radius, cy - radius, cx + radius, cy + radius), start, start + sweep, fill=colors.get(i, accents[i % 6]))
+            mids.append(math.radians(start + sweep / 2))
+            start += sweep
+        composite(canvas, layer, math.floor(x0), math.floor(y0))
+        labels = ser.find(qn("c:dLbls"))
+        if labels is None:
+            labels = pie.find(qn("c:dLbls"))
+        if labels is None or all(labels.find(qn(f"c:{flag}")) is None or labels.find(qn(f"c:{flag}")).get("val") in ("0", "false") for flag in ("showVal", "showPercent")):
+            return
+        fmt = labels.find(qn("c:numFmt"))
+        code = fmt.get("formatCode") if fmt is not None else None
+        font = deck.load_font(ctx["minor"], max(1, round(10 * EMU_PER_PT * ctx["scale"])))
+        ascent, descent = font.getmetrics()
+        color = resolve_color(parse_xml(f'<a:schemeClr {nsdecls("a")} val="tx1"/>'), ctx)
+        for value, mid in zip(values, mids):
+            text = format_value(value, code)
+            lx, ly = x0 + cx + math.cos(mid) * radius * 0.65, y0 + cy + math.sin(mid) * radius * 0.65
+            draw_run(canvas, text, font, color, lx - font.getlength(text) / 2, ly - (ascent + descent) / 2)
+        return
+
+    group = plot.find(qn("c:barChart"))
+    bars = group is not None
+    if group is None:
+        group = plot.find(qn("c:lineChart"))
+    if group is None:
+        kinds = [local(el) for el in plot if local(el).endswith("Chart")]
+        approximate(f"{kinds[0] if kinds else 'empty'} chart", "an outline")
+        draw.rectangle((0, 0, layer.width - 1, layer.height - 1), outline=(161, 161, 170, 255), width=max(1, SUPERSAMPLE))
+        composite(canvas, layer, math.floor(x0), math.floor(y0))
+        return
+    series = group.findall(qn("c:ser"))
+    data = [[float(v) if v not in (None, "") else 0.0 for v in series_values(ser, "val")] for ser in series]
+    n = max((len(d) for d in data), default=0)
+    if not n:
+        return
+    lo = min(0.0, *(min(d) for d in data if d))
+    hi = max(0.0, *(max(d) for d in data if d))
+    hi += (hi - lo) * 0.05 or 1.0
+    px0, py0, px1, py1 = w * 0.08, h * 0.05, w * 0.97, h * 0.9
+
+    def ypos(v):
+        return py1 - (v - lo) / (hi - lo) * (py1 - py0)
+
+    value_axis = plot.find(qn("c:valAx"))
+    if value_axis is not None and value_axis.find(qn("c:majorGridlines")) is not None:
+        line = line_of(value_axis.find(f"{qn('c:majorGridlines')}/{qn('c:spPr')}"), ctx)
+        for k in range(5):
+            gy = py0 + (py1 - py0) * k / 4
+            draw.line((px0, gy, px1, gy), fill=line[0] if line else (217, 217, 217, 255), width=max(1, SUPERSAMPLE))
+    slot = (px1 - px0) / n
+    for s, (ser, values) in enumerate(zip(series, data)):
+        props = ser.find(qn("c:spPr"))
+        if bars:
+            fill = fill_of(props, ctx)
+            color = fill[1] if fill is not None and fill[0] == "solid" else accents[s % 6]
+            gap = int(group.find(qn("c:gapWidth")).get("val", 150)) / 100 if group.find(qn("c:gapWidth")) is not None else 1.5
+            width = slot / (len(series) + gap)
+            for i, v in enumerate(values):
+                bx = px0 + i * slot + width * gap / 2 + s * width
+                draw.rectangle((bx, min(ypos(v), ypos(0)), bx + width, max(ypos(v), ypos(0))), fill=color)
+        else:
+            line = line_of(props, ctx)
+            color = line[0] if line else accents[s % 6]
+            lw = max(1, round((line[1] if line else 28575) * ctx["scale"]))
+            draw.line([(px0 + (i + 0.5) * slot, ypos(v)) for i, v in enumerate(values)], fill=color, width=lw, joint="curve")
+    draw.line((px0, ypos(0), px1, ypos(0)), fill=(217, 217, 217, 255), width=max(1, SUPERSAMPLE))
+    composite(canvas, layer, math.floor(x0), math.floor(y0))
+
+
+def placeholder(sp):
+    ph = sp.find(f"{qn('p:nvSpPr')}/{qn('p:nvPr')}/{qn('p:ph')}")
+    return None if ph is None else (ph.get("type", "body"), ph.get("idx"))
+
+
+def inherited(ph, tree):
+    # The layout or master placeholder that ph takes its position and text styles from.
+    candidates = [(placeholder(sp), sp) for sp in tree.iter(qn("p:sp"))]
+    for other, sp in candidates:
+        if other is not None and other[0] == ph[0] and other[1] == ph[1]:
+            return sp
+    for other, sp in candidates:
+        if other is not None and (other[0] == ph[0] or other[0] in TITLE_TYPES and ph[0] in TITLE_TYPES):
+            return sp
+    return None
+
+
+def shape_box(xfrm, group, ctx):
+    off, ext = xfrm.find(qn("a:off")), xfrm.find(qn("a:ext"))
+    x, y = int(off.get("x")), int(off.get("y"))
+    cx, cy = int(ext.get("cx")), int(ext.get("cy"))
+    gx, gy, sx, sy = group
+    s = ctx["scale"]
+    return ((gx + x * sx) * s, (gy + y * sy) * s, (gx + (x + cx) * sx) * s, (gy + (y + cy) * sy) * s)
+
+
+def draw_shape(canvas, sp, ctx, rels, level, group):
+    ph = placeholder(sp) if local(sp) == "sp" else None
+    if ph is not None and level != "slide":
+        return
+    chain = [sp]
+    if ph is not None:
+        chain += [el for el in (inherited(ph, ctx["trees"]["layout"]), inherited(ph, ctx["trees"]["master"])) if el is not None]
+    props = sp.find(qn("p:spPr"))
+    xfrm = next((el.find(f"{qn('p:spPr')}/{qn('a:xfrm')}") for el in chain if el.find(f"{qn('p:spPr')}/{qn('a:xfrm')}") is not None), None)
+    if xfrm is None:
+        return
+    box = shape_box(xfrm, group, ctx)
+    style = sp.find(qn("p:style"))
+    geom = props.find(qn("a:prstGeom"))
+    prst = geom.get("prst") if geom is not None else "rect"
+    line = line_of(props, ctx, style)
+    if local(sp) == "cxnSp":
+        if line:
+            x0, y0, x1, y1 = box
+            if xfrm.get("flipH") == "1":
+                x0, x1 = x1, x0
+            if xfrm.get("flipV") == "1":
+                y0, y1 = y1, y0
+            layer = Image.new("RGBA", canvas.size)
+            ImageDraw.Draw(layer).line((x0, y0, x1, y1), fill=line[0], width=max(1, round(line[1] * ctx["scale"])))
+            canvas.alpha_composite(layer)
+        return
+    fill = fill_of(props, ctx, style)
+    if fill is not None or line is not None:
+        flip = (xfrm.get("flipH") == "1", xfrm.get("flipV") == "1")
+        paint(canvas, box, ctx, fill, line, shadow_of(props, ctx), prst, adjustments(prst, geom), rels, int(xfrm.get("rot", 0)) / 60000, flip)
+    tx = sp.find(qn("p:txBody"))
+    if tx is None or not "".join(t.text or "" for t in tx.iter(qn("a:t"))).strip():
+        return
+    styles = ctx["master"].find(qn("p:txStyles"))
+    if ph is not None:
+        kind = "titleStyle" if ph[0] in TITLE_TYPES else "bodyStyle" if ph[0] in ("body", "obj", "subTitle") else "otherStyle"
+        sources = [styles.find(qn(f"p:{kind}"))] + [el.find(f"{qn('p:txBody')}/{qn('a:lstStyle')}") for el in reversed(chain)]
+        bodies = [el.find(f"{qn('p:txBody')}/{qn('a:bodyPr')}") for el in reversed(chain)]
+    else:
+        sources = [ctx["defaults"], tx.find(qn("a:lstStyle"))]
+        bodies = [tx.find(qn("a:bodyPr"))]
+    ref = style.find(qn("a:fontRef")) if style is not None else None
+    font_ref = resolve_color(ref[0], ctx) if ref is not None and len(ref) else None
+    draw_text(canvas, tx, box, ctx, sources, bodies, font_ref)
+
+
+def draw_tree(canvas, tree, ctx, rels, level, group=(0, 0, 1, 1)):
+    for el in tree:
+        kind = local(el)
+        if kind in ("sp", "cxnSp"):
+            draw_shape(canvas, el, ctx, rels, level, group)
+        elif kind == "pic":
+            props = el.find(qn("p:spPr"))
+            xfrm = props.find(qn("a:xfrm"))
+            if xfrm is None:
+                continue
+            geom = props.find(qn("a:prstGeom"))
+            prst = geom.get("prst") if geom is not None else "rect"
+            flip = (xfrm.get("flipH") == "1", xfrm.get("flipV") == "1")
+            fill = ("blip", el.find(qn("p:blipFill")))
+            paint(canvas, shape_box(xfrm, group, ctx), ctx, fill, line_of(props, ctx), shadow_of(props, ctx), prst, adjustments(prst, geom), rels, int(xfrm.get("rot", 0)) / 60000, flip)
+        elif kind == "graphicFrame":
+            xfrm = el.find(qn("p:xfrm"))
+            for ref in el.iter(qn("c:chart")):
+                blob = rels.get(ref.get(qn("r:id")))
+                if blob is not None and xfrm is not None:
+                    draw_chart(canvas, blob, shape_box(xfrm, group, ctx), ctx)
+        elif kind == "grpSp":
+            xfrm = el.find(f"{qn('p:grpSpPr')}/{qn('a:xfrm')}")
+            inner = group
+            if xfrm is not None and xfrm.find(qn("a:chExt")) is not None:
+                off, ext = xfrm.find(qn("a:off")), xfrm.find(qn("a:ext"))
+                ch_off, ch_ext = xfrm.find(qn("a:chOff")), xfrm.find(qn("a:chExt"))
+                kx = int(ext.get("cx")) / (int(ch_ext.get("cx")) or 1)
+                ky = int(ext.get("cy")) / (int(ch_ext.get("cy")) or 1)
+                gx, gy, sx, sy = group
+                inner = (
+                    gx + sx * (int(off.get("x")) - int(ch_off.get("x")) * kx),
+                    gy + sy * (int(off.get("y")) - int(ch_off.get("y")) * ky),
+                    sx * kx,
+                    sy * ky,
+                )
+            draw_tree(canvas, el, ctx, rels, level, inner)
+
+
+def render_job(job, width=PREVIEW_WIDTH):
+    # PNG bytes of one slide from slide_jobs(): background, then master, layout and slide shapes.
+    ctx = context(job, width)
+    ctx["trees"] = {level: ctx[level].find(f"{qn('p:cSld')}/{qn('p:spTree')}") for level in ("master", "layout", "slide")}
+    cx, cy = job["size"]
+    canvas = Image.new("RGBA", (width * SUPERSAMPLE, round(width * SUPERSAMPLE * cy / cx)), (255, 255, 255, 255))
+    rels = {level: job[level]["rels"] for level in ("master", "layout", "slide")}
+    for level in ("slide", "layout", "master"):
+        bg = ctx[level].find(f"{qn('p:cSld')}/{qn('p:bg')}")
+        if bg is None:
+            continue
+        props = bg.find(qn("p:bgPr"))
+        ref = bg.find(qn("p:bgRef"))
+        fill = fill_of(props, ctx) if props is not None else ("solid", resolve_color(ref[0], ctx)) if ref is not None and len(ref) else None
+        if fill is not None:
+            paint(canvas, (0, 0, canvas.width, canvas.height), ctx, fill, rels=rels[level])
+        break
+    hidden = ctx["slide"].get("showMasterSp") in ("0", "false")
+    for level in ("master", "layout", "slide"):
+        if level != "slide" and hidden or level == "master" and ctx["layout"].get("showMasterSp") in ("0", "false"):
+            continue
+        draw_tree(canvas, ctx["trees"][level], ctx, rels[level], level)
+    out = BytesIO()
+    canvas.convert("RGB").resize((width, round(width * cy / cx)), Image.LANCZOS).save(out, "PNG")
+    return out.getvalue()
+
+
+def _prune_previews(directory):
+    entries = sorted(directory.glob("*.png"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[PREVIEW_CACHE_ENTRIES:]:
+        stale.unlink(missing_ok=True)
+
+
+def render_previews(jobs, width=PREVIEW_WIDTH, workers=None, cache=True):
+    # (PNG bytes per job, numbers of the slides rendered); slides whose key is in
+    # CACHE_DIR/previews are reused, the rest render across processes.
+    directory = deck.CACHE_DIR / "previews"
+    directory.mkdir(parents=True, exist_ok=True)
+    keys = [preview_key(job, width) for job in jobs]
+    pngs, missing = [None] * len(jobs), []
+    for i, key in enumerate(keys):
+        path = directory / f"{key}.png"
+        try:
+            if not cache:
+                raise OSError
+            pngs[i] = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            missing.append(i)
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render_job, [jobs[i] for i in missing], [width] * len(missing)))
+    else:
+        rendered = [render_job(jobs[i], width) for i in missing]
+    for i, png in zip(missing, rendered):
+        pngs[i] = png
+        deck.atomic_write(directory / f"{keys[i]}.png", png)
+    _prune_previews(directory)
+    return pngs, [jobs[i]["number"] for i in missing]
+
+
+def preview_deck(path, output, width=PREVIEW_WIDTH, workers=None, slides=None, cache=True):
+    started = time.perf_counter()
+    jobs = slide_jobs(Presentation(str(path)), slides)
+    pngs, rendered = render_previews(jobs, width, workers, cache)
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for job, png in zip(jobs, pngs):
+        paths.append(output / f"slide-{job['number']:02d}.png")
+        deck.atomic_write(paths[-1], png)
+    return {"paths": paths, "rendered": rendered, "seconds": time.perf_counter() - started}
+
+
+def contact_sheet(paths, columns=GRID_COLUMNS, gap=8, background=(228, 228, 231)):
+    images = [Image.open(path) for path in paths]
+    w, h = images[0].size
+    rows = math.ceil(len(images) / columns)
+    columns = min(columns, len(images))
+    sheet = Image.new("RGB", (columns * (w + gap) + gap, rows * (h + gap) + gap), background)
+    for n, img in enumerate(images):
+        sheet.paste(img, (gap + (n % columns) * (w + gap), gap + (n // columns) * (h + gap)))
+        img.close()
+    return sheet
+
+
+def compare_previews(paths, baseline):
+    # (name, difference) per preview: the mean absolute pixel difference in 0-1 against the image
+    # of the same name in baseline, or None when it is missing or a different size.
+    import numpy as np
+
+    results = []
+    for path in paths:
+        old = Path(baseline) / path.name
+        diff = None
+        if old.exists():
+            with Image.open(path) as a, Image.open(old) as b:
+                if a.size == b.size:
+                    delta = np.asarray(a.convert("RGB"), dtype=np.int16) - np.asarray(b.convert("RGB"), dtype=np.int16)
+                    diff = float(np.abs(delta).mean() / 255)
+        results.append((path.name, diff))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PNG previews of a pitch deck without an office suite.")
+    parser.add_argument("deck", type=Path, help="the .pptx to preview")
+    parser.add_argument("--output", type=Path, help="directory for slide-NN.png (default <deck>_preview)")
+    parser.add_argument("--width", type=int, default=PREVIEW_WIDTH, help=f"preview width in pixels (default {PREVIEW_WIDTH})")
+    parser.add_argument("--workers", type=int, help="processes used to render slides")
+    parser.add_argument(
+        "--slides",
+        type=lambda v: {int(n) for n in v.split(",") if n.strip()},
+        help="comma-separated 1-based slide numbers to render",
+    )
+    parser.add_argument("--grid", type=Path, help="also write all previews as one contact sheet PNG")
+    parser.add_argument("--columns", type=int, default=GRID_COLUMNS, help=f"previews per row in --grid (default {GRID_COLUMNS})")
+    parser.add_argument("--compare", type=Path, help="directory of earlier previews; exit non-zero if a slide changed")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="mean pixel difference (0-1) reported as a change")
+    parser.add_argument("--no-cache", action="store_true", help="render every slide even if its preview is cached")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    output = args.output or args.deck.with_name(f"{args.deck.stem}_preview")
+    result = preview_deck(args.deck, output, args.width, args.workers, args.slides, not args.no_cache)
+    reused = len(result["paths"]) - len(result["rendered"])
+    print(f"Rendered {len(result['paths'])} previews to {output} in {result['seconds'] * 1000:.0f}ms ({reused} from cache)")
+    if args.grid and result["paths"]:
+        contact_sheet(result["paths"], args.columns).save(args.grid)
+        print(f"Saved {args.grid}")
+    if args.compare:
+        changed = []
+        for name, diff in compare_previews(result["paths"], args.compare):
+            if diff is None or diff > args.threshold:
+                changed.append(name)
+            print(f"{name:<16} {'missing' if diff is None else f'{diff:.4f}'}{'  CHANGED' if name in changed else ''}")
+        if changed:
+            raise SystemExit(f"{len(changed)} of {len(result['paths'])} slides changed: {', '.join(changed)}")
+
+
+if __name__ == "__main__":
+    main()
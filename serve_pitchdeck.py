@@ -0,0 +1,272 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import create_pitchdeck as deck
+
+log = logging.getLogger("serve_pitchdeck")
+
+PORT = 8765
+QUEUE_SIZE = 32
+IMAGE_MEMORY = 128 * 1024**2
+BUILD_TIMEOUT = 120
+# Latencies kept for the percentiles in /metrics.
+LATENCY_WINDOW = 1024
+PPTX_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+URL_SCHEMES = ("http", "https")
+
+
+class SourceError(ValueError):
+    pass
+
+
+def check_sources(content, slides=(), roots=()):
+    # Bodies come from the network, so a photo or chart file must be an http(s) URL or a file
+    # under one of the --data-dir roots; a bare path would let any client read any file we can.
+    images, charts = content.get("images", {}), content.get("charts", {})
+    if not isinstance(images, dict) or not isinstance(charts, dict):
+        raise SourceError("images and charts: expected objects")
+    named = [(f"images.{key}", src) for key, src in images.items()]
+    data = [(f"charts.{name}", src) for name, src in charts.items()]
+    data += [
+        (f"slides[{i}].items[{j}].data", item[2])
+        for i, slide in enumerate(slides)
+        for j, item in enumerate(slide[2])
+        if item[0] == "chart"
+    ]
+    named += [(f"{where}.file", src["file"]) for where, src in data if isinstance(src, dict) and "file" in src]
+    for where, src in named:
+        if not isinstance(src, str):
+            raise SourceError(f"{where}: expected a URL or a path")
+        if "://" in src:
+            if urlsplit(src).scheme not in URL_SCHEMES:
+                raise SourceError(f"{where}: only {' and '.join(URL_SCHEMES)} URLs are fetched")
+            continue
+        path = Path(src).resolve()
+        if not any(path.is_relative_to(root) for root in roots):
+            raise SourceError(f"{where}: {src!r} is not under a --data-dir" if roots else f"{where}: local files are not served; use a URL")
+
+
+class Builder:
+    # One thread builds every deck: the module's caches and globals are not thread-safe, and a
+    # single warm process is what keeps per-deck latency low. HTTP threads only enqueue and wait.
+    def __init__(self, queue_size=QUEUE_SIZE, options=None, data_dirs=()):
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.options = options or {}
+        self.data_dirs = [Path(d).resolve() for d in data_dirs]
+        self.lock = threading.Lock()
+        self.counts = {"completed": 0, "failed": 0, "rejected": 0}
+        self.in_flight = 0
+        self.latency = []
+        self.started = time.time()
+        self.thread = threading.Thread(target=self.run, name="deck-builder", daemon=True)
+
+    def start(self, warm=True):
+        if warm:
+            started = time.perf_counter()
+            self.build({})
+            log.info("warmed up in %.2fs", time.perf_counter() - started)
+        self.thread.start()
+
+    def submit(self, body):
+        fut = Future()
+        try:
+            self.jobs.put_nowait((body, fut, time.perf_counter()))
+        except queue.Full:
+            with self.lock:
+                self.counts["rejected"] += 1
+            return None
+        return fut
+
+    def run(self):
+        while True:
+            body, fut, queued = self.jobs.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            with self.lock:
+                self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                result = self.build(body)
+            except Exception as exc:
+                fut.set_exception(exc)
+                outcome = "failed"
+            else:
+                done = time.perf_counter()
+                result.update(queue_ms=(started - queued) * 1000, build_ms=(done - started) * 1000)
+                fut.set_result(result)
+                outcome = "completed"
+            with self.lock:
+                self.in_flight -= 1
+                self.counts[outcome] += 1
+                self.latency.append(time.perf_counter() - queued)
+                del self.latency[:-LATENCY_WINDOW]
+
+    def build(self, body):
+        # A body with "slides" is a declarative deck spec; anything else overrides CONTENT.
+        if "slides" in body:
+            compiled = deck.compile_spec_bytes(json.dumps(body, sort_keys=True).encode())
+            check_sources(compiled["content"], compiled["slides"], self.data_dirs)
+            content, slides = deck.deck_content(compiled["content"]), deck.spec_slides(compiled)
+        else:
+            check_sources(body, roots=self.data_dirs)
+            content, slides = deck.deck_content(body), None
+        prs, _, stats = deck.render_deck(content, slides, incremental=True, **self.options)
+        buf = deck.serialize_deck(prs)
+        digest = deck.file_digest(buf)
+        return {"deck": buf.read(), "sha256": digest, "slides": stats}
+
+    def metrics(self):
+        with self.lock:
+            latency = sorted(self.latency)
+            snapshot = dict(self.counts, queued=self.jobs.qsize(), in_flight=self.in_flight)
+
+        def pct(p):
+            return round(latency[min(len(latency) - 1, int(p * len(latency)))] * 1000, 2) if latency else None
+
+        snapshot["latency_ms"] = {"p50": pct(0.5), "p95": pct(0.95), "max": pct(1.0), "window": len(latency)}
+        snapshot["image_memory"] = dict(deck._image_memory_stats, entries=len(deck._image_memory), limit=deck.IMAGE_MEMORY_BYTES)
+        snapshot["uptime"] = round(time.time() - self.started, 1)
+        return snapshot
+
+
+class Handler(BaseHTTPRequestHandler):
+    builder = None
+    timeout_s = BUILD_TIMEOUT
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.send_json(200, self.builder.metrics())
+        elif self.path == "/healthz":
+            self.send_json(200, {"ok": True})
+        else:
+            self.send_json(404, {"error": f"no route {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/build":
+            self.send_json(404, {"error": f"no route {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError as exc:
+            self.send_json(400, {"error": f"invalid JSON: {exc}"})
+            return
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "expected a JSON object"})
+            return
+        fut = self.builder.submit(body)
+        if fut is None:
+            self.send_json(503, {"error": "build queue is full"})
+            return
+        try:
+            result = fut.result(self.timeout_s)
+        except FutureTimeout:
+            fut.cancel()
+            self.send_json(504, {"error": f"build did not finish in {self.timeout_s}s"})
+            return
+        except SourceError as exc:
+            self.send_json(400, {"error": str(exc)})
+            return
+        except (deck.SpecError, deck.ChartError, deck.FetchError) as exc:
+            self.send_json(422, {"error": str(exc)})
+            return
+        except Exception as exc:
+            log.exception("build failed")
+            self.send_json(500, {"error": str(exc)})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", PPTX_TYPE)
+        self.send_header("Content-Length", str(len(result["deck"])))
+        self.send_header("X-Deck-Sha256", result["sha256"])
+        self.send_header("X-Queue-Ms", f"{result['queue_ms']:.2f}")
+        self.send_header("X-Build-Ms", f"{result['build_ms']:.2f}")
+        if result["slides"]:
+            self.send_header("X-Slides-Rebuilt", str(len(result["slides"]["rebuilt"])))
+        self.end_headers()
+        self.wfile.write(result["deck"])
+
+    def log_message(self, fmt, *args):
+        log.debug("%s " + fmt, self.address_string(), *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects an (host, port) client address.
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def make_server(handler, host="127.0.0.1", port=PORT, unix=None):
+    if unix:
+        if os.path.exists(unix):
+            os.unlink(unix)
+        return UnixHTTPServer(unix, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve pitch deck builds from a warm process.")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help=f"TCP port (default {PORT})")
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="pending builds before requests get 503")
+    parser.add_argument("--timeout", type=float, default=BUILD_TIMEOUT, help="seconds a request waits for its deck")
+    parser.add_argument(
+        "--image-memory",
+        type=deck.parse_bytes,
+        default=IMAGE_MEMORY,
+        help="image bytes kept in memory between builds, e.g. 128m; 0 reads from disk",
+    )
+    parser.add_argument("--workers", type=int, help="processes used to render image derivatives")
+    parser.add_argument("--dpi", type=int, help=f"target image resolution (default {deck.TARGET_DPI})")
+    parser.add_argument("--quality", type=lambda v: v if v == "auto" else int(v), help="JPEG quality for derivatives, or 'auto'")
+    parser.add_argument("--no-warm", action="store_true", help="skip building the default deck at startup")
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        action="append",
+        default=[],
+        help="directory whose files request bodies may name as images or chart data (repeatable; default: URLs only)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    deck.IMAGE_MEMORY_BYTES = args.image_memory
+    builder = Builder(args.queue_size, {"workers": args.workers, "dpi": args.dpi, "quality": args.quality}, args.data_dir)
+    builder.start(warm=not args.no_warm)
+    handler = type("Handler", (Handler,), {"builder": builder, "timeout_s": args.timeout})
+    server = make_server(handler, args.host, args.port, args.unix)
+    log.info("serving on %s", args.unix or "http://%s:%d" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        deck.close_connections()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+if __name__ == "__main__":
+    main()
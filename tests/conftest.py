@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts live at the repository root and are imported as top-level modules.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import create_pitchdeck as deck  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Assets and caches live under relative paths, so each test runs in its own directory.
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    deck.close_connections()
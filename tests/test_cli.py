@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+import create_pitchdeck as deck
+
+SPEC = {"slides": [{"header": "Usage", "items": [{"type": "chart", "kind": "bar", "box": [1, 1, 6, 4], "data": "usage"}]}]}
+
+
+def test_spec_errors_exit_with_the_message(workdir):
+    (workdir / "bad.json").write_text(json.dumps({"slides": 3}))
+    with pytest.raises(SystemExit) as exc:
+        deck.main(["--spec", "bad.json"])
+    assert exc.value.code == "bad.json: slides: expected a list, got 3"
+
+
+def test_chart_errors_exit_with_the_message(workdir):
+    spec = dict(SPEC, content={"charts": {"usage": {"kind": "zzz", "categories": ["a"], "values": [1]}}})
+    (workdir / "chart.json").write_text(json.dumps(spec))
+    with pytest.raises(SystemExit) as exc:
+        deck.main(["--spec", "chart.json", "--dry-run"])
+    assert "expected one of ['bar', 'line', 'pie'], got 'zzz'" in exc.value.code
+
+
+def test_unknown_spec_slide_is_a_usage_error(workdir, capsys):
+    (workdir / "deck.json").write_text(json.dumps(SPEC))
+    with pytest.raises(SystemExit) as exc:
+        deck.main(["--spec", "deck.json", "--slides", "nope"])
+    assert exc.value.code == 2
+    assert "unknown slide 'nope'" in capsys.readouterr().err
@@ -0,0 +1,32 @@
+import json
+import shutil
+from pathlib import Path
+
+import compile_pen
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def retitle(node, suffix):
+    # Append suffix to the first text node, so each edit changes one frame.
+    if isinstance(node, dict):
+        if isinstance(node.get("content"), str):
+            node["content"] += suffix
+            return True
+        return any(retitle(value, suffix) for value in node.values())
+    if isinstance(node, list):
+        return any(retitle(value, suffix) for value in node)
+    return False
+
+
+def test_memos_do_not_grow_across_recompiles(workdir):
+    doc = json.loads((ROOT / "pitch.pen").read_text())
+    Path("assets").mkdir()
+    shutil.copy(ROOT / "assets" / "logo-transparent-cropped.png", "assets")
+    sizes = []
+    for n in range(4):
+        retitle(doc, str(n))
+        Path("edit.pen").write_text(json.dumps(doc))
+        compile_pen.compile_pen("edit.pen", "edit.pptx")
+        sizes.append((len(compile_pen._nodes), len(compile_pen._layouts)))
+    assert sizes[1] == sizes[2] == sizes[3]
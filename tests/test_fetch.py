@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import bench_pitchdeck as bench
+import pitchdeck_cache as cache
+
+IMAGE = bench.fixture_image(0, (64, 48))
+
+
+class Handler(bench.FixtureHandler):
+    # Serves the fixtures like the bench server, and records each request's conditional headers.
+    # `fail` answers the first requests for a key with that status; `types` overrides Content-Type.
+    requests = None
+    fail = {}
+    types = {}
+
+    def do_GET(self):
+        key = self.path.strip("/")
+        self.requests.append((key, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")))
+        failures = self.fail.get(key)
+        if failures and failures[1] > 0:
+            failures[1] -= 1
+            self.send_error(failures[0])
+            return
+        if key in self.types:
+            body = self.fixtures[key]
+            self.send_response(200)
+            self.send_header("Content-Type", self.types[key])
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+
+@contextmanager
+def server(fixtures, fail=None, types=None):
+    handler = type("Handler", (Handler,), {"fixtures": fixtures, "requests": [], "fail": fail or {}, "types": types or {}})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        host, port = httpd.server_address
+        yield {key: f"http://{host}:{port}/{key}" for key in fixtures}, handler.requests
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        cache.close_connections()
+
+
+def meta(workdir):
+    return json.loads((workdir / "raw.meta.json").read_text())
+
+
+def test_downloads_image(workdir):
+    with server({"photo": IMAGE}) as (urls, requests):
+        results = cache.fetch_images(urls, workdir / "raw")
+    assert results["photo"]["status"] == "downloaded"
+    assert results["photo"]["bytes"] == len(IMAGE)
+    assert (workdir / "raw" / "photo.jpg").read_bytes() == IMAGE
+    entry = meta(workdir)["photo"]
+    assert entry["etag"] and entry["last_modified"]
+    assert requests == [("photo", None, None)]
+
+
+def test_fresh_image_is_not_refetched(workdir):
+    with server({"photo": IMAGE}) as (urls, requests):
+        cache.fetch_images(urls, workdir / "raw")
+        results = cache.fetch_images(urls, workdir / "raw")
+    assert results["photo"]["status"] == "fresh"
+    assert len(requests) == 1
+
+
+def test_revalidates_with_etag_and_last_modified(workdir):
+    with server({"photo": IMAGE}) as (urls, requests):
+        cache.fetch_images(urls, workdir / "raw")
+        entry = meta(workdir)["photo"]
+        results = cache.fetch_images(urls, workdir / "raw", max_age=0)
+    assert results["photo"] == {"path": workdir / "raw" / "photo.jpg", "status": "revalidated", "bytes": 0}
+    assert requests[1] == ("photo", entry["etag"], entry["last_modified"])
+    assert meta(workdir)["photo"]["checked"] > entry["checked"]
+
+
+def test_retries_after_503(workdir):
+    with server({"photo": IMAGE}, fail={"photo": [503, 2]}) as (urls, requests):
+        results = cache.fetch_images(urls, workdir / "raw", retries=3, backoff=0)
+    assert results["photo"]["status"] == "downloaded"
+    assert len(requests) == 3
+
+
+def test_gives_up_after_retries(workdir):
+    with server({"photo": IMAGE}, fail={"photo": [503, 10]}) as (urls, requests):
+        with pytest.raises(cache.FetchError, match="failed after 2 attempts") as exc:
+            cache.fetch_images(urls, workdir / "raw", retries=1, backoff=0)
+    assert set(exc.value.failures) == {"photo"}
+    assert len(requests) == 2
+
+
+def test_rejects_non_image_content_type(workdir):
+    with server({"photo": b"<html></html>"}, types={"photo": "text/html"}) as (urls, requests):
+        with pytest.raises(cache.FetchError, match="expected an image"):
+            cache.fetch_images(urls, workdir / "raw", backoff=0)
+    # A wrong content type is permanent: it is not retried.
+    assert len(requests) == 1
+    assert not (workdir / "raw" / "photo.jpg").exists()
+
+
+def test_offline_keeps_stale_copy_and_caches_the_failure(workdir, caplog):
+    with server({"photo": IMAGE}) as (urls, _):
+        cache.fetch_images(urls, workdir / "raw")
+    # The server is gone: its port now refuses connections.
+    started = time.perf_counter()
+    results = cache.fetch_images(urls, workdir / "raw", max_age=0)
+    assert results["photo"]["status"] == "stale"
+    # Connection refused is not retried with backoff.
+    assert time.perf_counter() - started < cache.FETCH_BACKOFF
+    assert "keeping cached" in caplog.text
+    assert "failed" in meta(workdir)["photo"]
+
+    caplog.clear()
+    results = cache.fetch_images(urls, workdir / "raw", max_age=0)
+    assert results["photo"]["status"] == "fresh"
+    assert "keeping cached" not in caplog.text
+
+
+def test_failed_check_expires(workdir, monkeypatch):
+    with server({"photo": IMAGE}) as (urls, _):
+        cache.fetch_images(urls, workdir / "raw")
+    cache.fetch_images(urls, workdir / "raw", max_age=0)
+    monkeypatch.setattr(cache, "FETCH_FAILED_AGE", 0)
+    assert cache.fetch_images(urls, workdir / "raw", max_age=0)["photo"]["status"] == "stale"
+
+
+def test_offline_without_cached_copy_fails(workdir):
+    with server({"photo": IMAGE}) as (urls, _):
+        pass
+    with pytest.raises(cache.FetchError, match="unreachable") as exc:
+        cache.fetch_images(urls, workdir / "raw")
+    assert set(exc.value.failures) == {"photo"}
@@ -0,0 +1,44 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import bench_pitchdeck as bench
+import create_pitchdeck as deck
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def local_images(workdir):
+    # Every photo from disk, so the build needs no network.
+    photos = workdir / "photos"
+    photos.mkdir()
+    images = {}
+    for n, key in enumerate(sorted(deck.IMAGE_URLS)):
+        path = photos / f"{key}.jpg"
+        path.write_bytes(bench.fixture_image(n, (320, 240)))
+        images[key] = str(path)
+    return images
+
+
+def run(workdir, *args):
+    # A fresh interpreter per build: nothing from the first build survives in memory.
+    return subprocess.run([sys.executable, *args], cwd=workdir, capture_output=True, text=True, env={"PYTHONPATH": str(ROOT)})
+
+
+def test_local_images_survive_cached_plans(workdir):
+    content = {"images": local_images(workdir)}
+    script = f"import create_pitchdeck as deck; deck.build(content={content!r}, output='deck.pptx')"
+    for _ in range(2):
+        result = run(workdir, "-c", script)
+        assert result.returncode == 0, result.stderr
+    assert list((workdir / ".pitchdeck_cache" / "plans").iterdir())
+
+
+def test_local_images_survive_cached_plans_in_batches(workdir):
+    specs = workdir / "specs.json"
+    specs.write_text(json.dumps([{"name": "Local", "output": "local.pptx", "images": local_images(workdir)}]))
+    for _ in range(2):
+        result = run(workdir, str(ROOT / "create_pitchdeck.py"), "--specs", str(specs))
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert "Saved local.pptx" in result.stdout
@@ -0,0 +1,74 @@
+import http.client
+import json
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import serve_pitchdeck as serve
+
+
+@contextmanager
+def server(data_dirs=()):
+    builder = serve.Builder(options={"workers": 1}, data_dirs=data_dirs)
+    builder.start(warm=False)
+    handler = type("Handler", (serve.Handler,), {"builder": builder})
+    httpd = serve.make_server(handler, port=0)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        yield httpd.server_address[1]
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def post(port, body):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.request("POST", "/build", json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def chart_spec(path):
+    data = {"file": str(path), "x": "month", "y": ["minutes"]}
+    return {"slides": [{"header": "Usage", "items": [{"type": "chart", "kind": "bar", "box": [1, 1, 8, 4], "data": data}]}]}
+
+
+@pytest.fixture
+def data_dir(workdir):
+    directory = workdir / "data"
+    directory.mkdir()
+    (directory / "usage.csv").write_text("month,minutes\nJan,3\nFeb,5\nMar,8\n")
+    (workdir / "secret.csv").write_text("month,minutes\nJan,1\n")
+    return directory
+
+
+@pytest.mark.parametrize(
+    "body, error",
+    [
+        ({"images": {"cover": "/etc/hostname"}}, "images.cover: '/etc/hostname' is not under a --data-dir"),
+        ({"images": {"cover": "file:///etc/hostname"}}, "images.cover: only http and https URLs are fetched"),
+        ({"charts": {"revenue": {"file": "secret.csv", "x": "month", "y": ["minutes"]}}}, "charts.revenue.file: 'secret.csv'"),
+        (chart_spec("secret.csv"), "slides[0].items[0].data.file: 'secret.csv'"),
+        (chart_spec("data/../secret.csv"), "'data/../secret.csv' is not under a --data-dir"),
+    ],
+)
+def test_sources_outside_the_data_dirs_are_rejected(data_dir, body, error):
+    with server([data_dir]) as port:
+        status, payload = post(port, body)
+    assert status == 400
+    assert error in json.loads(payload)["error"]
+
+
+def test_local_files_are_rejected_without_data_dirs(data_dir):
+    with server() as port:
+        status, payload = post(port, chart_spec(data_dir / "usage.csv"))
+    assert status == 400
+    assert "local files are not served" in json.loads(payload)["error"]
+
+
+def test_sources_under_a_data_dir_are_built(data_dir):
+    with server([data_dir]) as port:
+        status, payload = post(port, chart_spec(data_dir / "usage.csv"))
+    assert status == 200
+    assert payload[:2] == b"PK"